@@ -0,0 +1,87 @@
+"""
+Benchmark de ingesta de ubicaciones en cat_locations_v2.
+
+Genera puntos sintéticos para `--cats` gatos (uno por gato y por tick,
+como un tracker a varios Hz) y mide puntos/seg sostenidos, desde el primer
+punto hasta que el último quedó escrito:
+  - single:     un execute sincrónico por punto (como insert_cassandra_location)
+  - concurrent: LocationIngestor con execute_concurrent
+  - batch:      LocationIngestor con batches UNLOGGED por partición
+
+Los gatos de prueba usan el prefijo BENCH_ y se borran al final.
+
+    python bench_ingest.py --cats 500 --points 200000
+"""
+import json
+import time
+import argparse
+from datetime import datetime, timedelta, timezone
+
+import locations
+from db_initializer import CatTrackDBManager
+
+BENCH_PREFIX = "BENCH_"
+DELETE_PARTITION = f"DELETE FROM {locations.TABLE} WHERE cat_id = ? AND dia = ?"
+DELETE_LATEST = f"DELETE FROM {locations.LATEST_TABLE} WHERE cat_id = ?"
+
+
+def bench_points(cats, total, hz=5):
+    """Stream de (cat_id, ts, x, y): un punto por gato cada 1/hz segundos."""
+    base = datetime(2000, 1, 1, tzinfo=timezone.utc)
+    for i in range(total):
+        tick, cat = divmod(i, cats)
+        yield (f"{BENCH_PREFIX}{cat:06d}", base + timedelta(seconds=tick / hz),
+               float(cat % 1000) + tick * 0.01, float(cat // 1000) + tick * 0.01)
+
+
+def run(mode, db_manager, args):
+    points = bench_points(args.cats, args.points)
+    start = time.perf_counter()
+    if mode == 'single':
+        stmt = db_manager.cassandra_dao.prepare(locations.INSERT_CQL)
+        written = 0
+        for point in points:
+            db_manager.cassandra_session.execute(stmt, locations.row_params(*point))
+            written += 1
+        flushes = failed = None
+    else:
+        options = {'flush_size': args.flush_size, 'concurrency': args.concurrency,
+                   'batch_size': args.batch_size if mode == 'batch' else 1}
+        with db_manager.location_ingestor(**options) as ingestor:
+            ingestor.ingest(points)
+        written, failed, flushes = ingestor.points_written, ingestor.points_failed, ingestor.flushes
+    elapsed = time.perf_counter() - start
+    return {'mode': mode, 'points': args.points, 'written': written, 'failed': failed, 'flushes': flushes,
+            'seconds': round(elapsed, 3), 'points_per_sec': round(written / elapsed, 1) if elapsed else None}
+
+
+def cleanup(db_manager, args):
+    partitions = {(cat_id, locations.bucket(ts)) for cat_id, ts, _, _ in bench_points(args.cats, args.points)}
+    db_manager.cassandra_dao.execute_many(DELETE_PARTITION, partitions)
+    db_manager.cassandra_dao.execute_many(DELETE_LATEST, {(cat_id,) for cat_id, _ in partitions})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=['single', 'concurrent', 'batch', 'all'], default='all')
+    parser.add_argument('--cats', type=int, default=500)
+    parser.add_argument('--points', type=int, default=100000)
+    parser.add_argument('--flush-size', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--batch-size', type=int, default=20, help='filas por batch UNLOGGED (modo batch)')
+    args = parser.parse_args()
+
+    db_manager = CatTrackDBManager()
+    if not db_manager._connect_cassandra():
+        raise SystemExit("No se pudo conectar a Cassandra.")
+    try:
+        modes = ['single', 'concurrent', 'batch'] if args.mode == 'all' else [args.mode]
+        for mode in modes:
+            print(json.dumps(run(mode, db_manager, args)))
+            cleanup(db_manager, args)
+    finally:
+        db_manager.close_all()
+
+
+if __name__ == "__main__":
+    main()
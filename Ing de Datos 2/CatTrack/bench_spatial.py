@@ -0,0 +1,85 @@
+"""
+Benchmark del índice espacial (spatial_index.GridIndex) contra un recorrido
+completo de las posiciones, que es lo que costaría sin índice.
+
+Para cada cantidad de gatos carga posiciones al azar en un área de
+`--area` x `--area`, mueve una tanda de gatos (como una tanda del
+ingestor) y mide radio, kNN y pares cercanos. Verifica que el índice
+devuelva lo mismo que el recorrido completo. No necesita bases de datos.
+
+    python bench_spatial.py --cats 10000 100000
+"""
+import json
+import math
+import time
+import heapq
+import random
+import argparse
+
+from spatial_index import GridIndex
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat * 1000
+
+
+def scan_radius(positions, x, y, radius):
+    return sorted(((cat_id, math.hypot(px - x, py - y)) for cat_id, (px, py) in positions.items()
+                   if math.hypot(px - x, py - y) <= radius), key=lambda item: item[1])
+
+
+def scan_nearest(positions, x, y, k):
+    return heapq.nsmallest(k, ((cat_id, math.hypot(px - x, py - y)) for cat_id, (px, py) in positions.items()),
+                           key=lambda item: item[1])
+
+
+def run(cats, args):
+    rnd = random.Random(cats)
+    positions = {f"CAT_{i:07d}": (rnd.uniform(0, args.area), rnd.uniform(0, args.area)) for i in range(cats)}
+    index = GridIndex(cell_size=args.cell_size)
+
+    _, load_ms = timed(lambda: index.update_many((cat_id, 0, x, y) for cat_id, (x, y) in positions.items()), 1)
+
+    moved = rnd.sample(sorted(positions), min(args.batch, cats))
+    for cat_id in moved:
+        positions[cat_id] = (rnd.uniform(0, args.area), rnd.uniform(0, args.area))
+    _, update_ms = timed(lambda: index.update_many((cat_id, 1, *positions[cat_id]) for cat_id in moved), 1)
+
+    x, y = args.area / 2, args.area / 2
+    radius_idx, radius_ms = timed(lambda: index.within_radius(x, y, args.radius), args.repeat)
+    radius_scan, radius_scan_ms = timed(lambda: scan_radius(positions, x, y, args.radius), args.repeat)
+    knn_idx, knn_ms = timed(lambda: index.nearest(x, y, args.k), args.repeat)
+    knn_scan, knn_scan_ms = timed(lambda: scan_nearest(positions, x, y, args.k), args.repeat)
+    pairs, pairs_ms = timed(lambda: index.pairs_within(args.pair_radius), 1)
+
+    assert {c for c, _ in radius_idx} == {c for c, _ in radius_scan}, "radio: el índice difiere del recorrido"
+    assert [round(d, 9) for _, d in knn_idx] == [round(d, 9) for _, d in knn_scan], "kNN: el índice difiere"
+
+    return {'cats': cats, 'load_ms': round(load_ms, 1),
+            f'update_{len(moved)}_ms': round(update_ms, 2),
+            'radius_hits': len(radius_idx), 'radius_ms': round(radius_ms, 3), 'radius_scan_ms': round(radius_scan_ms, 3),
+            'knn_ms': round(knn_ms, 3), 'knn_scan_ms': round(knn_scan_ms, 3),
+            'pairs': len(pairs), 'pairs_ms': round(pairs_ms, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cats', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--area', type=float, default=10000.0, help='lado del área donde se reparten los gatos')
+    parser.add_argument('--cell-size', type=float, default=50.0)
+    parser.add_argument('--radius', type=float, default=200.0)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--pair-radius', type=float, default=5.0)
+    parser.add_argument('--batch', type=int, default=2000, help='gatos que se mueven en la tanda de actualización')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    for cats in args.cats:
+        print(json.dumps(run(cats, args)))
+
+
+if __name__ == "__main__":
+    main()
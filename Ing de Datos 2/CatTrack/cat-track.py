@@ -1,4 +1,5 @@
 import logging
+from datetime import datetime, timedelta, timezone
 from db_initializer import CatTrackDBManager
 
 logger = logging.getLogger(__name__)
@@ -17,6 +18,7 @@ def run_db_tests(db_manager):
     print(f"MySQL (cat_profiles): {'[OK]' if db_manager.mysql_conn else '[FALLÓ]'} - Estructura verificada.")
     print(f"MongoDB (cat_track_events): {'[OK]' if db_manager.mongo_client else '[FALLÓ]'}")
     print(f"Cassandra (cat_track_locations): {'[OK]' if db_manager.cassandra_session else '[FALLÓ]'} - Keyspace y tabla verificados.")
+    print(f"Redis (cache de última ubicación): {'[OK]' if db_manager.redis_client else '[SIN CACHE]'}")
 
     if success:
         print("\n¡Éxito! Todas las conexiones y esquemas están operativos.")
@@ -42,10 +44,13 @@ def demonstrate_data_flow(db_manager, cat_id):
     db_manager.insert_mongodb_event(cat_id, "Siesta", {"duration_minutes": 60, "location": "sofa"})
     db_manager.insert_mongodb_event(cat_id, "Caza", {"target": "ratón de juguete", "success": True})
 
-    # Cassandra: Insertar Ubicaciones (Time-Series)
-    db_manager.insert_cassandra_location(cat_id, 10.5, 20.1)
-    db_manager.insert_cassandra_location(cat_id, 10.6, 20.2)
-    db_manager.insert_cassandra_location(cat_id, 10.7, 20.3)
+    # Cassandra: Insertar Ubicaciones (Time-Series), por el ingestor con buffer y flush en tandas
+    now = datetime.now(timezone.utc)
+    db_manager.ingest_cassandra_locations([
+        (cat_id, now - timedelta(seconds=2), 10.5, 20.1),
+        (cat_id, now - timedelta(seconds=1), 10.6, 20.2),
+        (cat_id, now, 10.7, 20.3),
+    ])
     
     # --- B. LEER DATOS ---
     
@@ -69,6 +74,19 @@ def demonstrate_data_flow(db_manager, cat_id):
         logger.info(f"Cassandra Última Ubicación: X={location['x_coord']}, Y={location['y_coord']}, Time={time_str}")
     else:
         logger.info("Cassandra Última Ubicación: No se pudieron leer datos o ocurrió un error.")
+
+    # Última ubicación de varios gatos a la vez (un pipeline a Redis, Cassandra solo para los misses)
+    latest = db_manager.get_latest_locations([cat_id, "GATO_INEXISTENTE"])
+    logger.info(f"Últimas ubicaciones en bloque: {sorted(latest)}")
+
+    # Consultas espaciales sobre las posiciones actuales (índice en memoria, sin leer Cassandra)
+    logger.info(f"Gatos a menos de 5 de (10, 20): {db_manager.cats_within_radius(10.0, 20.0, 5.0)}")
+    logger.info(f"3 gatos más cercanos a (0, 0): {db_manager.nearest_cats(0.0, 0.0, k=3)}")
+
+    # Cassandra: Trayectoria de la última hora (arrays NumPy, una partición por día)
+    trajectory = db_manager.get_trajectory(cat_id, now - timedelta(hours=1), datetime.now(timezone.utc))
+    logger.info(f"Cassandra Trayectoria: {len(trajectory.timestamps)} puntos, "
+                f"X={trajectory.x_coord.tolist()}, Y={trajectory.y_coord.tolist()}")
     
     print("="*50)
 
@@ -27,5 +27,12 @@ DB_CONFIG = {
         "hosts": os.environ.get("CASSANDRA_HOSTS", "cassandra").split(','),
         "port": int(os.environ.get("CASSANDRA_PORT", 9042)),
         "keyspace": os.environ.get("CASSANDRA_KEYSPACE", "cat_track_locations")
+    },
+    "redis": {
+        # Cache de última ubicación (opcional: sin Redis se lee de Cassandra)
+        "host": os.environ.get("REDIS_HOST", "redis"),
+        "port": int(os.environ.get("REDIS_PORT", 6379)),
+        "db": int(os.environ.get("REDIS_DB", 0)),
+        "latest_ttl": int(os.environ.get("REDIS_LATEST_TTL", 7 * 24 * 3600))
     }
 }
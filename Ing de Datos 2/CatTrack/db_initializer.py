@@ -1,26 +1,61 @@
+import os
+import sys
 import logging
 import uuid
+from array import array
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import numpy as np
+import redis
 import mysql.connector 
+from mysql.connector import errorcode
 from pymongo import MongoClient
 from pymongo.errors import ServerSelectionTimeoutError as MongoConnectionError 
-from cassandra.cluster import Cluster
-from cassandra.query import dict_factory
+from cassandra.cluster import EXEC_PROFILE_DEFAULT
+from cassandra.query import dict_factory, tuple_factory
 
 # Importamos la configuración centralizada
 from db_config import DB_CONFIG
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from cassandra_dao import CassandraDAO, build_cluster  # compartido con TP/seed_service
+from migrations import migrate_mysql, migrate_cassandra
+from location_ingest import LocationIngestor
+from latest_cache import LatestLocationCache
+from spatial_index import GridIndex
+import locations
 
 logger = logging.getLogger(__name__)
 
+# Las ubicaciones van a cat_locations_v2, una partición por (cat_id, dia): ver locations.py
+TRAJECTORY_FETCH_SIZE = 5000  # filas por página al leer una trayectoria
+TRAJECTORY_CONCURRENCY = 8    # días leídos en paralelo
+LATEST_MISS_CONCURRENCY = 16  # gatos fuera del cache buscados en paralelo en Cassandra
+SPATIAL_LOAD_FETCH_SIZE = 5000  # filas de cat_latest por página (y por tanda al índice) al arrancar
+
+# Epoch de los timeuuid (15/10/1582) en unidades de 100 ns
+_UUID_EPOCH_OFFSET = 0x01b21dd213814000
+
+# Trayectoria en arrays: timestamps datetime64[ms] (UTC) y coordenadas float64, en orden temporal
+Trajectory = namedtuple("Trajectory", ["timestamps", "x_coord", "y_coord"])
+
 class CatTrackDBManager:
     """
     Clase para gestionar conexiones, esquemas y operaciones CRUD en
-    MySQL (perfiles), MongoDB (eventos) y Cassandra (ubicaciones).
+    MySQL (perfiles), MongoDB (eventos) y Cassandra (ubicaciones), con
+    Redis como cache de la última ubicación de cada gato y un índice
+    espacial en memoria de las posiciones actuales.
     """
     def __init__(self):
         self.config = DB_CONFIG
         self.mysql_conn = None
         self.mongo_client = None
         self.cassandra_session = None
+        self.cassandra_dao = None
+        self._cassandra_tuples = None
+        self.redis_client = None
+        self.latest_cache = None
+        self.spatial_index = GridIndex()
 
     # =========================================================================
     #                  MÉTODOS DE CONEXIÓN Y ESQUEMA
@@ -32,33 +67,28 @@ class CatTrackDBManager:
         mysql_ok = self._connect_mysql()
         mongo_ok = self._connect_mongodb()
         cassandra_ok = self._connect_cassandra()
+        # Redis es solo cache: si no está, las lecturas van directo a Cassandra
+        self._connect_redis()
+        self._load_spatial_index()
         
         return mysql_ok and mongo_ok and cassandra_ok
 
     def _connect_mysql(self):
-        """Conecta a MySQL y asegura que la base de datos y el esquema existan."""
+        """Conecta a MySQL y aplica las migraciones pendientes del esquema."""
+        mysql_config = self.config["mysql"]
         try:
-            # Conexión inicial (sin DB específica) para crear la DB si no existe
-            conn = mysql.connector.connect(
-                host=self.config["mysql"]["host"],
-                user=self.config["mysql"]["user"],
-                password=self.config["mysql"]["password"],
-                auth_plugin='mysql_native_password'
-            )
-            cursor = conn.cursor()
-            db_name = self.config["mysql"]["database"]
-            cursor.execute(f"CREATE DATABASE IF NOT EXISTS {db_name}")
-            cursor.close()
-            conn.close()
-
-            # Reconectar con la base de datos creada y verificar la tabla
-            self.mysql_conn = mysql.connector.connect(
-                host=self.config["mysql"]["host"],
-                user=self.config["mysql"]["user"],
-                password=self.config["mysql"]["password"],
-                database=db_name,
-                auth_plugin='mysql_native_password'
-            )
+            try:
+                self.mysql_conn = self._open_mysql(database=mysql_config["database"])
+            except mysql.connector.Error as e:
+                if e.errno != errorcode.ER_BAD_DB_ERROR:
+                    raise
+                # Primer arranque: la base todavía no existe
+                conn = self._open_mysql()
+                cursor = conn.cursor()
+                cursor.execute(f"CREATE DATABASE IF NOT EXISTS {mysql_config['database']}")
+                cursor.close()
+                conn.close()
+                self.mysql_conn = self._open_mysql(database=mysql_config["database"])
             logger.info("Conexión a MySQL exitosa.")
             self._setup_mysql_schema()
             return True
@@ -67,30 +97,23 @@ class CatTrackDBManager:
             self.mysql_conn = None
             return False
 
+    def _open_mysql(self, **kwargs):
+        return mysql.connector.connect(
+            host=self.config["mysql"]["host"],
+            user=self.config["mysql"]["user"],
+            password=self.config["mysql"]["password"],
+            auth_plugin='mysql_native_password',
+            **kwargs
+        )
+
     def _setup_mysql_schema(self):
         """
-        Crea la tabla de perfiles de gatos en MySQL.
-        IMPORTANTE: Se añade DROP TABLE para forzar la actualización del esquema 
-        (ej: añadir 'breed' y 'age_years') en entorno de desarrollo.
+        Aplica solo las migraciones de MySQL que falten (ver migrations.py).
+        No borra tablas: los perfiles existentes se conservan entre arranques.
         """
         if not self.mysql_conn: return
-        cursor = self.mysql_conn.cursor()
-        
-        # FIX 1: Eliminar tabla para asegurar que las columnas existan
-        cursor.execute("DROP TABLE IF EXISTS cat_profiles")
-        
-        create_table_query = """
-        CREATE TABLE cat_profiles ( 
-            cat_id VARCHAR(50) PRIMARY KEY,
-            name VARCHAR(100) NOT NULL,
-            breed VARCHAR(100),
-            age_years INT
-        )
-        """
-        cursor.execute(create_table_query)
-        self.mysql_conn.commit()
-        cursor.close()
-        logger.info("Esquema de MySQL (cat_profiles) verificado/creado.")
+        applied = migrate_mysql(self.mysql_conn)
+        logger.info(f"Esquema de MySQL verificado ({len(applied)} migraciones aplicadas).")
 
     def _connect_mongodb(self):
         """Conecta a MongoDB con autenticación."""
@@ -116,44 +139,82 @@ class CatTrackDBManager:
             return False
 
     def _connect_cassandra(self):
-        """Conecta a Cassandra y asegura que el keyspace y la tabla existan."""
+        """Conecta a Cassandra y aplica las migraciones pendientes del keyspace."""
         try:
-            cluster = Cluster(self.config["cassandra"]["hosts"], port=self.config["cassandra"]["port"])
-            session = cluster.connect()
-            
-            keyspace = self.config["cassandra"]["keyspace"]
-            
-            # FIX 3: Eliminar Keyspace para forzar la recreación de la tabla con la columna 'y_coord'
-            session.execute(f"DROP KEYSPACE IF EXISTS {keyspace}")
-
-            # Crear Keyspace si no existe
-            session.execute(f"""
-                CREATE KEYSPACE IF NOT EXISTS {keyspace}
-                WITH replication = {{ 'class': 'SimpleStrategy', 'replication_factor': '1' }}
-            """)
-            
-            session.set_keyspace(keyspace)
-            session.row_factory = dict_factory 
-            
-            # Tabla de ubicaciones (Time-Series)
-            session.execute("""
-                CREATE TABLE IF NOT EXISTS cat_locations (
-                    cat_id text,
-                    timestamp timeuuid,
-                    x_coord float,
-                    y_coord float,
-                    PRIMARY KEY ((cat_id), timestamp)
-                ) WITH CLUSTERING ORDER BY (timestamp DESC)
-            """)
+            # Token-aware y dict_factory vía perfil de ejecución (ver cassandra_dao.build_cluster)
+            cluster = build_cluster(self.config["cassandra"]["hosts"], port=self.config["cassandra"]["port"],
+                                    row_factory=dict_factory)
+            try:
+                session = cluster.connect()
+                # Solo se crea lo que falta; sin DROP, las ubicaciones se conservan
+                applied = migrate_cassandra(session, self.config["cassandra"]["keyspace"])
+            except Exception:
+                # Sin esto el Cluster queda con sus conexiones e hilos abiertos
+                cluster.shutdown()
+                raise
             
             self.cassandra_session = session
-            logger.info("Conexión a Cassandra exitosa. Keyspace y tabla verificados.")
+            self.cassandra_dao = CassandraDAO(session)
+            # Las trayectorias se leen como tuplas: no hace falta un dict por fila
+            self._cassandra_tuples = session.execution_profile_clone_update(EXEC_PROFILE_DEFAULT,
+                                                                            row_factory=tuple_factory)
+            logger.info(f"Conexión a Cassandra exitosa. Esquema verificado ({len(applied)} migraciones aplicadas).")
             return True
         except Exception as e:
             logger.error(f"Error al conectar o inicializar Cassandra: {e}")
             self.cassandra_session = None
+            self.cassandra_dao = None
             return False
 
+    def _connect_redis(self):
+        """Conecta al cache de última ubicación. Devuelve False (sin cache) si Redis no responde."""
+        try:
+            client = redis.Redis(host=self.config["redis"]["host"], port=self.config["redis"]["port"],
+                                 db=self.config["redis"]["db"], decode_responses=True)
+            client.ping()
+            self.redis_client = client
+            self.latest_cache = LatestLocationCache(client, ttl=self.config["redis"]["latest_ttl"])
+            logger.info("Conexión a Redis exitosa (cache de última ubicación).")
+            return True
+        except Exception as e:
+            logger.info(f"Redis no disponible, se continúa sin cache de ubicaciones: {e}")
+            self.redis_client = None
+            self.latest_cache = None
+            return False
+
+    def _load_spatial_index(self):
+        """
+        Carga el índice espacial. Redis (si está) es el camino rápido; la
+        fuente de verdad es cat_latest en Cassandra, que se recorre entera
+        por páginas: un gato que salió del cache por TTL o un Redis caído no
+        dejan huecos en las consultas de radio y kNN. El índice se queda con
+        el punto más nuevo de cada gato, así que el orden no importa.
+        """
+        if self.latest_cache:
+            try:
+                self.spatial_index.update_many(self.latest_cache.scan_all())
+            except Exception as e:
+                logger.info(f"No se pudo precargar el índice espacial desde Redis: {e}")
+        if not self.cassandra_session:
+            logger.error("Cassandra no está conectado: el índice espacial puede estar incompleto.")
+            return
+        try:
+            stmt = self.cassandra_dao.prepare(locations.SCAN_LATEST_CQL)
+            bound = stmt.bind(())
+            bound.fetch_size = SPATIAL_LOAD_FETCH_SIZE
+            chunk = []
+            for cat_id, point_time, x_coord, y_coord in self.cassandra_session.execute(
+                    bound, execution_profile=self._cassandra_tuples):
+                chunk.append((cat_id, locations.epoch_ms(point_time), x_coord, y_coord))
+                if len(chunk) >= SPATIAL_LOAD_FETCH_SIZE:
+                    # Por tandas: las consultas no esperan al recorrido completo
+                    self.spatial_index.update_many(chunk)
+                    chunk = []
+            self.spatial_index.update_many(chunk)
+            logger.info(f"Índice espacial cargado con {len(self.spatial_index)} gatos.")
+        except Exception as e:
+            logger.error(f"No se pudo cargar el índice espacial desde {locations.LATEST_TABLE}: {e}")
+
     def close_all(self):
         """Cierra todas las conexiones activas."""
         if self.mysql_conn:
@@ -165,6 +226,9 @@ class CatTrackDBManager:
         if self.cassandra_session:
             self.cassandra_session.shutdown()
             logger.info("Conexión Cassandra cerrada.")
+        if self.redis_client:
+            self.redis_client.close()
+            logger.info("Conexión Redis cerrada.")
     
     # =========================================================================
     #                         MÉTODOS CRUD IMPLEMENTADOS
@@ -185,7 +249,6 @@ class CatTrackDBManager:
             self.mysql_conn.commit()
             logger.info(f"MySQL: Perfil de gato '{name}' insertado/actualizado.")
         except Exception as e:
-            # Cambiamos a logger.info ya que el error de columna se maneja con DROP/CREATE
             logger.info(f"MySQL: Error al insertar/actualizar perfil: {e}") 
 
     def get_mysql_profile(self, cat_id):
@@ -238,27 +301,149 @@ class CatTrackDBManager:
         """Inserta una coordenada de ubicación para el gato en Cassandra."""
         if not self.cassandra_session: return
         try:
-            query = """
-            INSERT INTO cat_locations (cat_id, timestamp, x_coord, y_coord)
-            VALUES (%s, now(), %s, %s)
-            """
-            self.cassandra_session.execute(query, (cat_id, x_coord, y_coord))
+            point = (cat_id, datetime.now(timezone.utc), x_coord, y_coord)
+            self.cassandra_dao.execute(locations.INSERT_CQL, locations.row_params(*point))
+            self.cassandra_dao.execute(locations.UPSERT_LATEST_CQL, locations.latest_params(*point))
+            self._on_locations_written([point])
             logger.info(f"Cassandra: Ubicación para {cat_id} ({x_coord}, {y_coord}) insertada.")
         except Exception as e:
             logger.info(f"Cassandra: Error al insertar ubicación: {e}")
 
+    def insert_cassandra_locations(self, coords):
+        """
+        Inserta en bloque una lista de (cat_id, x_coord, y_coord) con el
+        statement preparado y requests concurrentes. Devuelve cuántas se insertaron.
+        """
+        if not self.cassandra_session: return 0
+        try:
+            now = datetime.now(timezone.utc)
+            points = [(cat_id, now, x, y) for cat_id, x, y in coords]
+            count = self.cassandra_dao.execute_many(locations.INSERT_CQL,
+                                                    [locations.row_params(*point) for point in points])
+            self.cassandra_dao.execute_many(locations.UPSERT_LATEST_CQL,
+                                            [locations.latest_params(*point) for point in locations.newest_by_cat(points)])
+            self._on_locations_written(points)
+            logger.info(f"Cassandra: {count} ubicaciones insertadas.")
+            return count
+        except Exception as e:
+            logger.info(f"Cassandra: Error al insertar ubicaciones: {e}")
+            return 0
+
+    def location_ingestor(self, **options):
+        """
+        Ingestor de puntos (cat_id, ts, x, y) con buffer acotado y flush en
+        tandas (ver location_ingest.py). Usarlo como context manager para
+        que el buffer se vacíe al terminar.
+        """
+        if not self.cassandra_session:
+            raise RuntimeError("Cassandra no está conectado")
+        options.setdefault("on_written", self._on_locations_written)
+        return LocationIngestor(self.cassandra_dao, **options)
+
+    def _on_locations_written(self, points):
+        """
+        Se llama con los (cat_id, ts, x, y) ya escritos en Cassandra:
+        write-through al cache y actualización del índice espacial.
+        """
+        points = list(points)
+        if self.latest_cache:
+            self.latest_cache.update_many(points)
+        self.spatial_index.update_many((cat_id, locations.epoch_ms(ts), x, y) for cat_id, ts, x, y in points)
+
+    def ingest_cassandra_locations(self, points, **options):
+        """Escribe un iterable/stream de (cat_id, ts, x, y). Devuelve cuántos puntos se escribieron."""
+        if not self.cassandra_session: return 0
+        with self.location_ingestor(**options) as ingestor:
+            ingestor.ingest(points)
+        if ingestor.points_failed:
+            logger.info(f"Cassandra: {ingestor.points_failed} ubicaciones no se pudieron escribir.")
+        logger.info(f"Cassandra: {ingestor.points_written} ubicaciones ingeridas en {ingestor.flushes} tandas.")
+        return ingestor.points_written
+
     def get_cassandra_latest_location(self, cat_id):
-        """Obtiene la última ubicación registrada de un gato desde Cassandra."""
-        if not self.cassandra_session: return
+        """
+        Obtiene la última ubicación registrada de un gato: primero del cache
+        de Redis y, en un miss, de Cassandra (que además carga el cache).
+        """
+        return self.get_latest_locations([cat_id]).get(cat_id)
+
+    def get_latest_locations(self, cat_ids):
+        """
+        {cat_id: última ubicación} para muchos gatos: un único pipeline a
+        Redis y, solo para los que no están en el cache, lecturas en
+        paralelo a Cassandra. Los gatos sin ubicaciones no aparecen.
+        """
+        cat_ids = list(dict.fromkeys(cat_ids))
+        found = self.latest_cache.get_many(cat_ids) if self.latest_cache else {}
+        missing = [cat_id for cat_id in cat_ids if cat_id not in found]
+        if missing and self.cassandra_session:
+            with ThreadPoolExecutor(max_workers=min(LATEST_MISS_CONCURRENCY, len(missing))) as pool:
+                from_cassandra = {cat_id: row for cat_id, row in zip(missing, pool.map(self._latest_from_cassandra,
+                                                                                      missing)) if row}
+            self._on_locations_written((cat_id, row["time"], row["x_coord"], row["y_coord"])
+                                       for cat_id, row in from_cassandra.items())
+            found.update(from_cassandra)
+        return found
+
+    def _latest_from_cassandra(self, cat_id):
+        """Una lectura de cat_latest, sin importar hace cuánto reportó el gato."""
         try:
-            query = """
-            SELECT cat_id, toTimestamp(timestamp) as time, x_coord, y_coord 
-            FROM cat_locations 
-            WHERE cat_id = %s 
-            LIMIT 1
-            """
-            result = self.cassandra_session.execute(query, (cat_id,)).one()
-            return result
+            return self.cassandra_dao.execute(locations.SELECT_LATEST_CQL, (cat_id,)).one()
         except Exception as e:
             logger.info(f"Cassandra: Error al leer ubicación: {e}")
             return None
+
+    def get_trajectory(self, cat_id, start, end):
+        """
+        Puntos de `cat_id` entre `start` y `end` (datetime, naive = UTC) como
+        Trajectory de arrays NumPy. Cada día del rango es una partición: se
+        leen en paralelo y cada una se pagina con el driver, acumulando en
+        arrays compactos en lugar de un dict por fila.
+        """
+        if not self.cassandra_session:
+            raise RuntimeError("Cassandra no está conectado")
+        stmt = self.cassandra_dao.prepare(locations.SELECT_RANGE_CQL)
+        start, end = locations.as_utc(start), locations.as_utc(end)
+        days = locations.buckets_between(start, end) if start <= end else []
+
+        def read_day(dia):
+            bound = stmt.bind((cat_id, dia, start, end))
+            bound.fetch_size = TRAJECTORY_FETCH_SIZE
+            ticks, xs, ys = array('q'), array('d'), array('d')
+            # Iterar el ResultSet trae las páginas siguientes a medida que se consumen
+            for ts_uuid, x_coord, y_coord in self.cassandra_session.execute(
+                    bound, execution_profile=self._cassandra_tuples):
+                ticks.append(ts_uuid.time)
+                xs.append(x_coord)
+                ys.append(y_coord)
+            return ticks, xs, ys
+
+        if not days:
+            parts = []
+        else:
+            with ThreadPoolExecutor(max_workers=min(TRAJECTORY_CONCURRENCY, len(days))) as pool:
+                parts = list(pool.map(read_day, days))  # en el orden de los días
+
+        def concat(index, dtype):
+            arrays = [np.frombuffer(part[index], dtype=dtype) for part in parts if len(part[index])]
+            return np.concatenate(arrays) if arrays else np.empty(0, dtype=dtype)
+
+        ticks = concat(0, np.int64)
+        timestamps = ((ticks - _UUID_EPOCH_OFFSET) // 10000).astype('datetime64[ms]')
+        return Trajectory(timestamps, concat(1, np.float64), concat(2, np.float64))
+
+    # =========================================================================
+    #                  CONSULTAS ESPACIALES (posición actual)
+    # =========================================================================
+
+    def cats_within_radius(self, x_coord, y_coord, radius):
+        """[(cat_id, distancia)] de los gatos a distancia <= radius del punto, del más cercano al más lejano."""
+        return self.spatial_index.within_radius(x_coord, y_coord, radius)
+
+    def nearest_cats(self, x_coord, y_coord, k=5):
+        """Los k gatos más cercanos al punto, como [(cat_id, distancia)]."""
+        return self.spatial_index.nearest(x_coord, y_coord, k)
+
+    def cats_near_each_other(self, radius):
+        """[(cat_a, cat_b, distancia)] de los pares de gatos a distancia <= radius entre sí."""
+        return self.spatial_index.pairs_within(radius)
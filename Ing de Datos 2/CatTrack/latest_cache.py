@@ -0,0 +1,101 @@
+"""
+Cache en Redis de la última ubicación de cada gato (write-through).
+
+Cada punto ingerido actualiza el hash `cat_latest:{cat_id}` (ts en ms, x, y)
+con un script Lua que solo pisa el valor si el punto es más nuevo, así un
+punto atrasado no retrocede la posición. Las lecturas van primero al cache
+y solo en un miss a Cassandra; `get_many` resuelve cientos de gatos con un
+único pipeline.
+"""
+import logging
+from datetime import datetime, timezone
+
+import locations
+
+logger = logging.getLogger(__name__)
+
+KEY_LATEST = "cat_latest:{cat_id}"
+LATEST_TTL = 7 * 24 * 3600  # un gato sin reportar una semana sale del cache
+
+# Solo actualiza si el ts nuevo no es anterior al guardado
+UPDATE_IF_NEWER_LUA = """
+local current = redis.call('HGET', KEYS[1], 'ts')
+if current and tonumber(current) > tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'ts', ARGV[1], 'x', ARGV[2], 'y', ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return 1
+"""
+
+
+class LatestLocationCache:
+    def __init__(self, redis_client, ttl=LATEST_TTL):
+        self.redis = redis_client  # con decode_responses=True
+        self.ttl = ttl
+        self._update = redis_client.register_script(UPDATE_IF_NEWER_LUA)
+
+    def update_many(self, points):
+        """Write-through de (cat_id, ts, x, y): un solo pipeline con el punto más nuevo de cada gato."""
+        newest = {}
+        for cat_id, ts, x_coord, y_coord in points:
+            ms = locations.epoch_ms(ts)
+            if cat_id not in newest or ms >= newest[cat_id][0]:
+                newest[cat_id] = (ms, x_coord, y_coord)
+        if not newest:
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for cat_id, (ms, x_coord, y_coord) in newest.items():
+                self._update(keys=[KEY_LATEST.format(cat_id=cat_id)],
+                             args=[ms, x_coord, y_coord, self.ttl], client=pipe)
+            pipe.execute()
+        except Exception as e:
+            # El cache es opcional: Cassandra sigue siendo la fuente de verdad
+            logger.info(f"Redis: no se pudo actualizar el cache de ubicaciones: {e}")
+
+    def update(self, cat_id, ts, x_coord, y_coord):
+        self.update_many([(cat_id, ts, x_coord, y_coord)])
+
+    def get_many(self, cat_ids):
+        """
+        {cat_id: ubicación} de los gatos que están en el cache, en un único
+        round-trip. La ubicación tiene la misma forma que la fila de Cassandra
+        (cat_id, time naive UTC, x_coord, y_coord).
+        """
+        cat_ids = list(dict.fromkeys(cat_ids))
+        if not cat_ids:
+            return {}
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for cat_id in cat_ids:
+                pipe.hgetall(KEY_LATEST.format(cat_id=cat_id))
+            results = pipe.execute()
+        except Exception as e:
+            logger.info(f"Redis: cache de ubicaciones no disponible: {e}")
+            return {}
+        return {cat_id: {
+                    "cat_id": cat_id,
+                    "time": datetime.fromtimestamp(int(data["ts"]) / 1000, timezone.utc).replace(tzinfo=None),
+                    "x_coord": float(data["x"]),
+                    "y_coord": float(data["y"]),
+                } for cat_id, data in zip(cat_ids, results) if data}
+
+    def get(self, cat_id):
+        return self.get_many([cat_id]).get(cat_id)
+
+    def scan_all(self, count=1000):
+        """(cat_id, ts_ms, x, y) de todos los gatos cacheados: SCAN por páginas + un pipeline por página."""
+        prefix = KEY_LATEST.format(cat_id="")
+        cursor = 0
+        while True:
+            cursor, keys = self.redis.scan(cursor=cursor, match=prefix + "*", count=count)
+            if keys:
+                pipe = self.redis.pipeline(transaction=False)
+                for key in keys:
+                    pipe.hgetall(key)
+                for key, data in zip(keys, pipe.execute()):
+                    if data:  # pudo expirar entre el SCAN y el pipeline
+                        yield key[len(prefix):], int(data["ts"]), float(data["x"]), float(data["y"])
+            if cursor == 0:
+                break
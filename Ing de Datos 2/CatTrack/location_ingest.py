@@ -0,0 +1,202 @@
+"""
+Ingesta de ubicaciones en Cassandra a alta tasa.
+
+Los puntos (cat_id, ts, x, y) entran a un buffer acotado en memoria y un
+hilo los escribe en tandas:
+
+- se hace flush al juntar `flush_size` puntos o cuando pasaron
+  `flush_interval` segundos desde el primero de la tanda;
+- cada tanda se manda con el INSERT preparado y execute_concurrent (hasta
+  `concurrency` requests en vuelo), o agrupada en batches UNLOGGED por
+  partición (cat_id, dia) si `batch_size` > 1 (todas las filas de un
+  batch van a la misma partición, así que el batch no reparte carga
+  entre nodos);
+- si Cassandra no da abasto el buffer se llena y `add` bloquea al
+  productor (backpressure) en lugar de acumular memoria sin límite;
+- el punto más nuevo de cada gato de la tanda se escribe también en
+  cat_latest (ver locations.py);
+- después de cada tanda se llama a `on_written` con los puntos que
+  quedaron escritos (p. ej. para actualizar caches).
+
+    with LocationIngestor(dao) as ingestor:
+        ingestor.ingest(puntos)
+"""
+import time
+import queue
+import logging
+import threading
+from collections import defaultdict
+
+from cassandra.query import BatchStatement, BatchType
+from cassandra.concurrent import execute_concurrent
+
+import locations
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUFFER_SIZE = 50000
+DEFAULT_FLUSH_SIZE = 2000
+DEFAULT_FLUSH_INTERVAL = 0.2  # segundos
+DEFAULT_CONCURRENCY = 64
+
+
+class LocationIngestor:
+    def __init__(self, dao, buffer_size=DEFAULT_BUFFER_SIZE, flush_size=DEFAULT_FLUSH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, concurrency=DEFAULT_CONCURRENCY, batch_size=1, on_written=None):
+        self.dao = dao
+        self.on_written = on_written
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.points_written = 0
+        self.points_failed = 0
+        self.flushes = 0
+        self._queue = queue.Queue(maxsize=buffer_size)
+        self._insert = dao.prepare(locations.INSERT_CQL)
+        self._upsert_latest = dao.prepare(locations.UPSERT_LATEST_CQL)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="cat-location-ingestor", daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------
+    # Productores
+    # ------------------------------------------------------------------
+
+    def add(self, cat_id, ts, x_coord, y_coord, timeout=None):
+        """
+        Encola un punto. `ts` es un datetime (naive = UTC) o epoch en
+        segundos. Con el buffer lleno bloquea hasta `timeout` y después
+        levanta queue.Full.
+        """
+        if self._stop.is_set():
+            raise RuntimeError("LocationIngestor cerrado")
+        self._queue.put((cat_id, ts, x_coord, y_coord), timeout=timeout)
+
+    def ingest(self, points, timeout=None):
+        """Encola todos los (cat_id, ts, x, y) de un iterable o stream. Devuelve cuántos se encolaron."""
+        count = 0
+        for cat_id, ts, x_coord, y_coord in points:
+            self.add(cat_id, ts, x_coord, y_coord, timeout=timeout)
+            count += 1
+        return count
+
+    def flush(self):
+        """Espera a que todo lo encolado hasta ahora esté escrito (o haya fallado)."""
+        self._queue.join()
+
+    def close(self):
+        """Escribe lo que quede en el buffer y detiene el hilo."""
+        self._stop.set()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ------------------------------------------------------------------
+    # Hilo de escritura
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            points = self._drain()
+            if not points:
+                continue
+            try:
+                self._write(points)
+            except Exception as e:
+                self.points_failed += len(points)
+                logger.error(f"Cassandra: error al escribir {len(points)} ubicaciones: {e}")
+            finally:
+                for _ in points:
+                    self._queue.task_done()
+
+    def _drain(self):
+        """Junta una tanda: hasta flush_size puntos o flush_interval desde el primero."""
+        try:
+            points = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(points) < self.flush_size:
+            try:
+                # Lo que ya está en el buffer se toma sin esperar
+                points.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop.is_set():
+                break
+            try:
+                points.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return points
+
+    def _statements(self, points):
+        """(statement, params, puntos) por request: filas sueltas o batches por partición."""
+        rows = [(locations.row_params(*point), point) for point in points]
+        if self.batch_size <= 1:
+            return [(self._insert, row, [point]) for row, point in rows]
+        by_partition = defaultdict(list)
+        for row, point in rows:
+            by_partition[row[:2]].append((row, point))
+        statements = []
+        for partition_rows in by_partition.values():
+            for i in range(0, len(partition_rows), self.batch_size):
+                chunk = partition_rows[i:i + self.batch_size]
+                batch = BatchStatement(batch_type=BatchType.UNLOGGED)
+                for row, _ in chunk:
+                    batch.add(self._insert, row)
+                statements.append((batch, None, [point for _, point in chunk]))
+        return statements
+
+    def _write(self, points):
+        """
+        Escribe la tanda y cuenta cada punto una sola vez: los pasos
+        posteriores (cat_latest, on_written) manejan sus propios errores y
+        no hacen que `_run` cuente como fallidos puntos ya escritos.
+        """
+        statements = self._statements(points)
+        results = execute_concurrent(self.dao.session, [(stmt, params) for stmt, params, _ in statements],
+                                     concurrency=self.concurrency, raise_on_first_error=False)
+        written, failed = [], 0
+        first_error = None
+        for (_, _, stmt_points), result in zip(statements, results):
+            if result.success:
+                written.extend(stmt_points)
+            else:
+                failed += len(stmt_points)
+                first_error = first_error or result.result_or_exc
+        self.flushes += 1
+        self.points_written += len(written)
+        self.points_failed += failed
+        if failed:
+            logger.error(f"Cassandra: fallaron {failed} de {len(points)} ubicaciones, primer error: {first_error}")
+        if written:
+            self._update_latest(written)
+            self._notify(written)
+
+    def _update_latest(self, written):
+        """Escribe en cat_latest el punto más nuevo de cada gato de la tanda."""
+        try:
+            latest = [locations.latest_params(*point) for point in locations.newest_by_cat(written)]
+            results = execute_concurrent(self.dao.session, [(self._upsert_latest, row) for row in latest],
+                                         concurrency=self.concurrency, raise_on_first_error=False)
+            latest_failed = sum(1 for result in results if not result.success)
+            if latest_failed:
+                logger.error(f"Cassandra: no se pudo actualizar {locations.LATEST_TABLE} para {latest_failed} gatos.")
+        except Exception as e:
+            logger.error(f"Cassandra: error al actualizar {locations.LATEST_TABLE}: {e}")
+
+    def _notify(self, written):
+        if self.on_written is None:
+            return
+        try:
+            self.on_written(written)
+        except Exception as e:
+            logger.error(f"Error en on_written después de escribir {len(written)} ubicaciones: {e}")
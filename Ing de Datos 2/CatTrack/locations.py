@@ -0,0 +1,76 @@
+"""
+Esquema de ubicaciones de gatos en Cassandra (v2).
+
+Una partición por (cat_id, dia) y filas ordenadas por timestamp (timeuuid),
+así un gato seguido durante meses no arma una partición que crece para
+siempre. La tabla la crea la migración 2 de migrations.py y la migración 3
+copia lo que hubiera en la tabla v1.
+
+La última ubicación de cada gato va además a `cat_latest` (una fila por
+gato, migraciones 4 y 5). Se escribe con USING TIMESTAMP = hora del punto,
+así gana siempre el punto más nuevo aunque lleguen desordenados y leerla
+es una sola consulta, sin importar hace cuánto reportó el gato.
+"""
+from datetime import datetime, timedelta, timezone
+
+from cassandra.util import uuid_from_time
+
+TABLE = 'cat_locations_v2'
+LEGACY_TABLE = 'cat_locations'  # v1: PRIMARY KEY ((cat_id), timestamp)
+LATEST_TABLE = 'cat_latest'
+
+INSERT_CQL = f"INSERT INTO {TABLE} (cat_id, dia, timestamp, x_coord, y_coord) VALUES (?, ?, ?, ?, ?)"
+UPSERT_LATEST_CQL = (f"INSERT INTO {LATEST_TABLE} (cat_id, point_time, x_coord, y_coord) VALUES (?, ?, ?, ?) "
+                     "USING TIMESTAMP ?")
+SELECT_LATEST_CQL = f"SELECT cat_id, point_time AS time, x_coord, y_coord FROM {LATEST_TABLE} WHERE cat_id = ?"
+# Recorrido completo (paginado) para cargar el índice espacial
+SCAN_LATEST_CQL = f"SELECT cat_id, point_time, x_coord, y_coord FROM {LATEST_TABLE}"
+# Orden ascendente dentro de cada día: concatenar los días en orden deja la trayectoria ordenada
+SELECT_RANGE_CQL = (f"SELECT timestamp, x_coord, y_coord FROM {TABLE} "
+                    "WHERE cat_id = ? AND dia = ? AND timestamp >= minTimeuuid(?) AND timestamp <= maxTimeuuid(?) "
+                    "ORDER BY timestamp ASC")
+
+
+def as_utc(ts):
+    """datetime (naive = UTC) o epoch en segundos -> datetime UTC."""
+    if isinstance(ts, datetime):
+        return ts.astimezone(timezone.utc) if ts.tzinfo is not None else ts.replace(tzinfo=timezone.utc)
+    return datetime.fromtimestamp(ts, tz=timezone.utc)
+
+
+def epoch_ms(ts):
+    """datetime o epoch -> milisegundos desde epoch (UTC)."""
+    return int(as_utc(ts).timestamp() * 1000)
+
+
+def bucket(ts):
+    """Día (UTC) de la partición a la que va un punto."""
+    return as_utc(ts).date()
+
+
+def buckets_between(start, end):
+    """Días (UTC) que cubre el rango [start, end], en orden."""
+    first, last = bucket(start), bucket(end)
+    return [first + timedelta(days=i) for i in range((last - first).days + 1)]
+
+
+def row_params(cat_id, ts, x_coord, y_coord):
+    """Parámetros de INSERT_CQL para un punto; el timeuuid sale del propio ts."""
+    ts = as_utc(ts)
+    return (cat_id, ts.date(), uuid_from_time(ts), x_coord, y_coord)
+
+
+def latest_params(cat_id, ts, x_coord, y_coord):
+    """Parámetros de UPSERT_LATEST_CQL; el write timestamp (µs) es la hora del punto."""
+    ts = as_utc(ts)
+    return (cat_id, ts, x_coord, y_coord, epoch_ms(ts) * 1000)
+
+
+def newest_by_cat(points):
+    """El punto más nuevo de cada gato entre (cat_id, ts, x, y)."""
+    newest = {}
+    for point in points:
+        current = newest.get(point[0])
+        if current is None or epoch_ms(point[1]) >= epoch_ms(current[1]):
+            newest[point[0]] = point
+    return list(newest.values())
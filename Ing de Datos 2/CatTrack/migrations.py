@@ -0,0 +1,203 @@
+"""
+Migraciones versionadas de los esquemas de CatTrack (MySQL y Cassandra).
+
+Cada base guarda en una tabla `schema_migrations` las versiones ya
+aplicadas; al conectar solo se ejecutan las que faltan, en orden. Contra
+una base ya inicializada no se manda ningún DDL (solo una lectura de las
+versiones), así el arranque es rápido y no se pierde ningún dato.
+
+Para cambiar un esquema se agrega una migración nueva al final de la
+lista correspondiente; nunca se edita ni se borra una ya publicada. Una
+sentencia puede ser CQL/SQL o una función que recibe la sesión/conexión
+(para copias de datos).
+"""
+import logging
+
+from cassandra.cluster import EXEC_PROFILE_DEFAULT
+from cassandra.query import tuple_factory
+from cassandra.concurrent import execute_concurrent_with_args
+from cassandra.util import datetime_from_uuid1
+
+import locations
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_PAGE_SIZE = 1000
+
+
+def _tuple_profile(session):
+    """Perfil por defecto de la sesión pero con filas como tuplas (sin importar su row_factory)."""
+    return session.execution_profile_clone_update(EXEC_PROFILE_DEFAULT, row_factory=tuple_factory)
+
+
+def _backfill_cat_locations_v2(session):
+    """Copia cat_locations (v1) a cat_locations_v2 de a páginas; el día sale del timeuuid."""
+    insert = session.prepare(locations.INSERT_CQL)
+    select = session.prepare(f"SELECT cat_id, timestamp, x_coord, y_coord FROM {locations.LEGACY_TABLE}")
+    select.fetch_size = BACKFILL_PAGE_SIZE
+    page, copied = [], 0
+    for cat_id, ts_uuid, x_coord, y_coord in session.execute(select, execution_profile=_tuple_profile(session)):
+        page.append((cat_id, locations.bucket(datetime_from_uuid1(ts_uuid)), ts_uuid, x_coord, y_coord))
+        if len(page) >= BACKFILL_PAGE_SIZE:
+            copied += _copy_page(session, insert, page)
+            page = []
+    copied += _copy_page(session, insert, page)
+    logger.info(f"Cassandra: {copied} ubicaciones copiadas a {locations.TABLE}.")
+
+
+def _copy_page(session, insert, rows):
+    if not rows:
+        return 0
+    results = execute_concurrent_with_args(session, insert, rows, concurrency=64, raise_on_first_error=True)
+    return len(results)
+
+
+def _backfill_cat_latest(session):
+    """
+    Carga cat_latest con el punto más nuevo de cada partición de v1 y v2
+    (PER PARTITION LIMIT 1, las filas están en orden descendente). El
+    USING TIMESTAMP deja el más nuevo de cada gato sin importar el orden.
+    """
+    upsert = session.prepare(locations.UPSERT_LATEST_CQL)
+    copied = 0
+    for table in (locations.LEGACY_TABLE, locations.TABLE):
+        select = session.prepare(f"SELECT cat_id, timestamp, x_coord, y_coord FROM {table} PER PARTITION LIMIT 1")
+        select.fetch_size = BACKFILL_PAGE_SIZE
+        page = []
+        for cat_id, ts_uuid, x_coord, y_coord in session.execute(select, execution_profile=_tuple_profile(session)):
+            page.append(locations.latest_params(cat_id, datetime_from_uuid1(ts_uuid), x_coord, y_coord))
+            if len(page) >= BACKFILL_PAGE_SIZE:
+                copied += _copy_page(session, upsert, page)
+                page = []
+        copied += _copy_page(session, upsert, page)
+    logger.info(f"Cassandra: {copied} últimas ubicaciones cargadas en {locations.LATEST_TABLE}.")
+
+
+# (versión, descripción, sentencias)
+MYSQL_MIGRATIONS = [
+    (1, "cat_profiles", [
+        """
+        CREATE TABLE IF NOT EXISTS cat_profiles (
+            cat_id VARCHAR(50) PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            breed VARCHAR(100),
+            age_years INT
+        )
+        """,
+    ]),
+]
+
+CASSANDRA_MIGRATIONS = [
+    (1, "cat_locations", [
+        """
+        CREATE TABLE IF NOT EXISTS cat_locations (
+            cat_id text,
+            timestamp timeuuid,
+            x_coord float,
+            y_coord float,
+            PRIMARY KEY ((cat_id), timestamp)
+        ) WITH CLUSTERING ORDER BY (timestamp DESC)
+        """,
+    ]),
+    (2, "cat_locations_v2 (particiones por cat_id y día)", [
+        f"""
+        CREATE TABLE IF NOT EXISTS {locations.TABLE} (
+            cat_id text,
+            dia date,
+            timestamp timeuuid,
+            x_coord float,
+            y_coord float,
+            PRIMARY KEY ((cat_id, dia), timestamp)
+        ) WITH CLUSTERING ORDER BY (timestamp DESC)
+          AND compaction = {{'class': 'TimeWindowCompactionStrategy', 'compaction_window_unit': 'DAYS', 'compaction_window_size': 1}}
+        """,
+    ]),
+    # La tabla v1 se deja intacta; la copia es idempotente si se corta a mitad
+    (3, "copia cat_locations -> cat_locations_v2", [_backfill_cat_locations_v2]),
+    (4, "cat_latest (última ubicación por gato)", [
+        f"""
+        CREATE TABLE IF NOT EXISTS {locations.LATEST_TABLE} (
+            cat_id text PRIMARY KEY,
+            point_time timestamp,
+            x_coord float,
+            y_coord float
+        )
+        """,
+    ]),
+    (5, "carga cat_latest desde cat_locations y cat_locations_v2", [_backfill_cat_latest]),
+]
+
+
+def migrate_mysql(conn):
+    """Aplica las migraciones de MySQL que falten. Devuelve las versiones aplicadas."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INT PRIMARY KEY,
+                description VARCHAR(255) NOT NULL,
+                applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("SELECT version FROM schema_migrations")
+        applied = {row[0] for row in cursor.fetchall()}
+
+        newly_applied = []
+        for version, description, statements in MYSQL_MIGRATIONS:
+            if version in applied:
+                continue
+            for stmt in statements:
+                if callable(stmt):
+                    stmt(conn)
+                else:
+                    cursor.execute(stmt)
+            cursor.execute("INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                           (version, description))
+            conn.commit()
+            newly_applied.append(version)
+            logger.info(f"MySQL: migración {version} ({description}) aplicada.")
+        return newly_applied
+    finally:
+        cursor.close()
+
+
+def migrate_cassandra(session, keyspace, replication_factor=1):
+    """
+    Aplica las migraciones de Cassandra que falten en `keyspace` y deja la
+    sesión usando ese keyspace. Keyspace y tabla de versiones se buscan
+    primero en la metadata del driver para no mandar DDL si ya existen.
+    """
+    metadata = session.cluster.metadata
+    if keyspace not in metadata.keyspaces:
+        session.execute(f"""
+            CREATE KEYSPACE IF NOT EXISTS {keyspace}
+            WITH replication = {{ 'class': 'SimpleStrategy', 'replication_factor': '{replication_factor}' }}
+        """)
+    session.set_keyspace(keyspace)
+
+    ks_meta = metadata.keyspaces.get(keyspace)
+    if ks_meta is None or "schema_migrations" not in ks_meta.tables:
+        session.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version int PRIMARY KEY,
+                description text,
+                applied_at timestamp
+            )
+        """)
+    applied = {row[0] for row in session.execute("SELECT version FROM schema_migrations",
+                                                 execution_profile=_tuple_profile(session))}
+
+    newly_applied = []
+    for version, description, statements in CASSANDRA_MIGRATIONS:
+        if version in applied:
+            continue
+        for stmt in statements:
+            if callable(stmt):
+                stmt(session)
+            else:
+                session.execute(stmt)
+        session.execute("INSERT INTO schema_migrations (version, description, applied_at) "
+                        "VALUES (%s, %s, toTimestamp(now()))", (version, description))
+        newly_applied.append(version)
+        logger.info(f"Cassandra: migración {version} ({description}) aplicada.")
+    return newly_applied
@@ -0,0 +1,179 @@
+"""
+Índice espacial en memoria de la posición actual de cada gato.
+
+Grilla uniforme: el plano se divide en celdas de `cell_size` x `cell_size`
+y cada celda guarda los gatos que están en ella. Una consulta solo mira las
+celdas que toca el círculo buscado (o los anillos de celdas alrededor del
+punto, para kNN) en lugar de recorrer todas las ubicaciones.
+
+Las coordenadas de CatTrack son planas (x_coord, y_coord), no lon/lat, por
+eso no se usa Redis GEO. El índice se actualiza con cada tanda escrita por
+el ingestor (ver CatTrackDBManager._on_locations_written).
+"""
+import math
+import heapq
+import threading
+
+DEFAULT_CELL_SIZE = 10.0
+
+
+class GridIndex:
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE):
+        self.cell_size = float(cell_size)
+        self._positions = {}  # cat_id -> (x, y, ts)
+        self._cells = {}      # (cx, cy) -> {cat_id}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._positions)
+
+    def _cell(self, x, y):
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    # ------------------------------------------------------------------
+    # Mantenimiento
+    # ------------------------------------------------------------------
+
+    def update_many(self, points):
+        """
+        Mueve cada gato a su posición más nueva. `points` son (cat_id, ts, x, y)
+        con ts numérico (ms desde epoch, ver locations.epoch_ms); un punto
+        más viejo que el guardado se ignora.
+        """
+        with self._lock:
+            for cat_id, ts, x_coord, y_coord in points:
+                current = self._positions.get(cat_id)
+                if current is not None and ts < current[2]:
+                    continue
+                cell = self._cell(x_coord, y_coord)
+                if current is not None:
+                    old_cell = self._cell(current[0], current[1])
+                    if old_cell != cell:
+                        self._discard(old_cell, cat_id)
+                self._cells.setdefault(cell, set()).add(cat_id)
+                self._positions[cat_id] = (x_coord, y_coord, ts)
+
+    def remove(self, cat_id):
+        with self._lock:
+            current = self._positions.pop(cat_id, None)
+            if current is not None:
+                self._discard(self._cell(current[0], current[1]), cat_id)
+
+    def _discard(self, cell, cat_id):
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(cat_id)
+            if not members:
+                del self._cells[cell]
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def within_radius(self, x, y, radius):
+        """[(cat_id, distancia)] de los gatos a distancia <= radius de (x, y), del más cercano al más lejano."""
+        with self._lock:
+            (cx0, cy0), (cx1, cy1) = self._cell(x - radius, y - radius), self._cell(x + radius, y + radius)
+            box = (cx1 - cx0 + 1) * (cy1 - cy0 + 1)
+            if box <= len(self._cells):
+                cells = (self._cells.get((cx, cy)) for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1))
+            else:
+                # Radio enorme frente a lo ocupado: se recorren solo las celdas con gatos
+                cells = (members for (cx, cy), members in self._cells.items()
+                         if cx0 <= cx <= cx1 and cy0 <= cy <= cy1)
+            found = []
+            r2 = radius * radius
+            for members in cells:
+                for cat_id in members or ():
+                    px, py, _ = self._positions[cat_id]
+                    d2 = (px - x) ** 2 + (py - y) ** 2
+                    if d2 <= r2:
+                        found.append((cat_id, math.sqrt(d2)))
+        found.sort(key=lambda item: item[1])
+        return found
+
+    def nearest(self, x, y, k=5):
+        """
+        Los k gatos más cercanos a (x, y) como [(cat_id, distancia)]. Recorre
+        anillos de celdas alrededor del punto hasta que ninguna celda sin
+        mirar pueda tener algo más cerca que el k-ésimo encontrado.
+        """
+        if k <= 0:
+            return []
+        with self._lock:
+            if not self._positions:
+                return []
+            cx, cy = self._cell(x, y)
+            heap = []  # max-heap por distancia (negada) de los k mejores
+            ring = cells_visited = 0
+            while True:
+                for cell in self._ring_cells(cx, cy, ring):
+                    cells_visited += 1
+                    for cat_id in self._cells.get(cell, ()):
+                        px, py, _ = self._positions[cat_id]
+                        d2 = (px - x) ** 2 + (py - y) ** 2
+                        if len(heap) < k:
+                            heapq.heappush(heap, (-d2, cat_id))
+                        elif d2 < -heap[0][0]:
+                            heapq.heapreplace(heap, (-d2, cat_id))
+                # Toda celda fuera de los anillos ya vistos está a más de ring * cell_size del punto
+                if len(heap) == k and ring * self.cell_size >= math.sqrt(-heap[0][0]):
+                    break
+                if cells_visited > len(self._cells):
+                    # Punto lejos de todo o k grande: más barato recorrer las posiciones una vez
+                    return self._nearest_scan(x, y, k)
+                ring += 1
+        return sorted(((cat_id, math.sqrt(-neg_d2)) for neg_d2, cat_id in heap), key=lambda item: item[1])
+
+    def _nearest_scan(self, x, y, k):
+        return heapq.nsmallest(k, ((cat_id, math.hypot(px - x, py - y))
+                                   for cat_id, (px, py, _) in self._positions.items()),
+                               key=lambda item: item[1])
+
+    @staticmethod
+    def _ring_cells(cx, cy, ring):
+        if ring == 0:
+            yield (cx, cy)
+            return
+        for dx in range(-ring, ring + 1):
+            yield (cx + dx, cy - ring)
+            yield (cx + dx, cy + ring)
+        for dy in range(-ring + 1, ring):
+            yield (cx - ring, cy + dy)
+            yield (cx + ring, cy + dy)
+
+    def pairs_within(self, radius):
+        """[(cat_a, cat_b, distancia)] de los pares de gatos a distancia <= radius entre sí."""
+        r2 = radius * radius
+        pairs = []
+        with self._lock:
+            if 0 < radius < self.cell_size:
+                # Radio chico frente a la celda: grilla temporal con celdas de lado `radius`,
+                # así cada gato se compara solo con los de sus 8 celdas vecinas
+                cells = {}
+                for cat_id, (x, y, _) in self._positions.items():
+                    cells.setdefault((math.floor(x / radius), math.floor(y / radius)), []).append(cat_id)
+                span = 1
+            else:
+                cells = self._cells
+                span = max(1, math.ceil(radius / self.cell_size))
+            for (cx, cy), members in cells.items():
+                for dx in range(-span, span + 1):
+                    for dy in range(-span, span + 1):
+                        # Cada par de celdas se mira una sola vez
+                        if (dx, dy) < (0, 0):
+                            continue
+                        others = members if (dx, dy) == (0, 0) else cells.get((cx + dx, cy + dy))
+                        if not others:
+                            continue
+                        for a in members:
+                            ax, ay, _ = self._positions[a]
+                            for b in others:
+                                if others is members and b <= a:
+                                    continue
+                                bx, by, _ = self._positions[b]
+                                d2 = (ax - bx) ** 2 + (ay - by) ** 2
+                                if d2 <= r2:
+                                    pairs.append((a, b, math.sqrt(d2)))
+        pairs.sort(key=lambda item: item[2])
+        return pairs
@@ -5,7 +5,7 @@ import getpass
 import hashlib
 from rich.console import Console
 from rich.table import Table
-from neo4j import GraphDatabase # Importar la librería de Neo4j
+from executors import QueryExecutors  # Clientes persistentes por backend (MySQL, MongoDB, Cassandra, Neo4j)
 
 console = Console()
 QUERIES_DIR = "/app/queries"
@@ -14,10 +14,8 @@ QUERIES_DIR = "/app/queries"
 REDIS_HOST = "redis"
 REDIS_PORT = 6379
 
-# --- CONFIGURACIÓN NEO4J ---
-NEO4J_URI = "bolt://neo4j:7687"
-NEO4J_USER = "neo4j"
-NEO4J_PASSWORD = "neo4jpassword"
+# Un cliente por backend durante toda la sesión de la TUI
+db_clients = QueryExecutors(console)
 
 # --- FUNCIONES DE HASHING ---
 def hash_password(password, salt=None):
@@ -100,51 +98,10 @@ def handle_auth_and_session(redis_conn, username, password):
         return True
 
 def execute_neo4j_query(file_path):
-    """Ejecuta una o varias consultas Cypher desde un archivo usando la librería neo4j-driver."""
+    """Ejecuta una o varias consultas Cypher desde un archivo con el driver de Neo4j compartido."""
     try:
-        with open(file_path, 'r') as f:
-            # Lee el contenido y filtra las líneas que son solo comentarios
-            lines = f.readlines()
-            
-        # Filtra las líneas que son completamente comentarios
-        non_comment_lines = [
-            line for line in lines 
-            if not line.strip().startswith('//') and not line.strip().startswith('--')
-        ]
-        
-        full_query_content = "".join(non_comment_lines)
-
-        driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
-        
-        with driver.session() as session:
-            console.print(f"[bold blue]Ejecutando consultas Cypher desde {file_path}...[/bold blue]")
-            
-            # Divide el contenido limpio en consultas basadas en el punto y coma
-            queries = [stmt.strip() for stmt in full_query_content.split(';') if stmt.strip()]
-
-            if not queries:
-                console.print("[bold yellow]El archivo Cypher no contiene consultas válidas (después de filtrar comentarios).[/bold yellow]")
-                driver.close()
-                return
-
-            for i, query in enumerate(queries):
-                console.print(f"\n[bold magenta]--- Ejecutando Consulta {i+1} ---[/bold magenta]")
-                console.print(f"[dim]{query}[/dim]")
-                
-                result = session.run(query)
-                
-                if result.peek():
-                    table = Table(title=f"Resultados de Neo4j (Consulta {i+1})", show_lines=True)
-                    for key in result.keys():
-                        table.add_column(key, style="cyan")
-                    
-                    for record in result:
-                        table.add_row(*[str(record[key]) for key in result.keys()])
-                    console.print(table)
-                else:
-                    console.print("[bold yellow]Consulta ejecutada, no se retornaron resultados.[/bold yellow]")
-        
-        driver.close()
+        console.print(f"[bold blue]Ejecutando consultas Cypher desde {file_path}...[/bold blue]")
+        db_clients.run_cypher(file_path)
     except FileNotFoundError:
         console.print(f"[bold red]Error:[/bold red] Archivo Cypher no encontrado: {file_path}")
     except Exception as e:
@@ -175,6 +132,16 @@ EXECUTOR_MAP = {
     },
 }
 
+def init_db_clients():
+    """
+    Ejecuta .sql, .js y .cql con los clientes persistentes en lugar de lanzar
+    mysql / mongosh / cqlsh en cada script (se evita su arranque en frío).
+    Es idempotente: run_tui la llama siempre.
+    """
+    for ext, handler in db_clients.handlers().items():
+        if ext in EXECUTOR_MAP and not EXECUTOR_MAP[ext].get("handler"):
+            EXECUTOR_MAP[ext] = {"handler": handler, "db": EXECUTOR_MAP[ext]["db"]}
+
 def clear_screen():
     os.system('cls' if os.name == 'nt' else 'clear')
 
@@ -209,6 +176,8 @@ def get_items_in_current_dir(current_path):
     return items
 
 def run_tui():
+    # Cualquier punto de entrada (cli_v2 o cli_v3) usa los clientes persistentes
+    init_db_clients()
     clear_screen()
     
     console.print("[bold cyan]Bienvenido a la CLI de Consultas 🚀[/bold cyan]")
@@ -306,4 +275,7 @@ def run_tui():
 
 
 if __name__ == "__main__":
-    run_tui()
\ No newline at end of file
+    try:
+        run_tui()
+    finally:
+        db_clients.close()
\ No newline at end of file
@@ -1,14 +1,14 @@
 import os
 import sys
-import time
-import random
+import asyncio
 import threading
 import traceback
 from rich.console import Console
-import requests
-import json
 
-# Intentamos importar cli_v2 (el archivo no debe modificarse)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import loadgen
+
+# Importamos cli_v2, que aporta la TUI y los clientes persistentes (init_db_clients) que usa run()
 console = Console()
 try:
     import cli_v2
@@ -24,30 +24,24 @@ except Exception:
 GEN_INTERVAL = 10 # Interval in seconds
 
 
-def call_seed_service():
-    """Calls the /generate-order endpoint of the seed_service."""
-    try:
-        resp = requests.post('http://seed_service:8000/generate-order', timeout=5)
-        if resp.status_code == 200:
-            pass
-            # console.print("[green]Successfully called seed_service to generate and insert an order.[/green]")
-        else:
-            console.print(f"[yellow]Warning: seed_service returned status {resp.status_code}[/yellow]")
-    except Exception as e:
-        console.print(f"[red]Error calling seed_service: {e}[/red]")
+def report_result(status, error, detail):
+    """Shows non-200 responses and request errors from the background generator."""
+    if error is not None:
+        console.print(f"[red]Error calling seed_service: {error}{': ' + detail if detail else ''}[/red]")
+    elif status != 200:
+        console.print(f"[yellow]Warning: seed_service returned status {status}[/yellow]")
 
 
 def generator_loop():
-    """Continuously calls the seed service to generate orders."""
+    """Continuously calls the seed service to generate orders, using the load generator at a low rate."""
     console.print("[cyan]Starting background order generator loop...[/cyan]")
-    # Initial burst
-    for _ in range(3):
-        call_seed_service()
-        time.sleep(1)
-
-    while True:
-        call_seed_service()
-        time.sleep(GEN_INTERVAL)
+    # Runs forever: keep a bounded latency sample instead of every request
+    stats = loadgen.LoadStats(max_samples=loadgen.DEFAULT_MAX_SAMPLES, on_result=report_result)
+    try:
+        asyncio.run(loadgen.run_load(loadgen.DEFAULT_URL, rps=1 / GEN_INTERVAL, concurrency=1,
+                                     duration=None, timeout=5, stats=stats))
+    except Exception as e:
+        console.print(f"[red]Error calling seed_service: {e}[/red]")
 
 
 def start_background_generator():
@@ -58,13 +52,9 @@ def start_background_generator():
 
 def run():
     """Starts the background generator and then launches the TUI from cli_v2."""
-    try:
-        # Initialize db clients from cli_v2, as the TUI might need them.
-        if hasattr(cli_v2, 'init_db_clients'):
-            cli_v2.init_db_clients()
-    except Exception as e:
-        console.print(f"[yellow]Could not initialize DB clients from cli_v2: {e}[/yellow]")
-    
+    # .sql/.js/.cql/.cypher go through cli_v2's persistent clients (run_tui also does this)
+    cli_v2.init_db_clients()
+
     # Start the background generator that calls the seed_service
     start_background_generator()
 
@@ -73,6 +63,8 @@ def run():
         cli_v2.run_tui()
     except Exception as e:
         console.print(f"[red]Error launching TUI from cli_v2: {e}\n{traceback.format_exc()}[/red]")
+    finally:
+        cli_v2.db_clients.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,278 @@
+"""
+Ejecutores persistentes para la TUI.
+
+Mantiene un cliente por backend durante toda la sesión (conexión de
+mysql-connector, sesión de cassandra-driver, driver de Neo4j y un único
+proceso mongosh) en lugar de lanzar mysql/cqlsh/mongosh en cada script.
+Cada cliente se abre la primera vez que se usa, así un backend caído no
+impide abrir la TUI. Los resultados se muestran siempre como tablas de rich.
+"""
+import json
+import uuid
+import subprocess
+
+from rich.table import Table
+
+# --- CONFIGURACIÓN ---
+MYSQL_CONFIG = {"host": "mysql", "user": "root", "password": "root_password", "database": "my_data_warehouse"}
+MONGO_SHELL_CMD = ["mongosh", "mongodb://mongodb:27017/starbucks_transactions", "-u", "rootuser",
+                   "-p", "rootpassword", "--authenticationDatabase", "admin", "--quiet"]
+CASSANDRA_HOSTS = ["cassandra"]
+NEO4J_URI = "bolt://neo4j:7687"
+NEO4J_USER = "neo4j"
+NEO4J_PASSWORD = "neo4jpassword"
+
+MAX_ROWS = 200  # filas por tabla; el resto se resume en el pie
+
+
+def split_statements(text, comment_prefixes):
+    """
+    Separa un script en sentencias por ';' (fuera de comillas), descartando
+    las líneas que son solo comentarios. Los comentarios al final de una
+    línea se dejan: los interpreta el propio servidor.
+    """
+    lines = [line for line in text.splitlines() if not line.strip().startswith(comment_prefixes)]
+    statements, current, quote, escaped = [], [], None, False
+    for ch in "\n".join(lines):
+        if quote:
+            current.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == quote:
+                quote = None
+        elif ch in "'\"`":
+            quote = ch
+            current.append(ch)
+        elif ch == ';':
+            statements.append("".join(current))
+            current = []
+        else:
+            current.append(ch)
+    statements.append("".join(current))
+    return [stmt.strip() for stmt in statements if stmt.strip()]
+
+
+def _cell(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return str(value)
+
+
+class QueryExecutors:
+    def __init__(self, console):
+        self.console = console
+        self._mysql = None
+        self._cassandra_cluster = None
+        self._cassandra = None
+        self._neo4j = None
+        self._mongosh = None
+
+    # ------------------------------------------------------------------
+    # Render uniforme
+    # ------------------------------------------------------------------
+
+    def render(self, title, columns, rows):
+        """Una tabla de rich por resultado, con las mismas reglas para todos los backends."""
+        rows = list(rows)
+        if not columns:
+            self.console.print(f"[bold yellow]{title}: sin resultados.[/bold yellow]")
+            return
+        table = Table(title=title, show_lines=True)
+        for column in columns:
+            table.add_column(str(column) or " ", style="cyan")
+        for row in rows[:MAX_ROWS]:
+            table.add_row(*[_cell(v) for v in row])
+        if len(rows) > MAX_ROWS:
+            table.caption = f"{len(rows) - MAX_ROWS} filas más no mostradas"
+        self.console.print(table)
+
+    def render_records(self, title, records):
+        """Lista de dicts -> tabla con la unión de sus claves."""
+        columns = list(dict.fromkeys(key for record in records for key in record))
+        self.render(title, columns, [[record.get(c, "") for c in columns] for record in records])
+
+    def _run_statements(self, label, statements, execute):
+        if not statements:
+            self.console.print("[bold yellow]El archivo no contiene sentencias válidas.[/bold yellow]")
+            return
+        for i, stmt in enumerate(statements, start=1):
+            self.console.print(f"\n[bold magenta]--- Ejecutando Consulta {i} ---[/bold magenta]")
+            self.console.print(f"[dim]{stmt}[/dim]")
+            try:
+                execute(f"Resultados de {label} (Consulta {i})", stmt)
+            except Exception as e:
+                # Un error en una sentencia no corta el resto del script (como mysql --force / cqlsh)
+                self.console.print(f"[bold red]Error en la consulta {i}:[/bold red] {e}")
+
+    @staticmethod
+    def _read(file_path):
+        with open(file_path, 'r') as f:
+            return f.read()
+
+    # ------------------------------------------------------------------
+    # MySQL
+    # ------------------------------------------------------------------
+
+    def _mysql_conn(self):
+        if self._mysql is None:
+            import mysql.connector
+            self._mysql = mysql.connector.connect(autocommit=True, **MYSQL_CONFIG)
+        else:
+            self._mysql.ping(reconnect=True, attempts=2, delay=1)
+        return self._mysql
+
+    def run_sql(self, file_path):
+        conn = self._mysql_conn()
+
+        def execute(title, stmt):
+            cursor = conn.cursor()
+            try:
+                cursor.execute(stmt)
+                if cursor.with_rows:
+                    self.render(title, cursor.column_names, cursor.fetchall())
+                else:
+                    self.console.print(f"[green]OK, {cursor.rowcount} filas afectadas.[/green]")
+            finally:
+                cursor.close()
+
+        self._run_statements("MySQL", split_statements(self._read(file_path), ('--', '#')), execute)
+
+    # ------------------------------------------------------------------
+    # Cassandra
+    # ------------------------------------------------------------------
+
+    def _cassandra_session(self):
+        if self._cassandra is None:
+            from cassandra.cluster import Cluster
+            cluster = Cluster(CASSANDRA_HOSTS)
+            try:
+                self._cassandra = cluster.connect()
+            except Exception:
+                cluster.shutdown()
+                raise
+            self._cassandra_cluster = cluster
+        return self._cassandra
+
+    def run_cql(self, file_path):
+        session = self._cassandra_session()
+
+        def execute(title, stmt):
+            result = session.execute(stmt)  # DESCRIBE lo resuelve el servidor (Cassandra 4+)
+            if result.column_names:
+                self.render(title, result.column_names, [list(row) for row in result])
+            else:
+                self.console.print("[green]OK.[/green]")
+
+        self._run_statements("Cassandra", split_statements(self._read(file_path), ('--', '//')), execute)
+
+    # ------------------------------------------------------------------
+    # Neo4j
+    # ------------------------------------------------------------------
+
+    def _neo4j_driver(self):
+        if self._neo4j is None:
+            from neo4j import GraphDatabase
+            self._neo4j = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+        return self._neo4j
+
+    def run_cypher(self, file_path):
+        driver = self._neo4j_driver()
+        with driver.session() as session:
+
+            def execute(title, stmt):
+                result = session.run(stmt)
+                records = list(result)
+                if records:
+                    self.render(title, result.keys(), [[record[key] for key in result.keys()] for record in records])
+                else:
+                    self.console.print("[bold yellow]Consulta ejecutada, no se retornaron resultados.[/bold yellow]")
+
+            # En Cypher '--' es parte de los patrones: solo se descartan las líneas de comentario
+            self._run_statements("Neo4j", split_statements(self._read(file_path), ('//', '--')), execute)
+
+    # ------------------------------------------------------------------
+    # MongoDB (un mongosh persistente)
+    # ------------------------------------------------------------------
+
+    def _mongo_shell(self):
+        if self._mongosh is None or self._mongosh.poll() is not None:
+            self._mongosh = subprocess.Popen(MONGO_SHELL_CMD, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                             stderr=subprocess.STDOUT, text=True, bufsize=1)
+            # printjson emite JSON en una línea, así la salida se puede mostrar como tabla
+            self._mongosh.stdin.write(
+                "globalThis.printjson = (x) => print(EJSON.stringify(x, { relaxed: true }));\n")
+            self._mongosh.stdin.flush()
+        return self._mongosh
+
+    def run_mongo_js(self, file_path):
+        shell = self._mongo_shell()
+        marker = f"__fin_{uuid.uuid4().hex}__"
+        # Todo en una línea: si el script falla, igual se imprime el marcador de fin
+        shell.stdin.write(f"try {{ load({json.dumps(file_path)}); }} catch (e) {{ print('Error: ' + e.message); }} "
+                          f"finally {{ print('{marker}'); }}\n")
+        shell.stdin.flush()
+
+        text_lines = []
+        for line in shell.stdout:
+            if marker in line:
+                break
+            line = line.rstrip('\n')
+            # Con stdin no interactivo mongosh igual escribe su prompt ("starbucks_transactions> ")
+            while '> ' in line and line.split('> ', 1)[0].replace('_', '').isalnum():
+                line = line.split('> ', 1)[1]
+            if line.startswith(('{', '[')):
+                try:
+                    value = json.loads(line)
+                except json.JSONDecodeError:
+                    text_lines.append(line)
+                    continue
+                self._flush_text(text_lines)
+                self._render_json(value)
+            elif line.strip():
+                text_lines.append(line)
+        else:
+            self.console.print("[bold red]mongosh terminó inesperadamente; se reinicia en la próxima consulta.[/bold red]")
+        self._flush_text(text_lines)
+
+    def _flush_text(self, lines):
+        if lines:
+            self.console.print("\n".join(lines), markup=False, highlight=False)
+            lines.clear()
+
+    def _render_json(self, value):
+        if isinstance(value, dict):
+            value = [value]
+        if isinstance(value, list) and value and all(isinstance(v, dict) for v in value):
+            self.render_records("Resultados de MongoDB", value)
+        elif isinstance(value, list) and not value:
+            self.console.print("[bold yellow]Sin resultados.[/bold yellow]")
+        else:
+            self.console.print(_cell(value), markup=False)
+
+    # ------------------------------------------------------------------
+
+    def handlers(self):
+        """Handlers para EXECUTOR_MAP de cli_v2, por extensión."""
+        return {
+            ".sql": self.run_sql,
+            ".js": self.run_mongo_js,
+            ".cql": self.run_cql,
+            ".cypher": self.run_cypher,
+        }
+
+    def close(self):
+        if self._mongosh is not None and self._mongosh.poll() is None:
+            self._mongosh.stdin.close()
+            try:
+                self._mongosh.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._mongosh.kill()
+        if self._neo4j is not None:
+            self._neo4j.close()
+        if self._cassandra_cluster is not None:
+            self._cassandra_cluster.shutdown()
+        if self._mysql is not None:
+            self._mysql.close()
+        self._mysql = self._cassandra = self._cassandra_cluster = self._neo4j = self._mongosh = None
@@ -0,0 +1,200 @@
+"""
+Generador de carga para el seed_service.
+
+Dispara POSTs a un endpoint a una tasa objetivo (con rampa inicial),
+con un tope de requests en vuelo y una única sesión HTTP compartida.
+Al terminar imprime en JSON los percentiles de latencia, la tasa de
+errores y el throughput logrado.
+
+Con tasa objetivo la latencia se mide desde el momento en que el envío
+estaba agendado, no desde que salió: si el generador se atrasa (slots
+ocupados, servidor lento) esa espera cuenta, en lugar de esconderse
+(coordinated omission). El atraso solo se informa aparte en
+`schedule_lag_ms`, y los envíos que se descartan por atraso de más de
+1s en `skipped_sends`.
+
+    python loadgen.py --rps 200 --concurrency 50 --duration 60 --ramp-up 10
+    python loadgen.py --rps 0 --concurrency 32 --duration 30   # sin tope de tasa (closed loop)
+"""
+import json
+import time
+import random
+import asyncio
+import argparse
+from collections import Counter
+
+import aiohttp
+
+DEFAULT_URL = 'http://seed_service:8000/generate-order'
+# Latencias que se guardan para los percentiles cuando la corrida no tiene fin
+DEFAULT_MAX_SAMPLES = 10000
+
+
+def percentile(sorted_values, p):
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[k]
+
+
+class LoadStats:
+    """
+    Latencias, códigos y errores de una corrida. Con `max_samples` guarda
+    a lo sumo esa cantidad de latencias (muestreo de reservorio, así los
+    percentiles siguen representando toda la corrida) y la memoria no
+    crece en corridas sin fin. `on_result(status, error, detail)` se llama
+    con cada respuesta o error, p. ej. para mostrarlos en consola.
+    """
+
+    def __init__(self, max_samples=None, on_result=None):
+        self.latencies_ms = []
+        self.max_samples = max_samples
+        self.on_result = on_result
+        self.count = 0
+        self.total_ms = 0.0
+        self.lag_total_ms = 0.0
+        self.lag_max_ms = 0.0
+        self.skipped_sends = 0
+        self.min_ms = None
+        self.max_ms = None
+        self.statuses = Counter()
+        self.errors = Counter()
+        self.started = time.perf_counter()
+        self._random = random.Random()
+
+    def record(self, latency_ms, status=None, error=None, detail=None, lag_ms=0.0):
+        self.count += 1
+        self.total_ms += latency_ms
+        self.lag_total_ms += lag_ms
+        self.lag_max_ms = max(self.lag_max_ms, lag_ms)
+        self.min_ms = latency_ms if self.min_ms is None else min(self.min_ms, latency_ms)
+        self.max_ms = latency_ms if self.max_ms is None else max(self.max_ms, latency_ms)
+        if self.max_samples is None or len(self.latencies_ms) < self.max_samples:
+            self.latencies_ms.append(latency_ms)
+        else:
+            slot = self._random.randrange(self.count)
+            if slot < self.max_samples:
+                self.latencies_ms[slot] = latency_ms
+        if error is not None:
+            self.errors[error] += 1
+        else:
+            self.statuses[status] += 1
+        if self.on_result is not None:
+            self.on_result(status, error, detail)
+
+    def summary(self, target_rps, concurrency):
+        elapsed = time.perf_counter() - self.started
+        total = self.count
+        failed = sum(self.errors.values()) + sum(n for s, n in self.statuses.items() if s >= 400)
+        lat = sorted(self.latencies_ms)
+        return {
+            'target_rps': target_rps,
+            'concurrency': concurrency,
+            'duration_s': round(elapsed, 2),
+            'requests': total,
+            'achieved_rps': round(total / elapsed, 2) if elapsed else 0.0,
+            'error_rate': round(failed / total, 4) if total else 0.0,
+            'status_codes': {str(k): v for k, v in sorted(self.statuses.items())},
+            'errors': dict(self.errors),
+            'latency_ms': {
+                'min': round(self.min_ms, 2) if total else None,
+                'p50': round(percentile(lat, 50), 2) if lat else None,
+                'p95': round(percentile(lat, 95), 2) if lat else None,
+                'p99': round(percentile(lat, 99), 2) if lat else None,
+                'max': round(self.max_ms, 2) if total else None,
+                'mean': round(self.total_ms / total, 2) if total else None,
+            },
+            'schedule_lag_ms': {
+                'mean': round(self.lag_total_ms / total, 2) if total else None,
+                'max': round(self.lag_max_ms, 2) if total else None,
+            },
+            'skipped_sends': self.skipped_sends,
+        }
+
+
+async def _one_request(session, url, payload, stats, slots, scheduled=None):
+    """Un POST; la latencia cuenta desde `scheduled` (el envío agendado) si lo hay."""
+    start = time.perf_counter()
+    origin = start if scheduled is None else min(scheduled, start)
+    lag_ms = (start - origin) * 1000
+    try:
+        async with session.post(url, json=payload) as resp:
+            await resp.read()
+            stats.record((time.perf_counter() - origin) * 1000, status=resp.status, lag_ms=lag_ms)
+    except Exception as e:
+        stats.record((time.perf_counter() - origin) * 1000, error=type(e).__name__, detail=str(e), lag_ms=lag_ms)
+    finally:
+        slots.release()
+
+
+def _current_rate(rps, ramp_up, elapsed):
+    if ramp_up and elapsed < ramp_up:
+        # Rampa lineal, con un piso para no quedar esperando el primer request
+        return max(rps * elapsed / ramp_up, min(rps, 1.0))
+    return rps
+
+
+async def run_load(url=DEFAULT_URL, rps=10.0, concurrency=10, duration=30.0, ramp_up=0.0,
+                   timeout=10.0, payload=None, stats=None):
+    """
+    Corre la carga y devuelve el resumen. Con `rps` <= 0 no hay tope de
+    tasa: `concurrency` workers disparan requests una tras otra. Con
+    `duration` None corre hasta ser cancelado y, si no se pasa `stats`,
+    guarda solo DEFAULT_MAX_SAMPLES latencias.
+    """
+    if stats is None:
+        stats = LoadStats(max_samples=DEFAULT_MAX_SAMPLES if duration is None else None)
+    slots = asyncio.Semaphore(concurrency)
+    deadline = None if duration is None else time.perf_counter() + duration
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    tasks = set()
+
+    async with aiohttp.ClientSession(timeout=client_timeout, connector=connector) as session:
+        next_send = time.perf_counter()
+        while deadline is None or time.perf_counter() < deadline:
+            scheduled = None  # closed loop: no hay agenda, se mide desde el envío
+            if rps > 0:
+                now = time.perf_counter()
+                if next_send > now:
+                    await asyncio.sleep(next_send - now)
+                rate = _current_rate(rps, ramp_up, now - stats.started)
+                # Si nos atrasamos, recuperamos como mucho 1s de envíos (no una ráfaga entera)
+                if next_send < now - 1.0:
+                    stats.skipped_sends += int((now - 1.0 - next_send) * rate)
+                    next_send = now - 1.0
+                scheduled = next_send
+                next_send += 1.0 / rate
+            # Si todos los slots están ocupados la espera cuenta en la latencia del request
+            await slots.acquire()
+            task = asyncio.create_task(_one_request(session, url, payload, stats, slots, scheduled))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    return stats.summary(rps, concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default=DEFAULT_URL)
+    parser.add_argument('--rps', type=float, default=10.0, help='tasa objetivo (0 = sin tope)')
+    parser.add_argument('--concurrency', type=int, default=10, help='máximo de requests en vuelo')
+    parser.add_argument('--duration', type=float, default=30.0, help='segundos de prueba')
+    parser.add_argument('--ramp-up', type=float, default=0.0, help='segundos hasta llegar a --rps')
+    parser.add_argument('--timeout', type=float, default=10.0, help='timeout por request')
+    parser.add_argument('--output', help='archivo donde guardar el JSON además de imprimirlo')
+    args = parser.parse_args()
+
+    summary = asyncio.run(run_load(args.url, args.rps, args.concurrency, args.duration, args.ramp_up, args.timeout))
+    text = json.dumps(summary, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+
+
+if __name__ == '__main__':
+    main()
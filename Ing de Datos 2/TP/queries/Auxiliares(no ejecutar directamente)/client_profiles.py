@@ -0,0 +1,78 @@
+"""
+Resolución de perfiles de cliente (MySQL) con cache en Redis.
+
+Cada perfil se guarda como hash `cliente:{id}` con TTL. Para un conjunto
+de ids se hace un solo round-trip a Redis (pipeline de HGETALL) y, para los
+que faltan, una sola consulta `WHERE id IN (...)` a MySQL.
+
+Es solo read-through: ningún código de este proyecto modifica Cliente
+(los cambios llegan por scripts .sql), así que un nombre o email cambiado
+se ve recién cuando vence el TTL. Para verlo antes, borrar `cliente:{id}`
+(o `cliente:*`) en Redis después del cambio.
+"""
+import sys
+
+KEY_CLIENTE = "cliente:{cliente_id}"
+CLIENTE_TTL = 900  # 15 minutos
+
+
+class ClientProfileResolver:
+    def __init__(self, mysql_conn, redis_client=None, ttl=CLIENTE_TTL):
+        self.mysql_conn = mysql_conn
+        self.redis = redis_client  # con decode_responses=True; sin Redis se resuelve directo contra MySQL
+        self.ttl = ttl
+        self.mysql_queries = 0
+        self.cache_hits = 0
+
+    def resolve(self, cliente_ids):
+        """Devuelve {cliente_id: {"nombre", "email"}} para los ids que existen."""
+        ids = list(dict.fromkeys(cliente_ids))  # distintos, en orden
+        if not ids:
+            return {}
+
+        profiles = self._from_cache(ids)
+        missing = [cid for cid in ids if cid not in profiles]
+        if missing:
+            fetched = self._from_mysql(missing)
+            self._store(fetched)
+            profiles.update(fetched)
+        return profiles
+
+    def _from_cache(self, ids):
+        if self.redis is None:
+            return {}
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for cid in ids:
+                pipe.hgetall(KEY_CLIENTE.format(cliente_id=cid))
+            results = pipe.execute()
+        except Exception as e:
+            # Redis caído: se degrada a consultar todo en MySQL
+            print(f"ADVERTENCIA: cache de clientes no disponible: {e}", file=sys.stderr)
+            return {}
+        profiles = {cid: data for cid, data in zip(ids, results) if data}
+        self.cache_hits += len(profiles)
+        return profiles
+
+    def _from_mysql(self, ids):
+        cursor = self.mysql_conn.cursor()
+        try:
+            placeholders = ", ".join(["%s"] * len(ids))
+            cursor.execute(f"SELECT id, nombre, email FROM Cliente WHERE id IN ({placeholders})", tuple(ids))
+            self.mysql_queries += 1
+            return {row[0]: {"nombre": row[1], "email": row[2]} for row in cursor.fetchall()}
+        finally:
+            cursor.close()
+
+    def _store(self, profiles):
+        if self.redis is None or not profiles:
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for cid, profile in profiles.items():
+                key = KEY_CLIENTE.format(cliente_id=cid)
+                pipe.hset(key, mapping=profile)
+                pipe.expire(key, self.ttl)
+            pipe.execute()
+        except Exception as e:
+            print(f"ADVERTENCIA: no se pudo guardar en el cache de clientes: {e}", file=sys.stderr)
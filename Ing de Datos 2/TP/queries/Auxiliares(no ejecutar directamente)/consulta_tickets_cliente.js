@@ -1,14 +1,52 @@
-// Este script espera que la variable 'clienteId' sea inyectada
-// como un de numero, ej: clienteId = 1;
+// Este script espera que se inyecten las variables:
+//   clienteId (numero), anio (numero) y mes (1-12), ej: clienteId = 1; anio = 2024; mes = 9;
+// Opcional: explainPlan = true para imprimir el plan de ejecución en lugar de los tickets.
 
-db.ticket.aggregate([
+// Rango [primer día del mes, primer día del mes siguiente) en UTC.
+// A diferencia de $expr/$month, un rango sobre 'fecha' usa el índice idx_cliente_fecha
+// ({ cliente_id: 1, fecha: -1 }) y solo recorre las claves del mes pedido.
+var desde = new Date(Date.UTC(anio, mes - 1, 1));
+var hasta = new Date(Date.UTC(anio, mes, 1)); // Date.UTC pasa a enero del año siguiente si mes = 12
+
+var pipeline = [
     {
         $match: {
             cliente_id: clienteId,
-            // cliente_id: 1,
-            $expr: {
-                $eq: [ { $month: "$fecha" }, 9 ] // Filtra donde el mes de 'fecha' sea 9 (Septiembre)
-            }
+            fecha: { $gte: desde, $lt: hasta }
         }
     }
-]).forEach(printjson);
\ No newline at end of file
+];
+
+// Recorre el resultado de explain() y junta las etapas del plan ganador
+// (el formato cambia según la versión y el motor de ejecución).
+function resumenPlan(explain) {
+    var etapas = [];
+    var indices = [];
+    (function recorrer(nodo) {
+        if (nodo === null || typeof nodo !== 'object') return;
+        if (typeof nodo.stage === 'string') etapas.push(nodo.stage);
+        if (typeof nodo.indexName === 'string') indices.push(nodo.indexName);
+        Object.keys(nodo).forEach(k => {
+            if (k !== 'rejectedPlans') recorrer(nodo[k]);
+        });
+    })(explain.queryPlanner || explain.stages || explain);
+
+    var stats = explain.executionStats || {};
+    (explain.stages || []).forEach(s => {
+        if (s.$cursor && s.$cursor.executionStats) stats = s.$cursor.executionStats;
+    });
+    return {
+        etapas: etapas,
+        indices: indices,
+        nReturned: stats.nReturned,
+        totalKeysExamined: stats.totalKeysExamined,
+        totalDocsExamined: stats.totalDocsExamined
+    };
+}
+
+if (typeof explainPlan !== 'undefined' && explainPlan) {
+    var plan = db.ticket.explain("executionStats").aggregate(pipeline);
+    print(EJSON.stringify(resumenPlan(plan), { relaxed: false }));
+} else {
+    db.ticket.aggregate(pipeline).forEach(doc => print(EJSON.stringify(doc, { relaxed: false }))); // un documento EJSON por línea (ver mongo_runner.py)
+}
@@ -0,0 +1,70 @@
+"""
+Runner compartido para los scripts JS de agregación de esta carpeta.
+
+Ejecuta el script con mongosh (--file, sin prompt ni eco) inyectando
+las variables que espera, y los scripts imprimen un documento EJSON
+canónico por línea. La salida se lee como stream y se devuelve como
+generador de documentos, así resultados grandes no se acumulan ni se
+re-parsean con regex.
+"""
+import os
+import sys
+import json
+import tempfile
+import subprocess
+from collections import deque
+from datetime import datetime
+
+from bson import json_util
+
+MONGO_URI = "mongodb://mongodb:27017/starbucks_transactions"
+MONGO_USER = "rootuser"
+MONGO_PASSWORD = "rootpassword"
+MONGO_AUTH_DB = "admin"
+
+AUX_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _js_literal(value):
+    """Convierte un valor de Python en un literal JS para inyectarlo en el script."""
+    if isinstance(value, datetime):
+        return f'ISODate("{value.isoformat()}")'
+    return json.dumps(value)
+
+
+def run_js(script_name, **variables):
+    """
+    Corre `script_name` (relativo a esta carpeta) y va devolviendo cada
+    documento impreso por el script. Las líneas que no son EJSON (avisos
+    de mongosh) se mandan a stderr.
+    """
+    with open(os.path.join(AUX_DIR, script_name), 'r') as f:
+        script = f.read()
+    header = "".join(f"var {name} = {_js_literal(value)};\n" for name, value in variables.items())
+
+    with tempfile.NamedTemporaryFile('w', suffix='.js', delete=False) as tmp:
+        tmp.write(header + script)
+        tmp_path = tmp.name
+
+    command = ["mongosh", MONGO_URI, "-u", MONGO_USER, "-p", MONGO_PASSWORD,
+               "--authenticationDatabase", MONGO_AUTH_DB, "--quiet", "--file", tmp_path]
+    proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    noise = deque(maxlen=20)
+    finished = False
+    try:
+        for line in proc.stdout:
+            line = line.strip()
+            if line.startswith('{'):
+                yield json_util.loads(line)
+            elif line:
+                noise.append(line)
+                print(line, file=sys.stderr)
+        finished = True
+    finally:
+        if not finished:
+            proc.kill()  # el consumidor dejó de iterar antes de terminar
+        proc.stdout.close()
+        returncode = proc.wait()
+        os.unlink(tmp_path)
+    if returncode != 0:
+        raise RuntimeError(f"mongosh terminó con código {returncode}: {' | '.join(noise)}")
@@ -1,8 +1,14 @@
+import os
 import sys
+import redis
 from pymongo import MongoClient
 import mysql.connector
 from datetime import datetime
 
+# Resolver de perfiles de cliente con cache en Redis (compartido entre scripts)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Auxiliares(no ejecutar directamente)'))
+from client_profiles import ClientProfileResolver
+
 # --- CONFIGURACIÓN MONGODB ---
 MONGO_HOST = 'mongodb'
 MONGO_PORT = 27017
@@ -17,6 +23,10 @@ MYSQL_USER = 'root'
 MYSQL_PASSWORD = 'root_password'
 MYSQL_DATABASE = 'my_data_warehouse'
 
+# --- CONFIGURACIÓN REDIS ---
+REDIS_HOST = 'redis_cache'
+REDIS_PORT = 6379
+
 def get_mongodb_collection():
     """Establece y devuelve la colección 'canje' de MongoDB."""
     try:
@@ -49,21 +59,16 @@ def get_mysql_connection():
         print(f"ERROR al conectar a MySQL: {e}", file=sys.stderr)
         sys.exit(1)
 
-def get_client_details_from_mysql(mysql_conn, cliente_id):
-    """Busca el nombre y email de un cliente en MySQL."""
-    cursor = mysql_conn.cursor()
-    query = f"SELECT nombre, email FROM Cliente WHERE id = %s"
+def get_redis_client():
+    """Devuelve un cliente de Redis, o None si no está disponible (se consulta solo MySQL)."""
     try:
-        cursor.execute(query, (cliente_id,))
-        result = cursor.fetchone()
-        if result:
-            return {"nombre": result[0], "email": result[1]}
-        return None
-    except mysql.connector.Error as e:
-        print(f"ERROR al consultar MySQL para cliente_id {cliente_id}: {e}", file=sys.stderr)
+        r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0, decode_responses=True)
+        r.ping()
+        print("Conexión a Redis establecida.")
+        return r
+    except redis.exceptions.RedisError as e:
+        print(f"ADVERTENCIA: Redis no disponible, los perfiles se leen de MySQL: {e}", file=sys.stderr)
         return None
-    finally:
-        cursor.close()
 
 def main():
     print("--- Consulta de Canjes por Cliente y Fecha ---")
@@ -106,13 +111,16 @@ def main():
             }
         }
         
-        canjes_encontrados = mongo_canje_collection.find(mongo_query)
-        
+        canjes_encontrados = list(mongo_canje_collection.find(mongo_query))
+
+        # 4. Resolver todos los clientes de una vez: Redis primero, un único IN a MySQL para el resto
+        resolver = ClientProfileResolver(mysql_conn, get_redis_client())
+        clientes = resolver.resolve(canje['cliente_id'] for canje in canjes_encontrados)
+
         found_results = False
         for canje in canjes_encontrados:
             found_results = True
-            # 4. Buscar detalles del cliente en MySQL
-            client_details = get_client_details_from_mysql(mysql_conn, canje['cliente_id'])
+            client_details = clientes.get(canje['cliente_id'])
 
             if client_details:
                 print("\n--- Canje Encontrado ---")
@@ -125,6 +133,8 @@ def main():
 
         if not found_results:
             print(f"\nNo se encontraron canjes para el cliente {cliente_id} en la fecha {fecha_str}.")
+        else:
+            print(f"\nPerfiles resueltos: {resolver.cache_hits} desde Redis, {resolver.mysql_queries} consulta(s) a MySQL.")
 
     except Exception as e:
         print(f"ERROR durante la ejecución: {e}", file=sys.stderr)
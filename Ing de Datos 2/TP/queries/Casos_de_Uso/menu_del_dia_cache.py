@@ -1,6 +1,9 @@
 import redis
 import json
+import math
 import time
+import uuid
+import random
 import mysql.connector
 from mysql.connector import Error
 from datetime import datetime
@@ -10,8 +13,15 @@ from datetime import datetime
 # Redis
 REDIS_HOST = 'redis_cache'
 REDIS_PORT = 6379
-KEY_MENU_DEL_DIA = "menu_del_dia"
+KEY_MENU_DEL_DIA = "menu_del_dia:{sucursal_id}"            # menú cacheado, uno por sucursal
+KEY_MENU_LOCK = "menu_del_dia:{sucursal_id}:lock"          # solo un worker regenera a la vez
+KEY_PRODUCTOS_EN_STOCK = "menu_del_dia:{sucursal_id}:productos"  # SET de ids con stock > 0
 TTL_MENU_DEL_DIA = 3600  # 1 hora
+TTL_PRODUCTOS_EN_STOCK = 600  # la lista de ids se recalcula cada 10 minutos
+LOCK_TTL_MS = 10000  # si el worker que regenera muere, el lock se libera solo
+LOCK_WAIT_S = 5      # cuánto espera un worker a que otro termine de regenerar
+XFETCH_BETA = 1.0    # > 1 adelanta más el refresco anticipado
+MENU_SIZE = 3
 
 # MySQL
 MYSQL_HOST = 'mysql'
@@ -19,6 +29,19 @@ MYSQL_USER = 'root'
 MYSQL_PASSWORD = 'root_password'
 MYSQL_DATABASE = 'my_data_warehouse'
 
+MENU_RESPALDO = [
+    {"nombre": "Café del Día (Respaldo)", "precio": 2.50, "tipo": "Bebida Caliente"},
+    {"nombre": "Croissant (Respaldo)", "precio": 2.00, "tipo": "Panadería"}
+]
+
+# Borra el lock solo si sigue siendo nuestro (pudo expirar y tomarlo otro worker)
+RELEASE_LOCK_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
 # --- Funciones de Base de Datos ---
 
 def get_mysql_connection():
@@ -36,41 +59,140 @@ def get_mysql_connection():
         print(f"Error al conectar a MySQL: {e}")
         return None
 
-def get_dynamic_menu_items(conn, branch_address='123 Main St', limit=3):
-    """
-    Consulta a MySQL para obtener productos aleatorios del stock de una sucursal.
-    """
-    if not conn:
-        return []
+def get_productos_en_stock_ids(conn, sucursal_id):
+    """IDs de productos con stock en la sucursal (usa la clave única (idSucursal, idProducto))."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT idProducto FROM Stock WHERE idSucursal = %s AND cantidad > 0", (sucursal_id,))
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
 
+def get_productos(conn, product_ids):
+    """Nombre, precio y tipo de los productos elegidos, en una sola consulta por clave primaria."""
+    if not product_ids:
+        return []
     cursor = conn.cursor(dictionary=True)
-    query = """
-        SELECT p.nombre, p.precio, p.tipo
-        FROM Producto p
-        JOIN Stock s ON p.id = s.idProducto
-        JOIN Sucursal suc ON s.idSucursal = suc.id
-        WHERE suc.direccion = %s AND s.cantidad > 0
-        ORDER BY RAND()
-        LIMIT %s;
-    """
     try:
-        cursor.execute(query, (branch_address, limit))
+        placeholders = ", ".join(["%s"] * len(product_ids))
+        cursor.execute(f"SELECT nombre, precio, tipo FROM Producto WHERE id IN ({placeholders})", tuple(product_ids))
         products = cursor.fetchall()
         # Convertir Decimal a float para que sea serializable en JSON
         for prod in products:
             prod['precio'] = float(prod['precio'])
         return products
-    except Error as e:
-        print(f"Error al consultar productos en MySQL: {e}")
-        return []
     finally:
         cursor.close()
 
+def sample_product_ids(r, conn, sucursal_id, limit=MENU_SIZE):
+    """
+    Elige `limit` productos al azar de la lista precalculada de ids en stock
+    (SRANDMEMBER), en lugar de un ORDER BY RAND() sobre el join completo.
+    """
+    key = KEY_PRODUCTOS_EN_STOCK.format(sucursal_id=sucursal_id)
+    if not r.exists(key):
+        ids = get_productos_en_stock_ids(conn, sucursal_id)
+        if not ids:
+            return []
+        pipe = r.pipeline()  # MULTI/EXEC: nadie ve el SET a medio cargar
+        pipe.delete(key)
+        pipe.sadd(key, *ids)
+        pipe.expire(key, TTL_PRODUCTOS_EN_STOCK)
+        pipe.execute()
+    return [int(pid) for pid in r.srandmember(key, limit)]
+
+def build_menu(r, sucursal_id):
+    """Arma el menú del día de la sucursal consultando MySQL."""
+    mysql_conn = get_mysql_connection()
+    menu_items = []
+    if mysql_conn:
+        try:
+            menu_items = get_productos(mysql_conn, sample_product_ids(r, mysql_conn, sucursal_id))
+        except Error as e:
+            print(f"Error al consultar productos en MySQL: {e}")
+        finally:
+            mysql_conn.close()
+
+    if not menu_items:
+        print("No se pudieron obtener productos para el menú del día. Usando menú de respaldo.")
+        menu_items = MENU_RESPALDO
+
+    return {
+        "sucursal_id": sucursal_id,
+        "fecha": datetime.now().strftime("%Y-%m-%d"),
+        "items": menu_items,
+        "promocion": "¡Pregunta por nuestras ofertas especiales en caja!"
+    }
+
+# --- Cache-aside ---
+
+def _rebuild(r, sucursal_id):
+    """Regenera el menú y lo guarda junto con lo que tardó (para el refresco anticipado)."""
+    start = time.perf_counter()
+    menu = build_menu(r, sucursal_id)
+    entry = {
+        "menu": menu,
+        "delta": time.perf_counter() - start,
+        "expiry": time.time() + TTL_MENU_DEL_DIA,
+    }
+    r.setex(KEY_MENU_DEL_DIA.format(sucursal_id=sucursal_id), TTL_MENU_DEL_DIA, json.dumps(entry))
+    return menu
+
+def _rebuild_with_lock(r, sucursal_id, wait):
+    """
+    Regenera el menú solo si se obtiene el lock de la sucursal. Sin `wait`
+    devuelve None si otro worker ya lo está regenerando; con `wait` espera a
+    que aparezca en la caché (y si no aparece, sirve el menú de respaldo).
+    """
+    key = KEY_MENU_DEL_DIA.format(sucursal_id=sucursal_id)
+    lock_key = KEY_MENU_LOCK.format(sucursal_id=sucursal_id)
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + LOCK_WAIT_S
+    while True:
+        if r.set(lock_key, token, nx=True, px=LOCK_TTL_MS):
+            try:
+                return _rebuild(r, sucursal_id)
+            finally:
+                r.eval(RELEASE_LOCK_LUA, 1, lock_key, token)
+        if not wait:
+            return None
+        cached = r.get(key)
+        if cached:
+            return json.loads(cached)["menu"]
+        if time.monotonic() >= deadline:
+            print("Timeout esperando a que otro worker regenere el menú. Usando menú de respaldo.")
+            return {"sucursal_id": sucursal_id, "fecha": datetime.now().strftime("%Y-%m-%d"),
+                    "items": MENU_RESPALDO, "promocion": None}
+        time.sleep(0.05)
+
+def _should_refresh_early(entry):
+    """
+    Refresco anticipado probabilístico (XFetch): cuanto más cerca del
+    vencimiento y más caro de regenerar, más probable que un lector lo
+    regenere antes de que expire, así no vencen todos juntos.
+    """
+    return time.time() - entry["delta"] * XFETCH_BETA * math.log(1.0 - random.random()) >= entry["expiry"]
+
+def get_menu_del_dia(r, sucursal_id):
+    """
+    Devuelve (menú, origen). Lee Redis primero y solo consulta MySQL en un
+    miss (o en un refresco anticipado), con un único worker regenerando.
+    """
+    cached = r.get(KEY_MENU_DEL_DIA.format(sucursal_id=sucursal_id))
+    if cached:
+        entry = json.loads(cached)
+        if not _should_refresh_early(entry):
+            return entry["menu"], "cache"
+        # Si otro worker ya está refrescando, servimos lo cacheado mientras tanto
+        menu = _rebuild_with_lock(r, sucursal_id, wait=False)
+        return (menu, "refresco anticipado") if menu else (entry["menu"], "cache")
+    return _rebuild_with_lock(r, sucursal_id, wait=True), "mysql"
+
 # --- Lógica Principal ---
 
 def main():
     """
-    Genera un menú del día dinámico, lo guarda en Redis y luego lo consulta.
+    Consulta el menú del día de una sucursal a través de la caché (cache-aside).
     """
     # 1. Conectar a Redis
     try:
@@ -81,44 +203,21 @@ def main():
         print(f"No se pudo conectar a Redis: {e}")
         return
 
-    # 2. Conectar a MySQL y generar el menú
-    mysql_conn = get_mysql_connection()
-    menu_items = get_dynamic_menu_items(mysql_conn)
-
-    if mysql_conn and mysql_conn.is_connected():
-        mysql_conn.close()
-        print("Conexión a MySQL cerrada.")
-
-    if not menu_items:
-        print("No se pudieron obtener productos para el menú del día. Usando menú de respaldo.")
-        menu_items = [
-            {"nombre": "Café del Día (Respaldo)", "precio": 2.50, "tipo": "Bebida Caliente"},
-            {"nombre": "Croissant (Respaldo)", "precio": 2.00, "tipo": "Panadería"}
-        ]
+    sucursal_str = input("Ingrese el ID de la sucursal (Enter = 1): ").strip()
+    try:
+        sucursal_id = int(sucursal_str) if sucursal_str else 1
+    except ValueError:
+        print(f"ID de sucursal inválido: {sucursal_str}")
+        return
 
-    # 3. Construir y guardar el menú en Redis
-    menu_content = {
-        "fecha": datetime.now().strftime("%Y-%m-%d"),
-        "items": menu_items,
-        "promocion": "¡Pregunta por nuestras ofertas especiales en caja!"
-    }
-    menu_json = json.dumps(menu_content)
-
-    print(f"\nEstableciendo el menú del día dinámico en Redis (TTL: {TTL_MENU_DEL_DIA}s)...")
-    r.setex(KEY_MENU_DEL_DIA, TTL_MENU_DEL_DIA, menu_json)
-    print("Menú del día establecido.")
-
-    # 4. Consultar y mostrar el menú desde Redis
-    print(f"\nConsultando el menú del día (clave: {KEY_MENU_DEL_DIA})...")
-    menu_recuperado_json = r.get(KEY_MENU_DEL_DIA)
-
-    if menu_recuperado_json:
-        menu_recuperado = json.loads(menu_recuperado_json)
-        print("Menú del día recuperado de la caché:")
-        print(json.dumps(menu_recuperado, indent=2, ensure_ascii=False))
-        print(f"TTL restante: {r.ttl(KEY_MENU_DEL_DIA)} segundos")
-    else:
-        print("El menú del día no se encontró en la caché o ha expirado.")
+    # 2. Dos lecturas seguidas: la primera puede ir a MySQL, la segunda sale de la caché
+    key = KEY_MENU_DEL_DIA.format(sucursal_id=sucursal_id)
+    for intento in (1, 2):
+        start = time.perf_counter()
+        menu, origen = get_menu_del_dia(r, sucursal_id)
+        print(f"\nLectura {intento}: origen={origen} ({(time.perf_counter() - start) * 1000:.1f} ms)")
+    print(json.dumps(menu, indent=2, ensure_ascii=False))
+    print(f"TTL restante: {r.ttl(key)} segundos (clave: {key})")
 
     print("\nScript finalizado.")
 
@@ -2,7 +2,7 @@ import sys
 from cassandra.cluster import Cluster
 from cassandra.auth import PlainTextAuthProvider
 from pymongo import MongoClient
-from datetime import datetime
+from datetime import datetime, timedelta
 
 # --- CONFIGURACIÓN CASSANDRA ---
 CASSANDRA_CONTACT_POINTS = ['cassandra']
@@ -19,6 +19,16 @@ MONGO_USER = 'rootuser'
 MONGO_PASSWORD = 'rootpassword'
 MONGO_AUTH_DB = 'admin'
 
+# Filas de Cassandra por página; cada página se resuelve con un único $in en MongoDB
+PAGE_SIZE = 500
+
+# Un día de una sucursal es exactamente una partición de historialcompra_v2 (idSucursal, dia)
+CQL_TICKETS_DIA = """
+    SELECT idSucursal, fecha, ticket_num
+    FROM historialcompra_v2
+    WHERE idSucursal = ? AND dia = ?
+"""
+
 def get_cassandra_session():
     """Establece y devuelve una sesión de Cassandra."""
     try:
@@ -48,6 +58,52 @@ def get_mongodb_collection():
         print(f"ERROR al conectar a MongoDB: {e}", file=sys.stderr)
         sys.exit(1)
 
+def iter_cassandra_pages(session, sucursal_id, dia, page_size=PAGE_SIZE):
+    """
+    Devuelve las filas de historialcompra_v2 de la sucursal en el día, de a una
+    página por vez, siguiendo el paging_state del driver.
+    """
+    stmt = session.prepare(CQL_TICKETS_DIA)
+    stmt.fetch_size = page_size
+    bound = stmt.bind((sucursal_id, dia.date()))
+    paging_state = None
+    while True:
+        result = session.execute(bound, paging_state=paging_state)
+        if result.current_rows:
+            yield result.current_rows
+        paging_state = result.paging_state
+        if paging_state is None:
+            break
+
+
+def _segundo(fecha):
+    """Fecha truncada al segundo y sin tz (ambos drivers devuelven UTC naive), como comparaba el cruce original."""
+    return fecha.replace(microsecond=0, tzinfo=None)
+
+
+def reconcile(session, ticket_collection, sucursal_id, dia, page_size=PAGE_SIZE):
+    """
+    Cruza las filas de Cassandra con los tickets de MongoDB: una consulta
+    $in sobre ticket_id (idx_ticket_id) por página, en lugar de un find_one
+    por fila. ticket_id es único en MongoDB (idx_ticket_id es unique), así
+    que cada fila tiene a lo sumo un ticket; además tiene que coincidir la
+    sucursal y la fecha (al segundo), como en el cruce original. Va
+    devolviendo los pares (fila de Cassandra, ticket de MongoDB).
+    """
+    inicio = datetime(dia.year, dia.month, dia.day)
+    fin = inicio + timedelta(days=1)
+    for rows in iter_cassandra_pages(session, sucursal_id, dia, page_size):
+        ticket_nums = list({row.ticket_num for row in rows})
+        tickets = {t['ticket_id']: t for t in ticket_collection.find(
+            {"ticket_id": {"$in": ticket_nums}, "sucursal_id": sucursal_id,
+             "fecha": {"$gte": inicio, "$lt": fin}},
+            {"_id": 1, "ticket_id": 1, "fecha": 1})}
+        for row in rows:
+            mongo_ticket = tickets.get(row.ticket_num)
+            if mongo_ticket is not None and _segundo(mongo_ticket['fecha']) == _segundo(row.fecha):
+                yield row, mongo_ticket
+
+
 def main():
     print("--- Consulta de Órdenes por Fecha y Sucursal ---")
 
@@ -63,12 +119,8 @@ def main():
     while True:
         fecha_str = input("Ingrese la fecha (YYYY-MM-DD): ")
         try:
-            # Cassandra espera timestamp, pero para la consulta podemos usar un rango
-            # Convertimos a datetime para validación y luego a string para CQL
+            # Cassandra guarda timestamps en UTC; el día (UTC) es la clave de partición
             fecha_dt = datetime.strptime(fecha_str, '%Y-%m-%d')
-            # Para Cassandra, necesitamos un rango de tiempo para un día específico
-            fecha_inicio_dia = fecha_dt.strftime('%Y-%m-%d %H:%M:%S%z') # Start of day
-            fecha_fin_dia = (fecha_dt.replace(hour=23, minute=59, second=59)).strftime('%Y-%m-%d %H:%M:%S%z') # End of day
             break
         except ValueError:
             print("Formato de fecha inválido. Por favor, use YYYY-MM-DD.")
@@ -81,50 +133,21 @@ def main():
         cassandra_session = get_cassandra_session()
         mongo_ticket_collection = get_mongodb_collection()
 
-        # 3. Consultar Cassandra
+        # 3. Consultar Cassandra por páginas y resolver cada página en MongoDB
         print(f"\nConsultando Cassandra para sucursal_id={sucursal_id} y fecha={fecha_str}...")
-        # La consulta debe usar el PRIMARY KEY (idSucursal, fecha)
-        # Para filtrar por un día completo, necesitamos un rango de fecha
-        cql_query = f"""
-            SELECT idSucursal, fecha, ticket_num
-            FROM HistorialCompra
-            WHERE idSucursal = {sucursal_id}
-            AND fecha >= '{fecha_dt.strftime('%Y-%m-%d 00:00:00+0000')}'
-            AND fecha <= '{fecha_dt.strftime('%Y-%m-%d 23:59:59+0000')}';
-        """
-        cassandra_rows = cassandra_session.execute(cql_query)
-        
-        found_matches = False
-        for row in cassandra_rows:
-            # print(row)
-
-            # 4. Buscar en MongoDB
-            # MongoDB fecha es ISODate, Cassandra fecha es timestamp.
-            # Convertir la fecha de Cassandra a un rango para MongoDB
-            # Cassandra fecha es un objeto datetime, ya podemos usarlo directamente
-            mongo_query = {
-                "sucursal_id": row.idsucursal,
-                "fecha": {
-                    "$gte": datetime(row.fecha.year, row.fecha.month, row.fecha.day, row.fecha.hour, row.fecha.minute, row.fecha.second),
-                    "$lte": datetime(row.fecha.year, row.fecha.month, row.fecha.day, row.fecha.hour, row.fecha.minute, row.fecha.second)
-                },
-                "ticket_id": row.ticket_num
-            }
-            
-            mongo_ticket = mongo_ticket_collection.find_one(mongo_query)
-
-            if mongo_ticket:
-                found_matches = True
-                print("\n--- Coincidencia Encontrada ---")
-                print(f"MongoDB _id: {mongo_ticket['_id']}")
-                print(f"""Cassandra Data: 
+        found_matches = 0
+        for row, mongo_ticket in reconcile(cassandra_session, mongo_ticket_collection, sucursal_id, fecha_dt):
+            found_matches += 1
+            print("\n--- Coincidencia Encontrada ---")
+            print(f"MongoDB _id: {mongo_ticket['_id']}")
+            print(f"""Cassandra Data: 
                 sucursal = {row.idsucursal}
                 fecha = {row.fecha}
                 ticket num = {row.ticket_num}""")
-            # else:
-            #     print(f"No se encontró coincidencia en MongoDB para Cassandra ticket_num={row.ticket_num}")
 
-        if not found_matches:
+        if found_matches:
+            print(f"\nTotal de coincidencias: {found_matches}")
+        else:
             print(f"\nNo se encontraron coincidencias en MongoDB para los registros de Cassandra de la sucursal {sucursal_id} en la fecha {fecha_str}.")
 
     except Exception as e:
@@ -133,8 +156,8 @@ def main():
         if cassandra_session:
             cassandra_session.shutdown()
             print("\nConexión a Cassandra cerrada.")
-        if 'client' in locals() and client:
-            client.close()
+        if mongo_ticket_collection is not None:
+            mongo_ticket_collection.database.client.close()
             print("Conexión a MongoDB cerrada.")
 
 if __name__ == "__main__":
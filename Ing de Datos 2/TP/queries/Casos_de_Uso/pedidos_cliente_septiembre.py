@@ -1,12 +1,15 @@
 import subprocess
 import sys
-import json
-import re
-import os # Import os # Import tempfile
+import os
+from datetime import datetime
+
+# Runner compartido de los scripts JS (stream de documentos EJSON)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Auxiliares(no ejecutar directamente)'))
+from mongo_runner import run_js
 
 # --- CONFIGURACIÓN ---
-MONGO_QUERY_FILE = "/app/queries/Auxiliares(no ejecutar directamente)/consulta_tickets_cliente.js"
-MONGO_CONN = "mongosh mongodb://mongodb:27017/starbucks_transactions -u rootuser -p rootpassword --authenticationDatabase admin --quiet"
+MONGO_QUERY_FILE = "consulta_tickets_cliente.js"
+INDEX_NAME = "idx_cliente_fecha"  # { cliente_id: 1, fecha: -1 }, creado en setup/02_mongodb_init.js
 
 # Configuración de MySQL
 MYSQL_HOST = "mysql"
@@ -14,27 +17,6 @@ MYSQL_USER = "root"
 MYSQL_PASSWORD = "root_password"
 MYSQL_DATABASE = "my_data_warehouse"
 
-def run_command(command, input_data=None):
-    """Ejecuta un comando de shell y devuelve la salida stdout o levanta un error."""
-    try:
-        result = subprocess.run(
-            command,
-            input=input_data,
-            capture_output=True,
-            text=True,
-            check=True,
-            shell=True
-        )
-        return result.stdout.strip()
-    except subprocess.CalledProcessError as e:
-        print(f"\n--- ERROR DE EJECUCIÓN DEL COMANDO ---", file=sys.stderr)
-        print(f"Comando: {e.cmd}", file=sys.stderr)
-        print(f"Stderr: {e.stderr.strip()}", file=sys.stderr)
-        sys.exit(1)
-    except FileNotFoundError:
-        print("ERROR: Comando no encontrado (mongosh).", file=sys.stderr)
-        sys.exit(1)
-
 def validate_client_in_mysql(cliente_id):
     """Valida si un cliente_id existe en la base de datos MySQL."""
     print(f"\n--- Validando Cliente ID: {cliente_id} en MySQL ---")
@@ -82,77 +64,83 @@ def validate_client_in_mysql(cliente_id):
         print(f"ERROR inesperado durante la validación MySQL: {e}", file=sys.stderr)
         sys.exit(1)
 
-def get_tickets_by_client_id(cliente_id):
-    """Ejecuta la consulta de MongoDB inyectando el clienteId."""
-    print(f"\n--- Consultando Tickets para Cliente ID: {cliente_id} (Septiembre) ---")
-    
-    
-    # 1. Leer el script de consulta de MongoDB
+def get_tickets_by_client_id(cliente_id, anio, mes):
+    """Ejecuta la consulta de MongoDB inyectando el clienteId y el mes a consultar."""
+    periodo = f"{anio}-{mes:02d}"
+    print(f"\n--- Consultando Tickets para Cliente ID: {cliente_id} ({periodo}) ---")
+
     try:
-        with open(MONGO_QUERY_FILE, 'r') as f:
-            mongo_script_content = f.read()
-    except FileNotFoundError:
-        print(f"ERROR: No se encontró el archivo de consulta: {MONGO_QUERY_FILE}", file=sys.stderr)
+        cantidad = 0
+        # Los tickets llegan de a uno (con 'detalles' anidados intactos), sin bufferear la salida
+        for cantidad, ticket in enumerate(run_js(MONGO_QUERY_FILE, clienteId=cliente_id, anio=anio, mes=mes), start=1):
+            if cantidad == 1:
+                print(f"\nTickets en {periodo} para el cliente {cliente_id}:\n")
+            print(f"--- Ticket {cantidad}---")
+            print(f"{ticket}")
+    except FileNotFoundError as e:
+        print(f"ERROR: No se encontró {e.filename}.", file=sys.stderr)
+        sys.exit(1)
+    except RuntimeError as e:
+        print(f"\n--- ERROR DE EJECUCIÓN DE MONGOSH ---\n{e}", file=sys.stderr)
         sys.exit(1)
 
-    # 2. Inyectar la variable de Python en el script JS
-    mongo_script_with_vars = f"var clienteId = {cliente_id};\n{mongo_script_content}"
-    
-    # 3. Ejecutar mongosh y capturar la salida
-    command = f'{MONGO_CONN}'
-    mongo_output = run_command(command, input_data=mongo_script_with_vars)
+    if cantidad:
+        print(f"\nSe encontraron {cantidad} tickets en {periodo} para el cliente {cliente_id}.")
+    else:
+        print(f"\nNo se encontraron tickets para el cliente {cliente_id} en {periodo}.")
 
-    #debug
-    # print(mongo_output)
-    
-    # 4. Limpiar la salida y extraer solo los objetos JSON
-    # Expresión regular para eliminar el prompt y el ruido de terminal
-    clean_output = re.sub(r'starbucks_transactions>|\.{3}', '', mongo_output).strip()
-    
-    # Buscar todos los objetos de JavaScript (incluyendo los que están en múltiples líneas)
-    # y convertir las claves sin comillas a claves con comillas dobles para que json.loads funcione
-    js_objects = re.findall(r'\{[^{}]*\}', clean_output, re.DOTALL)
-    
-    tickets_encontrados = []
-    
-    for js_obj in js_objects:
-        try:
-            # Reemplazo de sintaxis JS (clave: valor) a JSON estricto ("clave": valor)
-            # Esto es un patrón común en el output de printjson
-            json_string = re.sub(r'(\w+):', r'"\1":', js_obj)
-            data = json.loads(json_string)
-            tickets_encontrados.append(data)
-        except json.JSONDecodeError as e:
-            # Ignorar si falla el parseo, ya que podría ser ruido que la regex no limpió
-            pass
 
-    # 5. Imprimir resultados
-    if tickets_encontrados:
-        print(f"\nSe encontraron {len(tickets_encontrados)} tickets en Septiembre para el cliente {cliente_id}:\n")
-        
-        # Imprimir la salida en un formato amigable
-        for i, ticket in enumerate(tickets_encontrados):
-            print(f"--- Ticket {i + 1}---")
-            print(f"{ticket}")
-            # Puedes añadir más detalles si es necesario
-    else:
-        print(f"\nNo se encontraron tickets para el cliente {cliente_id} en Septiembre.")
+def check_index_usage(cliente_id, anio, mes):
+    """
+    Corre la misma consulta con explain("executionStats") y verifica que el
+    plan ganador sea un IXSCAN sobre idx_cliente_fecha: sin COLLSCAN y sin
+    documentos leídos que después se descarten por filtro.
+    """
+    print(f"\n--- Plan de ejecución (explain) ---")
+    plan = list(run_js(MONGO_QUERY_FILE, clienteId=cliente_id, anio=anio, mes=mes, explainPlan=True))[0]
+    print(f"Etapas: {' -> '.join(reversed(plan['etapas']))} | Índices: {', '.join(plan['indices']) or '-'}")
+    print(f"Claves examinadas: {plan['totalKeysExamined']} | Documentos examinados: {plan['totalDocsExamined']} "
+          f"| Devueltos: {plan['nReturned']}")
+
+    usa_indice = 'IXSCAN' in plan['etapas'] and INDEX_NAME in plan['indices']
+    sin_filtro = 'COLLSCAN' not in plan['etapas'] and plan['totalDocsExamined'] == plan['nReturned']
+    if usa_indice and sin_filtro:
+        print(f"OK: el rango de fechas se resuelve con IXSCAN sobre {INDEX_NAME}.")
+        return True
+    print(f"ATENCIÓN: la consulta no está usando {INDEX_NAME} como se esperaba "
+          f"(¿falta crear el índice en 02_mongodb_init.js?).", file=sys.stderr)
+    return False
+
+
+def read_periodo():
+    """Lee el mes a consultar como AAAA-MM; vacío = septiembre del año actual."""
+    print("Ingrese el mes a consultar (AAAA-MM) o Enter para septiembre del año actual.")
+    texto = input().strip()
+    if not texto:
+        return datetime.now().year, 9
+    anio, mes = (int(parte) for parte in texto.split('-'))
+    if not 1 <= mes <= 12:
+        raise ValueError(f"Mes inválido: {mes}")
+    return anio, mes
 
 
 if __name__ == '__main__':
-    # El script espera el clienteId como primer argumento de línea de comandos
+    # Con --explain además se muestra el plan de ejecución de la consulta
     print("Ingrese un Cliente ID.")
     cliente_id_input = input()
     if cliente_id_input:
         try:
             cliente_id = int(cliente_id_input)
-            if validate_client_in_mysql(cliente_id):
-                get_tickets_by_client_id(cliente_id)
-            else:
-                print(f"Validación fallida para Cliente ID: {cliente_id}. No se consultará MongoDB.")
-        except ValueError:
-            print(f"ERROR: El Cliente ID debe ser un número entero. Recibido: {cliente_id_input}", file=sys.stderr)
+            anio, mes = read_periodo()
+        except ValueError as e:
+            print(f"ERROR: El Cliente ID debe ser un número entero y el mes AAAA-MM. ({e})", file=sys.stderr)
             sys.exit(1)
+        if validate_client_in_mysql(cliente_id):
+            get_tickets_by_client_id(cliente_id, anio, mes)
+            if '--explain' in sys.argv:
+                check_index_usage(cliente_id, anio, mes)
+        else:
+            print(f"Validación fallida para Cliente ID: {cliente_id}. No se consultará MongoDB.")
     else:
         print(f"Esperaba recibir un cliente_id, recibí: {cliente_id_input}", file=sys.stderr)
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
@@ -1,17 +1,166 @@
-import redis
+"""
+Inspector del keyspace de Redis.
+
+Recorre las claves de a páginas con SCAN (sin bloquear el servidor como
+KEYS *) y por cada página manda TYPE / PTTL / MEMORY USAGE en un solo
+pipeline. De las colecciones grandes solo se muestra una muestra
+(HSCAN / SSCAN / ZSCAN / LRANGE acotado), y al final se imprime un resumen
+de memoria por prefijo (session:*, user:*, last_ticket:*, ...).
+
+    python3 prueba_redis.py
+    python3 prueba_redis.py --match 'user:*' --show 5 --sample 3
+"""
 import json
+import argparse
+from collections import Counter, defaultdict
+
+import redis
+
+DEFAULT_PREFIXES = ('session:', 'user:', 'last_ticket:')
+VALUE_PREVIEW_BYTES = 200  # de los strings solo se trae el comienzo (GETRANGE)
+
+
+def scan_pages(r, match, count):
+    """Devuelve las claves de a una página de SCAN por vez."""
+    cursor = 0
+    while True:
+        cursor, keys = r.scan(cursor=cursor, match=match, count=count)
+        if keys:
+            yield keys
+        if cursor == 0:
+            break
+
+
+def describe_page(r, keys):
+    """TYPE, PTTL y MEMORY USAGE de toda la página en un único round-trip."""
+    pipe = r.pipeline(transaction=False)
+    for key in keys:
+        pipe.type(key)
+        pipe.pttl(key)
+        pipe.memory_usage(key)
+    results = pipe.execute(raise_on_error=False)
+    for i, key in enumerate(keys):
+        key_type, pttl, memory = results[3 * i:3 * i + 3]
+        # La clave pudo expirar entre el SCAN y el pipeline, o MEMORY USAGE no estar permitido
+        memory = memory if isinstance(memory, int) else 0
+        pttl = pttl if isinstance(pttl, int) else -2
+        yield key, key_type, pttl, memory
+
+
+def prefix_of(key, prefixes):
+    for prefix in prefixes:
+        if key.startswith(prefix):
+            return prefix
+    return key.split(':', 1)[0] + ':' if ':' in key else '(sin prefijo)'
+
+
+def sample_value(r, key, key_type, sample, raw=None):
+    """
+    Tamaño y una muestra acotada del valor, sin traer la colección completa.
+    El comienzo de los strings se lee con `raw` (cliente sin decode_responses):
+    GETRANGE puede cortar un carácter UTF-8 a la mitad, o el valor ser binario
+    (p. ej. un HyperLogLog), y se decodifica reemplazando lo inválido.
+    """
+    if key_type == 'string':
+        value = (raw or r).getrange(key, 0, VALUE_PREVIEW_BYTES - 1)
+        if isinstance(value, bytes):
+            value = value.decode('utf-8', errors='replace')
+        try:
+            return r.strlen(key), json.loads(value)
+        except (json.JSONDecodeError, TypeError):
+            return r.strlen(key), value
+    if key_type == 'hash':
+        _, fields = r.hscan(key, cursor=0, count=sample)
+        return r.hlen(key), dict(list(fields.items())[:sample])
+    if key_type == 'set':
+        _, members = r.sscan(key, cursor=0, count=sample)
+        return r.scard(key), members[:sample]
+    if key_type == 'zset':
+        _, members = r.zscan(key, cursor=0, count=sample)
+        return r.zcard(key), members[:sample]
+    if key_type == 'list':
+        return r.llen(key), r.lrange(key, 0, sample - 1)
+    if key_type == 'stream':
+        return r.xlen(key), [entry_id for entry_id, _ in r.xrange(key, count=sample)]
+    return None, f"(Tipo de dato '{key_type}' no manejado para visualización detallada)"
+
+
+def format_ttl(pttl):
+    if pttl == -1:
+        return "(Sin expiración)"
+    if pttl == -2:
+        return "(Expirada)"
+    return f"(TTL: {pttl / 1000:.0f}s)"
+
+
+def format_bytes(n):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if n < 1024 or unit == 'GB':
+            return f"{n:.0f}{unit}" if unit == 'B' else f"{n:.1f}{unit}"
+        n /= 1024
+
+
+def inspect_keyspace(r, match='*', count=500, show=20, sample=5, prefixes=DEFAULT_PREFIXES, raw=None):
+    summary = defaultdict(lambda: {'keys': 0, 'bytes': 0, 'sin_ttl': 0, 'tipos': Counter()})
+    shown = 0
+
+    print("--- Contenido de la Base de Datos (muestra) ---")
+    for keys in scan_pages(r, match, count):
+        for key, key_type, pttl, memory in describe_page(r, keys):
+            if pttl == -2:
+                continue
+            stats = summary[prefix_of(key, prefixes)]
+            stats['keys'] += 1
+            stats['bytes'] += memory
+            stats['sin_ttl'] += pttl == -1
+            stats['tipos'][key_type] += 1
 
-def test_redis_connection_and_data():
+            if shown < show:
+                shown += 1
+                print(f"\n> Clave: '{key}' | Tipo: {key_type} {format_ttl(pttl)} | Memoria: {format_bytes(memory)}")
+                try:
+                    size, value = sample_value(r, key, key_type, sample, raw)
+                    size_str = f", {size} elementos" if size is not None and key_type != 'string' else ""
+                    if isinstance(value, (dict, list)):
+                        print(f"  Muestra{size_str}:")
+                        print(json.dumps(value, indent=2, ensure_ascii=False, default=str))
+                    else:
+                        print(f"  Valor{size_str}: {value}")
+                except (redis.exceptions.RedisError, UnicodeDecodeError) as e:
+                    # UnicodeDecodeError: miembros binarios de una colección (el cliente decodifica UTF-8)
+                    print(f"  Error al obtener el valor de la clave '{key}': {e}")
+
+    if not summary:
+        print("No hay claves que coincidan con el patrón.")
+        return summary
+
+    # Los prefijos pedidos aparecen siempre, aunque no tengan claves
+    for prefix in prefixes:
+        summary.setdefault(prefix, summary.default_factory())
+
+    print("\n--- Resumen de Memoria por Prefijo ---")
+    print(f"{'Prefijo':<20} | {'Claves':>8} | {'Memoria':>10} | {'Prom.':>8} | {'Sin TTL':>7} | Tipos")
+    print("-" * 80)
+    for prefix, stats in sorted(summary.items(), key=lambda item: -item[1]['bytes']):
+        avg = stats['bytes'] / stats['keys'] if stats['keys'] else 0
+        tipos = ", ".join(f"{t}={n}" for t, n in stats['tipos'].most_common())
+        print(f"{prefix:<20} | {stats['keys']:>8} | {format_bytes(stats['bytes']):>10} | "
+              f"{format_bytes(avg):>8} | {stats['sin_ttl']:>7} | {tipos}")
+    return summary
+
+
+def test_redis_connection_and_data(host='redis_cache', port=6379, **options):
     """
-    Se conecta a Redis, verifica la conexión y muestra todas las claves y sus valores.
+    Se conecta a Redis, verifica la conexión y recorre el keyspace con SCAN.
     """
     try:
         # Conexión al servidor de Redis
-        r = redis.Redis(host='redis_cache', port=6379, db=0, decode_responses=True)
+        r = redis.Redis(host=host, port=port, db=0, decode_responses=True)
         r.ping()
+        raw = redis.Redis(host=host, port=port, db=0)  # bytes, para las vistas previas de strings
         print("--- Conexión a Redis exitosa ---\n")
     except redis.exceptions.ConnectionError as e:
-        print(f"Error: No se pudo conectar a Redis en 'redis_cache:6379'.")
+        print(f"Error: No se pudo conectar a Redis en '{host}:{port}'.")
         print(f"Detalle: {e}")
         print("Asegúrate de que el contenedor de Redis esté corriendo y sea accesible.")
         return
@@ -23,55 +172,22 @@ def test_redis_connection_and_data():
     print(f"Memoria Usada: {info.get('used_memory_human')}")
     print(f"Número de Claves: {info.get('db0', {}).get('keys', 'N/A')}\n")
 
-    # Escanear y mostrar todas las claves
-    print("--- Contenido de la Base de Datos (Clave por Clave) ---")
-    keys = r.keys('*')
-    if not keys:
-        print("La base de datos de Redis está vacía.")
-    else:
-        for key in keys:
-            key_type = r.type(key)
-            ttl = r.ttl(key)
-            ttl_str = f"(TTL: {ttl}s)" if ttl != -1 else "(Sin expiración)"
-
-            print(f"\n> Clave: '{key}' | Tipo: {key_type} {ttl_str}")
-
-            try:
-                if key_type == 'string':
-                    value = r.get(key)
-                    # Intentar decodificar como JSON para una mejor visualización
-                    try:
-                        parsed_json = json.loads(value)
-                        print("  Valor (JSON):")
-                        print(json.dumps(parsed_json, indent=2))
-                    except (json.JSONDecodeError, TypeError):
-                        print(f"  Valor: {value}")
-                
-                elif key_type == 'hash':
-                    value = r.hgetall(key)
-                    print("  Valor (Hash):")
-                    for field, val in value.items():
-                        print(f"    - {field}: {val}")
-                
-                elif key_type == 'list':
-                    value = r.lrange(key, 0, -1)
-                    print(f"  Valor (Lista, {len(value)} elementos): {value}")
-
-                elif key_type == 'set':
-                    value = r.smembers(key)
-                    print(f"  Valor (Set, {len(value)} elementos): {value}")
-
-                elif key_type == 'zset':
-                    value = r.zrange(key, 0, -1, withscores=True)
-                    print(f"  Valor (Sorted Set, {len(value)} elementos): {value}")
-
-                else:
-                    print(f"  (Tipo de dato '{key_type}' no manejado para visualización detallada)")
-
-            except Exception as e:
-                print(f"  Error al obtener el valor de la clave '{key}': {e}")
+    inspect_keyspace(r, raw=raw, **options)
 
     print("\n--- Fin del script de prueba de Redis ---")
 
+
 if __name__ == "__main__":
-    test_redis_connection_and_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='redis_cache')
+    parser.add_argument('--port', type=int, default=6379)
+    parser.add_argument('--match', default='*', help='patrón de SCAN MATCH')
+    parser.add_argument('--count', type=int, default=500, help='sugerencia de claves por página (SCAN COUNT)')
+    parser.add_argument('--show', type=int, default=20, help='claves a mostrar en detalle')
+    parser.add_argument('--sample', type=int, default=5, help='elementos de muestra por colección')
+    parser.add_argument('--prefix', action='append', dest='prefixes',
+                        help='prefijo a resumir (repetible); por defecto session:, user: y last_ticket:')
+    args = parser.parse_args()
+
+    test_redis_connection_and_data(args.host, args.port, match=args.match, count=args.count, show=args.show,
+                                   sample=args.sample, prefixes=tuple(args.prefixes or DEFAULT_PREFIXES))
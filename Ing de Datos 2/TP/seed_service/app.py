@@ -1,20 +1,54 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import JSONResponse, Response
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 from pydantic import BaseModel
-import random
-import time
 import os
-import mysql.connector
-import redis
-import pymongo
+import time
 import logging
-from cassandra.cluster import Cluster
-from neo4j import GraphDatabase
-from datetime import datetime
+from collections import defaultdict
+
+from connections import connections, env_int
+from orders import build_order, productos_sucursal
+import sinks
+from reference_cache import refdata, publish_invalidation
+from outbox import outbox, OutboxFull
+from ticket_ids import ticket_ids
+import stock
+import metrics
+from stock import OutOfStock
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-app = FastAPI(title="Seed Service")
+BATCH_MAX = env_int('BATCH_MAX', 1_000_000)     # tope de órdenes por llamada a /generate-orders
+BATCH_CHUNK = env_int('BATCH_CHUNK', 1000)      # órdenes por escritura en bloque
+# 'outbox': el request solo escribe MySQL + Redis Stream y los workers drenan al resto.
+# 'sync': el request escribe directamente en los cinco stores.
+WRITE_MODE = os.environ.get('WRITE_MODE', 'outbox')
+# > 0: cuando a una sucursal no le alcanza el stock se repone hasta este nivel y se reintenta
+# una vez. Con 0 (por defecto) el stock solo baja y las órdenes sin stock responden 409.
+RESTOCK_LEVEL = env_int('RESTOCK_LEVEL', 0)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Un único set de conexiones por proceso, en lugar de abrirlas en cada request
+    connections.start()
+    ticket_ids.start()
+    refdata.start_listener()
+    if WRITE_MODE == 'outbox':
+        outbox.start()
+    yield
+    outbox.stop()
+    refdata.stop_listener()
+    ticket_ids.stop()
+    sinks.shutdown()
+    connections.close()
+
+
+app = FastAPI(title="Seed Service", lifespan=lifespan)
+metrics.register_collector(refdata, outbox, ticket_ids)
 
 
 class GenerateRequest(BaseModel):
@@ -23,229 +57,198 @@ class GenerateRequest(BaseModel):
     sucursal_id: int | None = None
 
 
-def get_mysql_conn():
-    return mysql.connector.connect(host=os.environ.get('MYSQL_HOST','mysql'),
-                                   user=os.environ.get('MYSQL_USER','root'),
-                                   password=os.environ.get('MYSQL_PASS','root_password'),
-                                   database=os.environ.get('MYSQL_DB','my_data_warehouse'))
+@app.get('/health')
+def health():
+    report = connections.health()
+    status = 200 if all(r['ok'] for r in report.values()) else 503
+    return JSONResponse(status_code=status, content=report)
 
 
-def get_redis_conn():
-    try:
-        return redis.Redis(host=os.environ.get('REDIS_HOST','redis'), port=int(os.environ.get('REDIS_PORT',6379)), db=0, socket_connect_timeout=2)
-    except Exception:
-        return None
+@app.get('/metrics')
+def prometheus_metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
-def get_mongo_conn():
-    try:
-        client = pymongo.MongoClient(host=os.environ.get('MONGO_HOST', 'mongodb'),
-                                     port=int(os.environ.get('MONGO_PORT', 27017)),
-                                     username=os.environ.get('MONGO_USER', 'rootuser'),
-                                     password=os.environ.get('MONGO_PASS', 'rootpassword'),
-                                     authSource='admin')
-        return client[os.environ.get('MONGO_DB', 'starbucks_transactions')]
-    except Exception as e:
-        logging.error(f"Could not connect to MongoDB: {e}")
-        return None
 
-def get_cassandra_conn():
-    try:
-        cluster = Cluster([os.environ.get('CASSANDRA_HOST', 'cassandra')])
-        session = cluster.connect()
-        return session
-    except Exception as e:
-        logging.error(f"Could not connect to Cassandra: {e}")
-        return None
+@app.get('/cache/stats')
+def cache_stats():
+    return refdata.stats()
+
+
+@app.post('/cache/invalidate')
+def cache_invalidate():
+    # Avisamos por pub/sub para que se enteren todos los workers, no solo este
+    receivers = publish_invalidation()
+    if not receivers:
+        refdata.invalidate()
+    return {'receivers': receivers}
 
-def get_neo4j_driver():
+
+@app.get('/outbox/stats')
+def outbox_stats():
+    return outbox.stats()
+
+
+@app.post('/stock/restock')
+def stock_restock(level: int = Query(100, ge=1), sucursal_id: int | None = None):
+    """Repone a `level` unidades cada (sucursal, producto) que esté por debajo."""
+    with connections.mysql() as conn:
+        rows = stock.restock(conn, level, [sucursal_id] if sucursal_id else None)
+    # Las sucursales repuestas vuelven a elegirse: recargan todos los workers
+    if not publish_invalidation():
+        refdata.invalidate()
+    return {'level': level, 'sucursal_id': sucursal_id, 'rows': rows}
+
+
+def restock_if_enabled(conn, sucursal_ids):
+    """Repone a RESTOCK_LEVEL las sucursales dadas si el modo está activo. Devuelve si repuso."""
+    sucursal_ids = [s for s in sucursal_ids if s is not None]
+    if RESTOCK_LEVEL <= 0 or not sucursal_ids:
+        return False
     try:
-        driver = GraphDatabase.driver(f"bolt://{os.environ.get('NEO4J_HOST', 'neo4j')}:7687",
-                                      auth=(os.environ.get('NEO4J_USER', 'neo4j'), os.environ.get('NEO4J_PASS', 'neo4jpassword')))
-        return driver
+        stock.restock(conn, RESTOCK_LEVEL, sucursal_ids)
     except Exception as e:
-        logging.error(f"Could not connect to Neo4j: {e}")
-        return None
+        logging.error(f"Could not restock sucursales {sucursal_ids}: {e}")
+        return False
+    metrics.RESTOCKS.inc(len(sucursal_ids))
+    refdata.invalidate()
+    return True
+
+
+def write_orders(conn, orders, stock_reserved=False):
+    """
+    Escribe las órdenes según WRITE_MODE y devuelve el resultado por sink.
+    Con `stock_reserved` el stock ya se descontó y MySQL no se vuelve a tocar.
+    """
+    skip = ('MySQL',) if stock_reserved else ()
+    if WRITE_MODE != 'outbox':
+        return sinks.write_all(conn, orders, skip=skip)
+    start = time.perf_counter()
+    results = {}
+    if not stock_reserved:
+        results['MySQL'] = sinks.run_sink('MySQL', sinks.write_mysql_stock, conn, orders)
+    results['outbox'] = sinks.run_sink('outbox', outbox.publish, orders)
+    if not results['outbox']['ok']:
+        # Sin outbox (Redis caído) escribimos directo para no perder la orden
+        direct, _ = sinks.write_all(conn, orders, skip=('MySQL',))
+        results.update(direct)
+    return results, round((time.perf_counter() - start) * 1000, 2)
+
+
+def pick_ids(req, conn):
+    # `conn` es la conexión del request: con el cache vacío se carga con ella y no con otra del pool
+    cliente_id = req.cliente_id if req and req.cliente_id else refdata.random_cliente(conn)
+    sucursal_id = req.sucursal_id if req and req.sucursal_id else refdata.random_sucursal(conn)
+    return cliente_id, sucursal_id
 
 
 @app.post('/generate-order')
 def generate_order(req: GenerateRequest | None = None):
+    if WRITE_MODE == 'outbox':
+        try:
+            outbox.check_capacity()
+        except OutboxFull as e:
+            metrics.ORDERS_REJECTED.labels('backpressure').inc()
+            raise HTTPException(status_code=503, detail=str(e), headers={'Retry-After': '1'})
+
     # Build an order JSON using MySQL data; guarantee product_id not null
-    conn = None
-    try:
-        conn = get_mysql_conn()
+    with connections.mysql() as conn:
         cur = conn.cursor()
-
-        rconn = get_redis_conn()
-        ticket_id = None
-        if rconn:
-            try:
-                ticket_id = int(rconn.incr('ticket_seq'))
-            except Exception:
-                ticket_id = None
-
-        # clientes
-        if req and req.cliente_id:
-            cliente_id = req.cliente_id
-        else:
-            cur.execute('SELECT id FROM Cliente')
-            rows = cur.fetchall()
-            cliente_id = random.choice([r[0] for r in rows]) if rows else None
-
-        # sucursal
-        if req and req.sucursal_id:
-            sucursal_id = req.sucursal_id
-        else:
-            cur.execute('SELECT id FROM Sucursal')
-            rows = cur.fetchall()
-            sucursal_id = random.choice([r[0] for r in rows]) if rows else None
-
-        # productos disponibles en la sucursal
-        productos = []
-        if sucursal_id is not None:
-            cur.execute('''
-                SELECT p.id, p.nombre, p.precio, s.cantidad
-                FROM Producto p
-                JOIN Stock s ON p.id = s.idProducto
-                WHERE s.idSucursal = %s AND s.cantidad > 0
-            ''', (sucursal_id,))
-            productos = [{'id': r[0], 'nombre': r[1], 'precio': float(r[2]), 'cantidad': r[3]} for r in cur.fetchall()]
-
-        # fallback a cualquier producto
-        if not productos:
-            cur.execute('SELECT id, nombre, precio FROM Producto')
-            productos = [{'id': r[0], 'nombre': r[1], 'precio': float(r[2]), 'cantidad': 999} for r in cur.fetchall()]
-
-        # elegir 1..3 items
-        items = []
-        if productos:
-            pool = productos.copy()
-            num_items = min(len(pool), random.randint(1,3))
-            for _ in range(num_items):
-                p = random.choice(pool)
-                qty = 1
-                if p.get('cantidad') and p['cantidad'] > 1:
-                    qty = random.randint(1, min(3, p['cantidad']))
-                items.append({'product_id': int(p['id']), 'nombre': p['nombre'], 'cantidad': int(qty), 'precio': round(p['precio'] * qty, 2)})
-                pool = [x for x in pool if x['id'] != p['id']]
-
-        # total
-        total = round(sum([it['precio'] for it in items]), 2)
-
-        # promocion random
-        promocion_id = None
-        try:
-            cur.execute('SELECT id FROM Promocion')
-            pr = cur.fetchall()
-            if pr:
-                promocion_id = int(random.choice(pr)[0])
-        except Exception:
-            promocion_id = None
-
-        metodo_pago = random.choice(['Efectivo','Tarjeta','MercadoPago'])
-
-        # If ticket_id not obtained via Redis, fallback to timestamp-based.
-        if ticket_id is None:
-            ticket_id = int(time.time() * 1000)
-        
-        fecha_str = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
-        fecha_dt = datetime.fromisoformat(fecha_str.replace('Z', '+00:00'))
-
-
-        order = {
-            'ticket_id': ticket_id,
-            'sucursal_id': int(sucursal_id) if sucursal_id is not None else None,
-            'cliente_id': int(cliente_id) if cliente_id is not None else None,
-            'fecha': fecha_str,
-            'total': total,
-            'metodo_pago': metodo_pago,
-            'promocion_id': promocion_id,
-            'detalles': items
-        }
-
-        # Insert into MongoDB
-        mongo_db = get_mongo_conn()
-        if mongo_db is not None:
-            try:
-                # MongoDB wants datetime objects for ISODate
-                order_for_mongo = order.copy()
-                order_for_mongo['fecha'] = fecha_dt
-                result = mongo_db.ticket.insert_one(order_for_mongo)
-                logging.info(f"Inserted order {result.inserted_id} into MongoDB.")
-            except Exception as e:
-                logging.error(f"Failed to insert order into MongoDB: {e}")
-
-        # Insert into Cassandra
-        cassandra_session = get_cassandra_conn()
-        if cassandra_session is not None:
-            try:
-                cql = "INSERT INTO starbucks_analytics.historialcompra (idSucursal, fecha, ticket_num) VALUES (%s, %s, %s)"
-                cassandra_session.execute(cql, (sucursal_id, fecha_dt, ticket_id))
-                logging.info(f"Inserted order {ticket_id} into Cassandra.")
-            except Exception as e:
-                logging.error(f"Failed to insert order into Cassandra: {e}")
-            finally:
-                cassandra_session.cluster.shutdown()
-
-        # Update MySQL Stock
+        with metrics.phase('reference_data'):
+            ticket_id = ticket_ids.allocate(1)[0]
+            cliente_id, sucursal_id = pick_ids(req, conn)
+        with metrics.phase('mysql_read'):
+            productos = productos_sucursal(cur, sucursal_id)
+            if not productos and restock_if_enabled(conn, [sucursal_id]):
+                productos = productos_sucursal(cur, sucursal_id)
+        with metrics.phase('build'):
+            order = build_order(ticket_id, cliente_id, sucursal_id, productos, conn=conn)
+        cur.close()
+
+        # Reservamos el stock antes de publicar la orden en el resto de los stores
+        reserve_start = time.perf_counter()
         try:
-            cur2 = conn.cursor()
-            for it in items:
-                pid = it.get('product_id')
-                qty = it.get('cantidad', 1)
-                if pid is not None:
-                    cur2.execute('UPDATE Stock SET cantidad = GREATEST(0, cantidad - %s) WHERE idSucursal = %s AND idProducto = %s', (qty, sucursal_id, pid))
-            conn.commit()
-            logging.info(f"Updated stock in MySQL for ticket {ticket_id}.")
-            cur2.close()
-        except Exception as e:
-            logging.error(f"Failed to update stock in MySQL: {e}")
-
-        # Update Neo4j
-        neo4j_driver = get_neo4j_driver()
-        if neo4j_driver is not None:
-            try:
-                with neo4j_driver.session() as s:
-                    # First, ensure the client exists
-                    s.run("MERGE (c:Cliente {id: $id}) SET c.last_seen = $ts, c.name = coalesce(c.name, $name)", 
-                          id=cliente_id, ts=fecha_str, name=f'Cliente {cliente_id}')
-                    
-                    # Then, create the purchase relationships for each product in the order
-                    for item in items:
-                        s.run("""
-                            MERGE (c:Cliente {id: $cliente_id})
-                            MERGE (p:Producto {id: $product_id})
-                            ON CREATE SET p.nombre = $product_name
-                            CREATE (c)-[:COMPRO {ticket_id: $ticket_id, fecha: $fecha, cantidad: $cantidad}]->(p)
-                        """, {
-                            "cliente_id": cliente_id,
-                            "product_id": item['product_id'],
-                            "product_name": item['nombre'],
-                            "ticket_id": ticket_id,
-                            "fecha": fecha_str,
-                            "cantidad": item['cantidad']
-                        })
-                    logging.info(f"Created purchase relationships in Neo4j for ticket {ticket_id}.")
-            except Exception as e:
-                logging.error(f"Failed to update Neo4j: {e}")
-            finally:
-                neo4j_driver.close()
-
-        # Update Redis
-        if rconn is not None:
-            try:
-                rconn.set(f'last_ticket:sucursal:{sucursal_id}', ticket_id)
-                rconn.incr('counter:tickets')
-                logging.info(f"Updated Redis for ticket {ticket_id}.")
-            except Exception as e:
-                logging.error(f"Failed to update Redis: {e}")
-
-
-        return order
-
-    finally:
-        try:
-            if conn:
-                conn.close()
-        except Exception:
-            pass
-
+            with metrics.phase('reserve'):
+                try:
+                    stock.reserve(conn, sucursal_id, order['detalles'])
+                except OutOfStock:
+                    # Otra orden se llevó el stock entre la lectura y la reserva
+                    if not order['detalles'] or not restock_if_enabled(conn, [sucursal_id]):
+                        raise
+                    stock.reserve(conn, sucursal_id, order['detalles'])
+        except OutOfStock as e:
+            metrics.ORDERS_REJECTED.labels('out_of_stock').inc()
+            if not productos:
+                # La sucursal se quedó sin stock: que el cache deje de elegirla
+                refdata.invalidate()
+            raise HTTPException(status_code=409, detail=str(e))
+        reserve_ms = round((time.perf_counter() - reserve_start) * 1000, 2)
+
+        with metrics.phase('write'):
+            results, write_ms = write_orders(conn, [order], stock_reserved=True)
+        results['MySQL'] = {'ok': True, 'ms': reserve_ms}
+
+    metrics.ORDERS.labels('generate-order').inc()
+
+    return dict(order, sinks=results, write_ms=write_ms)
+
+
+@app.post('/generate-orders')
+def generate_orders(count: int = Query(100, ge=1, le=BATCH_MAX), req: GenerateRequest | None = None):
+    """Genera `count` órdenes en memoria y las escribe en bloques de BATCH_CHUNK."""
+    start = time.perf_counter()
+    totals = defaultdict(lambda: {'ok': 0, 'failed': 0, 'ms': 0.0})
+    tickets = ticket_ids.allocate(count)
+
+    with connections.mysql() as conn:
+        cur = conn.cursor()
+        disponible = {}  # stock por sucursal, leído una vez por lote
+        rejected_count = 0
+        for offset in range(0, count, BATCH_CHUNK):
+            if WRITE_MODE == 'outbox':
+                outbox.wait_for_capacity()
+            orders = []
+            for ticket_id in tickets[offset:offset + BATCH_CHUNK]:
+                cliente_id, sucursal_id = pick_ids(req, conn)
+                if sucursal_id not in disponible:
+                    disponible[sucursal_id] = productos_sucursal(cur, sucursal_id)
+                    if not disponible[sucursal_id] and restock_if_enabled(conn, [sucursal_id]):
+                        disponible[sucursal_id] = productos_sucursal(cur, sucursal_id)
+                orders.append(build_order(ticket_id, cliente_id, sucursal_id, disponible[sucursal_id], conn=conn))
+
+            # Misma reserva con guarda que /generate-order: lo que no alcanza se descarta
+            reserve_start = time.perf_counter()
+            orders, rejected = stock.reserve_batch(conn, orders)
+            if rejected and restock_if_enabled(conn, {o['sucursal_id'] for o in rejected if o['detalles']}):
+                retried, rejected = stock.reserve_batch(conn, rejected)
+                orders.extend(retried)
+            reserve_ms = round((time.perf_counter() - reserve_start) * 1000, 2)
+            if rejected:
+                rejected_count += len(rejected)
+                metrics.ORDERS_REJECTED.labels('out_of_stock').inc(len(rejected))
+                # El snapshot de este lote ya no es confiable: se relee en el próximo
+                disponible.clear()
+                refdata.invalidate()
+            if not orders:
+                continue
+
+            results, _ = write_orders(conn, orders, stock_reserved=True)
+            results['MySQL'] = {'ok': True, 'ms': reserve_ms}
+            for name, result in results.items():
+                totals[name]['ok' if result['ok'] else 'failed'] += len(orders)
+                totals[name]['ms'] = round(totals[name]['ms'] + result['ms'], 2)
+        cur.close()
+
+    written = count - rejected_count
+    metrics.ORDERS.labels('generate-orders').inc(written)
+    elapsed = time.perf_counter() - start
+    logging.info(f"Generated {written} orders in {elapsed:.2f}s ({written / elapsed:.0f} orders/s), "
+                 f"{rejected_count} rejected for lack of stock.")
+    return {
+        'count': written,
+        'rejected_out_of_stock': rejected_count,
+        'first_ticket': tickets[0],
+        'last_ticket': tickets[-1],
+        'seconds': round(elapsed, 3),
+        'orders_per_second': round(written / elapsed, 1),
+        'sinks': totals,
+    }
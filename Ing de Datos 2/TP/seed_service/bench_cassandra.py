@@ -0,0 +1,78 @@
+"""
+Benchmark de inserts en historialcompra_v2.
+
+Compara, con las mismas filas:
+  - simple:     un session.execute por fila con CQL de texto y %s (lo que se hacía antes)
+  - prepared:   un session.execute por fila con el statement preparado
+  - concurrent: CassandraDAO.execute_many (preparado + execute_concurrent_with_args)
+
+Las filas van a una sucursal ficticia (BENCH_SUCURSAL) y se borran al final.
+
+    docker compose exec seed_service python bench_cassandra.py --rows 20000 --concurrency 64
+"""
+import json
+import time
+import argparse
+from datetime import datetime, timedelta, timezone
+
+import historial
+from connections import connections
+
+BENCH_SUCURSAL = -1
+SIMPLE_INSERT = (f"INSERT INTO {historial.KEYSPACE}.{historial.TABLE} (idSucursal, dia, fecha, ticket_num) "
+                 "VALUES (%s, %s, %s, %s)")
+DELETE_DIA = f"DELETE FROM {historial.KEYSPACE}.{historial.TABLE} WHERE idSucursal = ? AND dia = ?"
+
+
+def bench_rows(count, offset):
+    """Filas distintas por modo (offset) repartidas en unos pocos días."""
+    base = datetime(2000, 1, 1, tzinfo=timezone.utc)
+    return [historial.row_params(BENCH_SUCURSAL, base + timedelta(seconds=i * 7), offset + i)
+            for i in range(count)]
+
+
+def run(mode, dao, rows, concurrency):
+    start = time.perf_counter()
+    if mode == 'simple':
+        for params in rows:
+            dao.session.execute(SIMPLE_INSERT, params)
+    elif mode == 'prepared':
+        stmt = dao.prepare(historial.INSERT_CQL)
+        for params in rows:
+            dao.session.execute(stmt, params)
+    else:
+        dao.execute_many(historial.INSERT_CQL, rows, concurrency=concurrency)
+    elapsed = time.perf_counter() - start
+    return {'mode': mode, 'rows': len(rows), 'seconds': round(elapsed, 3),
+            'inserts_per_sec': round(len(rows) / elapsed, 1) if elapsed else None}
+
+
+def cleanup(dao, rows):
+    dias = {params[1] for params in rows}
+    dao.execute_many(DELETE_DIA, [(BENCH_SUCURSAL, dia) for dia in dias])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=['simple', 'prepared', 'concurrent', 'all'], default='all')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    args = parser.parse_args()
+
+    dao = connections.cassandra_statements()
+    if dao is None:
+        raise SystemExit("Cassandra is not available")
+    modes = ['simple', 'prepared', 'concurrent'] if args.mode == 'all' else [args.mode]
+    written = []
+    try:
+        for i, mode in enumerate(modes):
+            rows = bench_rows(args.rows, offset=i * args.rows)
+            written.extend(rows)
+            print(json.dumps(run(mode, dao, rows, args.concurrency)))
+    finally:
+        cleanup(dao, written)
+        connections.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark de contención sobre el stock de una sola sucursal.
+
+Muchos threads reservan tickets contra la misma sucursal y se compara:
+  - set:    stock.reserve (una sentencia por ticket, rechaza si no alcanza)
+  - legacy: lectura de disponibilidad + un UPDATE GREATEST(...) por item
+
+Al final se verifica que no se haya vendido de más y se restaura el stock.
+La concurrencia real está acotada por MYSQL_POOL_SIZE.
+
+    docker compose exec -e MYSQL_POOL_SIZE=32 seed_service python bench_stock.py --sucursal 2 --threads 32 --orders 200
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from collections import Counter
+
+import stock
+from connections import connections
+
+
+def legacy_reserve(conn, sucursal_id, items):
+    """Lo que hacía generate_order: leer, y después un UPDATE por item sin lock entre medio."""
+    cur = conn.cursor()
+    for it in items:
+        cur.execute('SELECT cantidad FROM Stock WHERE idSucursal = %s AND idProducto = %s', (sucursal_id, it['product_id']))
+        row = cur.fetchone()
+        if not row or row[0] < it['cantidad']:
+            conn.rollback()
+            cur.close()
+            raise stock.OutOfStock()
+    for it in items:
+        cur.execute('UPDATE Stock SET cantidad = GREATEST(0, cantidad - %s) WHERE idSucursal = %s AND idProducto = %s',
+                    (it['cantidad'], sucursal_id, it['product_id']))
+    conn.commit()
+    cur.close()
+
+
+def read_stock(sucursal_id):
+    with connections.mysql() as conn:
+        cur = conn.cursor()
+        cur.execute('SELECT idProducto, cantidad FROM Stock WHERE idSucursal = %s', (sucursal_id,))
+        rows = dict(cur.fetchall())
+        cur.close()
+        conn.commit()
+    return rows
+
+
+def set_stock(sucursal_id, cantidades):
+    with connections.mysql() as conn:
+        cur = conn.cursor()
+        cur.executemany('UPDATE Stock SET cantidad = %s WHERE idSucursal = %s AND idProducto = %s',
+                        [(qty, sucursal_id, pid) for pid, qty in cantidades.items()])
+        conn.commit()
+        cur.close()
+
+
+def run(mode, sucursal_id, productos, threads, orders_per_thread):
+    reserve = stock.reserve if mode == 'set' else legacy_reserve
+    accepted = Counter()
+    counts = Counter()
+    lock = threading.Lock()
+
+    def worker():
+        local_accepted, local_counts = Counter(), Counter()
+        for _ in range(orders_per_thread):
+            items = [{'product_id': pid, 'cantidad': random.randint(1, 3)}
+                     for pid in random.sample(productos, min(len(productos), random.randint(1, 3)))]
+            try:
+                with connections.mysql() as conn:
+                    reserve(conn, sucursal_id, items)
+                local_counts['accepted'] += 1
+                for it in items:
+                    local_accepted[it['product_id']] += it['cantidad']
+            except stock.OutOfStock:
+                local_counts['refused'] += 1
+            except Exception:
+                local_counts['errors'] += 1
+        with lock:
+            accepted.update(local_accepted)
+            counts.update(local_counts)
+
+    start = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return accepted, counts, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sucursal', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--orders', type=int, default=200, help='tickets por thread')
+    parser.add_argument('--initial', type=int, default=500, help='stock inicial por producto durante la prueba')
+    parser.add_argument('--mode', choices=['set', 'legacy', 'both'], default='both')
+    args = parser.parse_args()
+
+    original = read_stock(args.sucursal)
+    if not original:
+        raise SystemExit(f"La sucursal {args.sucursal} no tiene stock cargado.")
+    productos = sorted(original)
+    report = {}
+    try:
+        for mode in (['set', 'legacy'] if args.mode == 'both' else [args.mode]):
+            set_stock(args.sucursal, {pid: args.initial for pid in productos})
+            accepted, counts, elapsed = run(mode, args.sucursal, productos, args.threads, args.orders)
+            final = read_stock(args.sucursal)
+            # Unidades vendidas que el stock no llegó a descontar
+            oversold = sum(max(0, accepted[pid] - (args.initial - final[pid])) for pid in productos)
+            report[mode] = {
+                'tickets_per_second': round(sum(counts.values()) / elapsed, 1),
+                'accepted': counts['accepted'],
+                'refused': counts['refused'],
+                'errors': counts['errors'],
+                'oversold_units': oversold,
+                'min_final_stock': min(final.values()),
+                'seconds': round(elapsed, 2),
+            }
+    finally:
+        set_stock(args.sucursal, original)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
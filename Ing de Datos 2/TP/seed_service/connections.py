@@ -0,0 +1,304 @@
+import os
+import sys
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+import mysql.connector.pooling
+import redis
+import pymongo
+from pymongo import monitoring
+from neo4j import GraphDatabase
+
+# cassandra_dao vive en 'Ing de Datos 2/common' (compartido con CatTrack); la imagen lo copia a /app
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+from cassandra_dao import CassandraDAO, build_cluster
+
+
+def env_int(name, default):
+    """Lee un entero de las variables de entorno con valor por defecto."""
+    return int(os.environ.get(name, default))
+
+
+# Tamaños de pool configurables por entorno (por proceso / worker de uvicorn)
+MYSQL_POOL_SIZE = env_int('MYSQL_POOL_SIZE', 10)          # mysql-connector admite como máximo 32
+REDIS_POOL_SIZE = env_int('REDIS_POOL_SIZE', 20)
+MONGO_POOL_SIZE = env_int('MONGO_POOL_SIZE', 20)
+NEO4J_POOL_SIZE = env_int('NEO4J_POOL_SIZE', 20)
+POOL_TIMEOUT = env_int('POOL_TIMEOUT', 5)                 # segundos esperando una conexión libre
+RECONNECT_INTERVAL = env_int('RECONNECT_INTERVAL', 10)    # segundos entre reintentos de un backend caído
+
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    """Cuenta las conexiones de Mongo prestadas (pymongo no expone el uso del pool)."""
+
+    def __init__(self):
+        self.checked_out = 0
+
+    def connection_checked_out(self, event):
+        self.checked_out += 1
+
+    def connection_checked_in(self, event):
+        self.checked_out -= 1
+
+    # El resto de los eventos no nos interesan
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        pass
+
+
+class ConnectionManager:
+    """
+    Conexiones de larga vida compartidas por todas las requests del proceso:
+    pool de MySQL, ConnectionPool de Redis, un MongoClient, una Session de
+    Cassandra y un driver de Neo4j. Se crea en el startup de FastAPI y se
+    cierra en el shutdown.
+    """
+
+    BACKENDS = ('mysql', 'redis', 'mongodb', 'cassandra', 'neo4j')
+    _HANDLES = {
+        'mysql': 'mysql_pool',
+        'redis': 'redis_pool',
+        'mongodb': 'mongo_client',
+        'cassandra': 'cassandra_session',
+        'neo4j': 'neo4j_driver',
+    }
+
+    def __init__(self):
+        self.mysql_pool = None
+        self.redis_pool = None
+        self.mongo_client = None
+        self.cassandra_cluster = None
+        self.cassandra_session = None
+        self.cassandra_dao = None
+        self.neo4j_driver = None
+        # mysql-connector no bloquea si el pool está agotado (lanza PoolError),
+        # así que limitamos el acceso con un semáforo del mismo tamaño.
+        self._mysql_slots = threading.BoundedSemaphore(MYSQL_POOL_SIZE)
+        self._mysql_in_use = 0
+        self._mongo_listener = MongoPoolListener()
+        self._lock = threading.Lock()
+        self._last_attempt = {}
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Abre todas las conexiones. Un backend caído no impide el arranque."""
+        for name in self.BACKENDS:
+            self._connect(name)
+
+    def close(self):
+        """Cierra todas las conexiones abiertas."""
+        if self.neo4j_driver is not None:
+            self.neo4j_driver.close()
+            self.neo4j_driver = None
+        if self.cassandra_cluster is not None:
+            self.cassandra_cluster.shutdown()
+            self.cassandra_cluster = None
+            self.cassandra_session = None
+            self.cassandra_dao = None
+        if self.mongo_client is not None:
+            self.mongo_client.close()
+            self.mongo_client = None
+        if self.redis_pool is not None:
+            self.redis_pool.disconnect()
+            self.redis_pool = None
+        # Las conexiones del pool de MySQL se cierran al ser recolectadas
+        self.mysql_pool = None
+        logging.info("Closed all backend connections.")
+
+    def _connect(self, name):
+        if self._is_connected(name):
+            return True
+        with self._lock:
+            if self._is_connected(name):
+                return True
+            last = self._last_attempt.get(name)
+            if last is not None and time.monotonic() - last < RECONNECT_INTERVAL:
+                return False
+            self._last_attempt[name] = time.monotonic()
+            try:
+                getattr(self, f'_connect_{name}')()
+                logging.info(f"Connected to {name}.")
+                return True
+            except Exception as e:
+                logging.error(f"Could not connect to {name}: {e}")
+                return False
+
+    def _is_connected(self, name):
+        return getattr(self, self._HANDLES[name]) is not None
+
+    def _connect_mysql(self):
+        self.mysql_pool = mysql.connector.pooling.MySQLConnectionPool(
+            pool_name='seed_service',
+            pool_size=MYSQL_POOL_SIZE,
+            pool_reset_session=True,
+            host=os.environ.get('MYSQL_HOST', 'mysql'),
+            user=os.environ.get('MYSQL_USER', 'root'),
+            password=os.environ.get('MYSQL_PASS', 'root_password'),
+            database=os.environ.get('MYSQL_DB', 'my_data_warehouse'))
+
+    def _connect_redis(self):
+        pool = redis.BlockingConnectionPool(host=os.environ.get('REDIS_HOST', 'redis'),
+                                            port=int(os.environ.get('REDIS_PORT', 6379)),
+                                            db=0,
+                                            max_connections=REDIS_POOL_SIZE,
+                                            timeout=POOL_TIMEOUT,
+                                            socket_connect_timeout=2)
+        redis.Redis(connection_pool=pool).ping()
+        self.redis_pool = pool
+
+    def _connect_mongodb(self):
+        self.mongo_client = pymongo.MongoClient(host=os.environ.get('MONGO_HOST', 'mongodb'),
+                                                port=int(os.environ.get('MONGO_PORT', 27017)),
+                                                username=os.environ.get('MONGO_USER', 'rootuser'),
+                                                password=os.environ.get('MONGO_PASS', 'rootpassword'),
+                                                authSource='admin',
+                                                maxPoolSize=MONGO_POOL_SIZE,
+                                                waitQueueTimeoutMS=POOL_TIMEOUT * 1000,
+                                                serverSelectionTimeoutMS=POOL_TIMEOUT * 1000,
+                                                event_listeners=[self._mongo_listener])
+
+    def _connect_cassandra(self):
+        cluster = build_cluster([os.environ.get('CASSANDRA_HOST', 'cassandra')],
+                                port=int(os.environ.get('CASSANDRA_PORT', 9042)))
+        session = cluster.connect()
+        # El DAO se publica antes que la sesión: _connect solo mira cassandra_session
+        self.cassandra_dao = CassandraDAO(session)
+        self.cassandra_session = session
+        self.cassandra_cluster = cluster
+
+    def _connect_neo4j(self):
+        self.neo4j_driver = GraphDatabase.driver(
+            f"bolt://{os.environ.get('NEO4J_HOST', 'neo4j')}:7687",
+            auth=(os.environ.get('NEO4J_USER', 'neo4j'), os.environ.get('NEO4J_PASS', 'neo4jpassword')),
+            max_connection_pool_size=NEO4J_POOL_SIZE,
+            connection_acquisition_timeout=POOL_TIMEOUT)
+
+    # ------------------------------------------------------------------
+    # Acceso a cada backend (reconecta si el arranque falló)
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def mysql(self):
+        """Presta una conexión del pool de MySQL y la devuelve al salir."""
+        if not self._connect('mysql'):
+            raise RuntimeError("MySQL is not available")
+        if not self._mysql_slots.acquire(timeout=POOL_TIMEOUT):
+            raise RuntimeError("Timed out waiting for a MySQL connection")
+        with self._lock:
+            self._mysql_in_use += 1
+        try:
+            conn = self.mysql_pool.get_connection()
+            try:
+                yield conn
+            finally:
+                conn.close()  # vuelve al pool
+        finally:
+            with self._lock:
+                self._mysql_in_use -= 1
+            self._mysql_slots.release()
+
+    def redis(self):
+        if not self._connect('redis'):
+            return None
+        return redis.Redis(connection_pool=self.redis_pool)
+
+    def mongo_db(self):
+        if not self._connect('mongodb'):
+            return None
+        return self.mongo_client[os.environ.get('MONGO_DB', 'starbucks_transactions')]
+
+    def cassandra(self):
+        if not self._connect('cassandra'):
+            return None
+        return self.cassandra_session
+
+    def cassandra_statements(self):
+        """DAO de la sesión actual (statements preparados una vez por sesión)."""
+        if not self._connect('cassandra'):
+            return None
+        return self.cassandra_dao
+
+    def neo4j(self):
+        if not self._connect('neo4j'):
+            return None
+        return self.neo4j_driver
+
+    def pool_usage(self):
+        """Conexiones en uso y tamaño de cada pool, para los gauges de /metrics."""
+        usage = {
+            'mysql': (self._mysql_in_use, MYSQL_POOL_SIZE),
+            'mongodb': (self._mongo_listener.checked_out, MONGO_POOL_SIZE),
+        }
+        if self.redis_pool is not None:
+            # BlockingConnectionPool guarda las libres en una cola (None = todavía no creada)
+            idle = sum(1 for c in list(self.redis_pool.pool.queue) if c is not None)
+            usage['redis'] = (len(self.redis_pool._connections) - idle, REDIS_POOL_SIZE)
+        if self.cassandra_session is not None:
+            # Para Cassandra lo relevante son los requests en vuelo por conexión
+            state = self.cassandra_session.get_pool_state()
+            usage['cassandra'] = (sum(sum(h.get('in_flights', [])) for h in state.values()),
+                                  sum(h.get('open_count', 0) for h in state.values()))
+        return usage
+
+    # ------------------------------------------------------------------
+    # Health checks
+    # ------------------------------------------------------------------
+
+    def health(self):
+        """Hace un ping liviano a cada backend y devuelve estado y latencia."""
+        checks = {
+            'mysql': self._ping_mysql,
+            'redis': lambda: self.redis().ping(),
+            'mongodb': lambda: self.mongo_client.admin.command('ping'),
+            'cassandra': lambda: self.cassandra().execute("SELECT release_version FROM system.local").one(),
+            'neo4j': lambda: self.neo4j().verify_connectivity(),
+        }
+        report = {}
+        for name, check in checks.items():
+            start = time.perf_counter()
+            try:
+                if not self._connect(name):
+                    raise RuntimeError("not connected")
+                check()
+                report[name] = {'ok': True, 'ms': round((time.perf_counter() - start) * 1000, 2)}
+            except Exception as e:
+                report[name] = {'ok': False, 'error': str(e)}
+        return report
+
+    def _ping_mysql(self):
+        with self.mysql() as conn:
+            cur = conn.cursor()
+            cur.execute('SELECT 1')
+            cur.fetchall()
+            cur.close()
+
+
+connections = ConnectionManager()
@@ -0,0 +1,84 @@
+import logging
+
+# Mismo tipo de relación que usan 04_neo4j_init.cypher y las consultas de Casos_de_Uso.
+# Una relación COMPRA por (ticket, producto) con MERGE: reescribir un ticket
+# (reintento del outbox) no duplica relaciones.
+PURCHASES = """
+    UNWIND $rows AS row
+    MERGE (c:Cliente {id: row.cliente_id})
+    SET c.last_seen = row.fecha, c.name = coalesce(c.name, row.name)
+    WITH c, row
+    UNWIND row.items AS item
+    MERGE (p:Producto {id: item.product_id})
+    ON CREATE SET p.nombre = item.nombre
+    MERGE (c)-[r:COMPRA {ticket_id: row.ticket_id}]->(p)
+    SET r.fecha = datetime(row.fecha), r.cantidad = item.cantidad
+"""
+
+# Sin constraint, cada MERGE recorre todos los nodos de la etiqueta
+CONSTRAINTS = (
+    "CREATE CONSTRAINT cliente_id IF NOT EXISTS FOR (c:Cliente) REQUIRE c.id IS UNIQUE",
+    "CREATE CONSTRAINT producto_id IF NOT EXISTS FOR (p:Producto) REQUIRE p.id IS UNIQUE",
+)
+
+
+def purchase_items(detalles):
+    """Un item por producto: si el ticket repite un producto se suman las cantidades."""
+    items = {}
+    for it in detalles:
+        item = items.setdefault(it['product_id'], {'product_id': it['product_id'], 'nombre': it['nombre'],
+                                                   'cantidad': 0})
+        item['cantidad'] += it['cantidad']
+    return list(items.values())
+
+
+def purchase_rows(orders):
+    """Convierte órdenes en los parámetros de PURCHASES (una fila por ticket)."""
+    return [{
+        'cliente_id': order['cliente_id'],
+        'name': f"Cliente {order['cliente_id']}",
+        'ticket_id': order['ticket_id'],
+        'fecha': order['fecha'],
+        'items': purchase_items(order['detalles']),
+    } for order in orders if order['cliente_id'] is not None]
+
+
+class GraphWriter:
+    """
+    Escribe tickets completos (o lotes de tickets) en Neo4j con una sola
+    query UNWIND dentro de una transacción de escritura administrada
+    (el driver la reintenta ante errores transitorios).
+    """
+
+    def __init__(self):
+        self._schema_ready = set()
+
+    def ensure_schema(self, driver):
+        """Crea las constraints de unicidad una vez por driver."""
+        if id(driver) in self._schema_ready:
+            return
+        try:
+            with driver.session() as s:
+                for stmt in CONSTRAINTS:
+                    s.run(stmt).consume()
+            logging.info("Neo4j uniqueness constraints on Cliente.id and Producto.id verified.")
+        except Exception as e:
+            # Ej.: nodos duplicados previos. Se sigue escribiendo, solo que sin índice.
+            logging.error(f"Could not create Neo4j constraints: {e}")
+        self._schema_ready.add(id(driver))
+
+    @staticmethod
+    def _write(tx, rows):
+        tx.run(PURCHASES, rows=rows).consume()
+
+    def write(self, driver, orders):
+        rows = purchase_rows(orders)
+        if not rows:
+            return 0
+        self.ensure_schema(driver)
+        with driver.session() as s:
+            s.execute_write(self._write, rows)
+        return len(rows)
+
+
+graph_writer = GraphWriter()
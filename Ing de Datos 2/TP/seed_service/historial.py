@@ -0,0 +1,27 @@
+"""
+Esquema de HistorialCompra en Cassandra (v2).
+
+Una partición por (idSucursal, dia) y filas ordenadas por (fecha, ticket_num),
+así el tamaño de cada partición queda acotado a un día de una sucursal y dos
+tickets en el mismo segundo no se pisan. Ver setup/03_cassandra_init.cql.
+"""
+from datetime import timezone
+
+KEYSPACE = 'starbucks_analytics'
+TABLE = 'historialcompra_v2'
+LEGACY_TABLE = 'historialcompra'  # v1: PRIMARY KEY (idSucursal, fecha)
+
+INSERT_CQL = f"INSERT INTO {KEYSPACE}.{TABLE} (idSucursal, dia, fecha, ticket_num) VALUES (?, ?, ?, ?)"
+SELECT_DIA_CQL = f"SELECT idSucursal, fecha, ticket_num FROM {KEYSPACE}.{TABLE} WHERE idSucursal = ? AND dia = ?"
+
+
+def bucket(fecha):
+    """Día (UTC) de la partición a la que va un timestamp."""
+    if fecha.tzinfo is not None:
+        fecha = fecha.astimezone(timezone.utc)
+    return fecha.date()
+
+
+def row_params(sucursal_id, fecha, ticket_num):
+    """Parámetros de INSERT_CQL para un ticket."""
+    return (sucursal_id, bucket(fecha), fecha, ticket_num)
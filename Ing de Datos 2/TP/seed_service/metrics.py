@@ -0,0 +1,80 @@
+from prometheus_client import Counter, Histogram, REGISTRY
+from prometheus_client.core import GaugeMetricFamily, CounterMetricFamily
+
+from connections import connections
+
+# Buckets en segundos pensados para round-trips a bases locales (1ms .. 10s)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PHASE_SECONDS = Histogram('seed_phase_seconds', 'Duración de cada fase de generate_order',
+                          ['phase'], buckets=LATENCY_BUCKETS)
+SINK_WRITE_SECONDS = Histogram('seed_sink_write_seconds', 'Duración de la escritura en cada sink',
+                               ['sink'], buckets=LATENCY_BUCKETS)
+SINK_FAILURES = Counter('seed_sink_failures_total', 'Escrituras fallidas por sink', ['sink'])
+ORDERS = Counter('seed_orders_total', 'Órdenes generadas', ['endpoint'])
+ORDERS_REJECTED = Counter('seed_orders_rejected_total', 'Órdenes rechazadas', ['reason'])
+RESTOCKS = Counter('seed_restocks_total', 'Reposiciones de stock por sucursal (RESTOCK_LEVEL)')
+
+
+def phase(name):
+    """Context manager que mide una fase: `with metrics.phase('mysql_read'): ...`"""
+    return PHASE_SECONDS.labels(name).time()
+
+
+def observe_sink(name, seconds, ok):
+    SINK_WRITE_SECONDS.labels(name).observe(seconds)
+    if not ok:
+        SINK_FAILURES.labels(name).inc()
+
+
+class ServiceCollector:
+    """Gauges que se leen en el momento del scrape: uso de pools, cache y outbox."""
+
+    def __init__(self, refdata, outbox, ticket_ids):
+        self.refdata = refdata
+        self.outbox = outbox
+        self.ticket_ids = ticket_ids
+
+    def collect(self):
+        in_use = GaugeMetricFamily('seed_pool_in_use',
+                                   'Conexiones prestadas por pool (Cassandra: requests en vuelo)', labels=['backend'])
+        size = GaugeMetricFamily('seed_pool_size',
+                                 'Tamaño máximo de cada pool (Cassandra: conexiones abiertas)', labels=['backend'])
+        try:
+            usage = connections.pool_usage()
+        except Exception:
+            usage = {}  # un backend raro no debe romper el scrape
+        for backend, (used, total) in usage.items():
+            in_use.add_metric([backend], used)
+            size.add_metric([backend], total)
+        yield in_use
+        yield size
+
+        stats = self.refdata.stats()
+        cache = CounterMetricFamily('seed_refdata_lookups', 'Lecturas del cache de datos maestros', labels=['result'])
+        cache.add_metric(['hit'], stats['hits'])
+        cache.add_metric(['miss'], stats['misses'])
+        yield cache
+
+        lag = GaugeMetricFamily('seed_outbox_lag', 'Entradas del outbox sin confirmar por sink', labels=['sink'])
+        processed = CounterMetricFamily('seed_outbox_processed', 'Órdenes drenadas del outbox por sink', labels=['sink'])
+        dead = CounterMetricFamily('seed_outbox_dead', 'Órdenes enviadas al dead-letter por sink', labels=['sink'])
+        for sink, m in self.outbox.metrics.items():
+            lag.add_metric([sink], m['lag'])
+            processed.add_metric([sink], m['processed'])
+            dead.add_metric([sink], m['dead'])
+        yield lag
+        yield processed
+        yield dead
+
+        ids = self.ticket_ids.stats()
+        leases = CounterMetricFamily('seed_ticket_id_leases', 'Bloques de ticket ids reservados en Redis')
+        leases.add_metric([], ids['leases'])
+        yield leases
+        fallbacks = CounterMetricFamily('seed_ticket_id_fallbacks', 'Ticket ids generados sin Redis')
+        fallbacks.add_metric([], ids['fallbacks'])
+        yield fallbacks
+
+
+def register_collector(refdata, outbox, ticket_ids):
+    REGISTRY.register(ServiceCollector(refdata, outbox, ticket_ids))
@@ -0,0 +1,90 @@
+"""
+Migración de HistorialCompra (v1) a historialcompra_v2.
+
+Recorre la tabla vieja completa por páginas (paging_state del driver) y
+copia cada fila a su partición (idSucursal, dia) con inserts concurrentes.
+Los inserts son upserts, así que se puede cortar y volver a correr sin
+duplicar nada. Con --verify vuelve a leer cada fila copiada en v2.
+
+    docker compose exec seed_service python migrate_historial.py --page-size 1000 --verify
+"""
+import time
+import argparse
+
+from cassandra.concurrent import execute_concurrent_with_args
+
+import historial
+from connections import connections, env_int
+
+CASSANDRA_CONCURRENCY = env_int('CASSANDRA_CONCURRENCY', 64)
+
+SELECT_LEGACY = f"SELECT idSucursal, fecha, ticket_num FROM {historial.KEYSPACE}.{historial.LEGACY_TABLE}"
+EXISTS_V2 = (f"SELECT ticket_num FROM {historial.KEYSPACE}.{historial.TABLE} "
+             "WHERE idSucursal = ? AND dia = ? AND fecha = ? AND ticket_num = ?")
+
+
+def legacy_pages(dao, page_size):
+    bound = dao.prepare(SELECT_LEGACY).bind(())
+    bound.fetch_size = page_size
+    paging_state = None
+    while True:
+        result = dao.session.execute(bound, paging_state=paging_state)
+        if result.current_rows:
+            yield result.current_rows
+        paging_state = result.paging_state
+        if paging_state is None:
+            break
+
+
+def run_concurrent(dao, cql, params, concurrency):
+    results = execute_concurrent_with_args(dao.session, dao.prepare(cql), params, concurrency=concurrency,
+                                           raise_on_first_error=False)
+    return list(zip(params, results))
+
+
+def migrate(dao, page_size, concurrency, dry_run=False, verify=False):
+    copied = failed = missing = 0
+    start = time.perf_counter()
+
+    for page, rows in enumerate(legacy_pages(dao, page_size), start=1):
+        params = [historial.row_params(r.idsucursal, r.fecha, r.ticket_num) for r in rows]
+        if not dry_run:
+            for p, r in run_concurrent(dao, historial.INSERT_CQL, params, concurrency):
+                if not r.success:
+                    failed += 1
+                    print(f"  Error copiando {p}: {r.result_or_exc}")
+            if verify:
+                for p, r in run_concurrent(dao, EXISTS_V2, params, concurrency):
+                    if not r.success or not r.result_or_exc.one():
+                        missing += 1
+        copied += len(params)
+        print(f"Página {page}: {copied} filas leídas ({copied / (time.perf_counter() - start):.0f} filas/s)")
+
+    return {
+        'rows': copied,
+        'failed': failed,
+        'missing_after_verify': missing if verify else None,
+        'dry_run': dry_run,
+        'seconds': round(time.perf_counter() - start, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--page-size', type=int, default=1000, help='filas de la tabla vieja por página')
+    parser.add_argument('--concurrency', type=int, default=CASSANDRA_CONCURRENCY, help='inserts en vuelo')
+    parser.add_argument('--dry-run', action='store_true', help='solo leer y contar, sin escribir')
+    parser.add_argument('--verify', action='store_true', help='comprobar en v2 cada fila copiada')
+    args = parser.parse_args()
+
+    try:
+        dao = connections.cassandra_statements()
+        if dao is None:
+            raise SystemExit("Cassandra is not available")
+        print(migrate(dao, args.page_size, args.concurrency, args.dry_run, args.verify))
+    finally:
+        connections.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import time
+import random
+
+from reference_cache import refdata
+
+METODOS_PAGO = ('Efectivo', 'Tarjeta', 'MercadoPago')
+
+
+def productos_sucursal(cur, sucursal_id):
+    """Productos con stock disponible en la sucursal."""
+    if sucursal_id is None:
+        return []
+    cur.execute('''
+        SELECT p.id, p.nombre, p.precio, s.cantidad
+        FROM Producto p
+        JOIN Stock s ON p.id = s.idProducto
+        WHERE s.idSucursal = %s AND s.cantidad > 0
+    ''', (sucursal_id,))
+    return [{'id': r[0], 'nombre': r[1], 'precio': float(r[2]), 'cantidad': r[3]} for r in cur.fetchall()]
+
+
+def build_order(ticket_id, cliente_id, sucursal_id, productos, conn=None):
+    """
+    Arma una orden en memoria. `productos` es el stock disponible de la
+    sucursal; lo vendido se descuenta ahí mismo para que varias órdenes
+    de un mismo lote no vendan más de lo que había. `conn` es la conexión
+    MySQL del llamador, para el cache de datos maestros.
+    """
+    # Sin stock en la sucursal la orden queda sin items y la reserva la rechaza
+    pool = [p for p in productos if p['cantidad'] > 0]
+
+    # elegir 1..3 items
+    items = []
+    if pool:
+        num_items = min(len(pool), random.randint(1, 3))
+        for p in random.sample(pool, num_items):
+            qty = 1
+            if p.get('cantidad') and p['cantidad'] > 1:
+                qty = random.randint(1, min(3, p['cantidad']))
+            p['cantidad'] -= qty
+            items.append({'product_id': int(p['id']), 'nombre': p['nombre'], 'cantidad': int(qty), 'precio': round(p['precio'] * qty, 2)})
+
+    # total
+    total = round(sum([it['precio'] for it in items]), 2)
+
+    return {
+        'ticket_id': ticket_id,
+        'sucursal_id': int(sucursal_id) if sucursal_id is not None else None,
+        'cliente_id': int(cliente_id) if cliente_id is not None else None,
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'total': total,
+        'metodo_pago': random.choice(METODOS_PAGO),
+        'promocion_id': refdata.random_promocion(conn),
+        'detalles': items
+    }
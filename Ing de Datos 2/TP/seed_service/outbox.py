@@ -0,0 +1,214 @@
+import os
+import json
+import time
+import socket
+import logging
+import threading
+
+import sinks
+from connections import connections, env_int
+
+STREAM = 'seed:outbox'
+DEAD_LETTER = 'seed:outbox:dead'
+OUTBOX_BATCH = env_int('OUTBOX_BATCH', 500)            # órdenes por escritura en cada sink
+OUTBOX_MAX_LAG = env_int('OUTBOX_MAX_LAG', 200_000)    # por encima de esto se rechazan órdenes nuevas
+OUTBOX_TRIM_INTERVAL_MS = env_int('OUTBOX_TRIM_INTERVAL_MS', 10_000)
+OUTBOX_RETRIES = env_int('OUTBOX_RETRIES', 5)
+OUTBOX_CLAIM_IDLE_MS = env_int('OUTBOX_CLAIM_IDLE_MS', 60_000)
+
+# Sinks secundarios que se drenan desde el outbox. MySQL (stock) se sigue
+# escribiendo en el request porque es la fuente de verdad del inventario.
+SINKS = {
+    'MongoDB': sinks.write_mongo,
+    'Cassandra': sinks.write_cassandra,
+    'Neo4j': sinks.write_neo4j,
+    'Redis': sinks.write_redis,
+}
+
+
+def _stream_id(entry_id):
+    """'1700000000000-3' -> (1700000000000, 3), para comparar ids de stream."""
+    if isinstance(entry_id, bytes):
+        entry_id = entry_id.decode()
+    ms, _, seq = entry_id.partition('-')
+    return int(ms), int(seq or 0)
+
+
+class OutboxFull(Exception):
+    """El sink más atrasado superó OUTBOX_MAX_LAG: hay que frenar a los productores."""
+
+
+class Outbox:
+    """
+    Outbox de escritura diferida sobre un Redis Stream. El request agrega
+    la orden una sola vez (XADD) y un worker por sink la drena en lotes
+    con su propio consumer group, reintentando con backoff. La entrega es
+    at-least-once: un reintento puede repetir una escritura, por eso los
+    sinks escriben de forma idempotente por ticket_id.
+
+    El stream no se recorta por largo (MAXLEN borraría órdenes que algún
+    sink todavía no leyó): se recorta con XTRIM MINID hasta la entrada más
+    vieja que algún grupo tiene pendiente o sin leer. Lo que lo mantiene
+    acotado es OUTBOX_MAX_LAG, que frena a los productores.
+    """
+
+    def __init__(self):
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self.metrics = {name: {'processed': 0, 'failed_batches': 0, 'dead': 0, 'lag': 0, 'pending': 0,
+                               'last_batch_ms': None} for name in SINKS}
+        self._stop = threading.Event()
+        self._threads = []
+
+    @staticmethod
+    def group(name):
+        return name.lower()
+
+    # ------------------------------------------------------------------
+    # Productor
+    # ------------------------------------------------------------------
+
+    def max_lag(self):
+        return max((m['lag'] for m in self.metrics.values()), default=0)
+
+    def check_capacity(self):
+        """Lanza OutboxFull si los sinks no dan abasto (se llama antes de tocar el stock)."""
+        if self.max_lag() > OUTBOX_MAX_LAG:
+            raise OutboxFull(f"outbox lag {self.max_lag()} > {OUTBOX_MAX_LAG}")
+
+    def wait_for_capacity(self):
+        """Versión bloqueante para los lotes: espera a que los sinks se pongan al día."""
+        while self.max_lag() > OUTBOX_MAX_LAG and not self._stop.wait(0.5):
+            pass
+
+    def publish(self, orders):
+        """Agrega las órdenes al stream con un único round-trip."""
+        rconn = connections.redis()
+        if rconn is None:
+            raise RuntimeError("Redis is not available")
+        pipe = rconn.pipeline(transaction=False)
+        for order in orders:
+            pipe.xadd(STREAM, {'order': json.dumps(order)})
+        pipe.execute()
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+
+    def start(self):
+        for name in SINKS:
+            t = threading.Thread(target=self._run, args=(name,), name=f'outbox-{self.group(name)}', daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout=5)
+        self._threads = []
+
+    def _ensure_group(self, rconn, name):
+        try:
+            rconn.xgroup_create(STREAM, self.group(name), id='0', mkstream=True)
+        except Exception as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+    def _run(self, name):
+        group = self.group(name)
+        rconn = None
+        last_claim = last_trim = 0.0
+        while not self._stop.is_set():
+            try:
+                if rconn is None:
+                    rconn = connections.redis()
+                    if rconn is None:
+                        self._stop.wait(1)
+                        continue
+                    self._ensure_group(rconn, name)
+
+                # Primero, lo que quedó pendiente de consumidores caídos
+                entries = []
+                if time.monotonic() - last_claim > OUTBOX_CLAIM_IDLE_MS / 1000:
+                    last_claim = time.monotonic()
+                    _, entries, *_ = rconn.xautoclaim(STREAM, group, self.consumer, OUTBOX_CLAIM_IDLE_MS,
+                                                      start_id='0-0', count=OUTBOX_BATCH)
+                if not entries:
+                    response = rconn.xreadgroup(group, self.consumer, {STREAM: '>'}, count=OUTBOX_BATCH, block=1000)
+                    entries = response[0][1] if response else []
+                if entries:
+                    self._deliver(rconn, name, entries)
+                self._update_lag(rconn, name)
+                if time.monotonic() - last_trim > OUTBOX_TRIM_INTERVAL_MS / 1000:
+                    last_trim = time.monotonic()
+                    self._trim(rconn)
+            except Exception as e:
+                logging.error(f"Outbox worker for {name} failed: {e}")
+                rconn = None
+                self._stop.wait(1)
+
+    def _deliver(self, rconn, name, entries):
+        ids = [entry_id for entry_id, _ in entries]
+        orders = [json.loads(fields[b'order']) for _, fields in entries]
+        metrics = self.metrics[name]
+        delay = 0.5
+        for attempt in range(1, OUTBOX_RETRIES + 1):
+            result = sinks.run_sink(name, SINKS[name], orders)
+            metrics['last_batch_ms'] = result['ms']
+            if result['ok']:
+                rconn.xack(STREAM, self.group(name), *ids)
+                metrics['processed'] += len(ids)
+                return
+            metrics['failed_batches'] += 1
+            if attempt == OUTBOX_RETRIES:
+                break
+            if self._stop.wait(delay):
+                return  # quedan pendientes, se reclaman al volver a arrancar
+            delay = min(delay * 2, 30)
+
+        # Reintentos agotados: el lote va al dead-letter para no bloquear al sink
+        pipe = rconn.pipeline(transaction=False)
+        for _, fields in entries:
+            pipe.xadd(DEAD_LETTER, {'sink': name, 'order': fields[b'order']})
+        pipe.xack(STREAM, self.group(name), *ids)
+        pipe.execute()
+        metrics['dead'] += len(ids)
+        logging.error(f"Moved {len(ids)} orders to {DEAD_LETTER} after {OUTBOX_RETRIES} failed attempts on {name}.")
+
+    def _update_lag(self, rconn, name):
+        for info in rconn.xinfo_groups(STREAM):
+            group = info['name'].decode() if isinstance(info['name'], bytes) else info['name']
+            if group == self.group(name):
+                self.metrics[name]['pending'] = info.get('pending', 0)
+                # 'lag' existe desde Redis 7; antes solo tenemos los pendientes
+                self.metrics[name]['lag'] = (info.get('lag') or 0) + info.get('pending', 0)
+
+    def _trim(self, rconn):
+        """
+        Borra del stream las entradas que ya procesaron todos los grupos:
+        las anteriores al menor id pendiente (o, sin pendientes, al último
+        entregado) entre todos los sinks. Si falta el grupo de algún sink no
+        se borra nada, porque ese sink todavía tiene que leer desde el principio.
+        """
+        groups = {}
+        for info in rconn.xinfo_groups(STREAM):
+            group = info['name'].decode() if isinstance(info['name'], bytes) else info['name']
+            groups[group] = info
+        floors = []
+        for name in SINKS:
+            info = groups.get(self.group(name))
+            if info is None:
+                return
+            if info.get('pending', 0):
+                floors.append(rconn.xpending(STREAM, self.group(name))['min'])
+            else:
+                floors.append(info['last-delivered-id'])
+        floor = min(floors, key=_stream_id)
+        if _stream_id(floor) > (0, 0):
+            # Aproximado: Redis solo borra nodos enteros, nunca algo >= floor
+            rconn.xtrim(STREAM, minid=floor, approximate=True)
+
+    def stats(self):
+        return {'stream': STREAM, 'max_lag': OUTBOX_MAX_LAG, 'sinks': self.metrics}
+
+
+outbox = Outbox()
@@ -0,0 +1,200 @@
+import time
+import random
+import logging
+import threading
+from array import array
+
+from connections import connections, env_int
+
+REFDATA_TTL = env_int('REFDATA_TTL', 300)  # segundos
+REFDATA_RETRY = env_int('REFDATA_RETRY', 5)  # espera entre reintentos de recarga en segundo plano
+INVALIDATE_CHANNEL = 'seed:refdata:invalidate'
+
+
+class ReferenceCache:
+    """
+    Cache en memoria de las tablas maestras que usa generate_order
+    (Cliente, Sucursal y Promocion). Los ids se guardan en arrays compactos,
+    así elegir uno al azar es O(1). Las sucursales se eligen entre las que
+    tienen stock (si ninguna tiene, entre todas); los productos no se
+    cachean, salen del stock de la sucursal (orders.productos_sucursal).
+    Se recarga cuando vence el TTL o al recibir un mensaje en el canal de
+    invalidación de Redis.
+
+    Con datos cargados la recarga corre en un thread de fondo y mientras
+    tanto se sirven los anteriores: el request nunca pide una segunda
+    conexión al pool mientras tiene la suya. Solo con el cache vacío se
+    carga en el momento, con la conexión del propio request.
+    """
+
+    def __init__(self, ttl=REFDATA_TTL, retry=REFDATA_RETRY):
+        self.ttl = ttl
+        self.retry = retry
+        self.clientes = array('q')
+        self.sucursales = array('q')
+        self.sucursales_con_stock = array('q')
+        self.promociones = array('q')
+        self.loaded_at = None
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.invalidations = 0
+        self._stale = True
+        self._failed_at = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._listener = None
+
+    # ------------------------------------------------------------------
+    # Carga / invalidación
+    # ------------------------------------------------------------------
+
+    def _expired(self):
+        return self._stale or self.loaded_at is None or time.monotonic() - self.loaded_at > self.ttl
+
+    def _ensure_fresh(self, conn=None):
+        if not self._expired():
+            self.hits += 1
+            return
+        self.misses += 1
+        if self.loaded_at is None:
+            # Sin datos no hay nada que servir: se carga ya (y se reintenta en cada lectura)
+            with self._lock:
+                if self.loaded_at is None:
+                    self.refresh(conn)
+            return
+        self._refresh_in_background()
+
+    def _refresh_in_background(self):
+        """Lanza una única recarga de fondo; tras un fallo espera `retry` segundos antes de reintentar."""
+        with self._lock:
+            if self._refreshing:
+                return
+            if self._failed_at is not None and time.monotonic() - self._failed_at < self.retry:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name='refdata-refresh', daemon=True).start()
+
+    def refresh(self, conn=None):
+        """
+        Relee las tablas maestras, con `conn` o con una conexión del pool.
+        Si falla se siguen usando los datos anteriores y el cache queda
+        vencido, así la próxima lectura vuelve a intentar. Devuelve si cargó.
+        """
+        try:
+            if conn is not None:
+                clientes, sucursales, con_stock, promociones = self._load(conn)
+            else:
+                with connections.mysql() as pooled:
+                    clientes, sucursales, con_stock, promociones = self._load(pooled)
+        except Exception as e:
+            self._failed_at = time.monotonic()
+            self.refresh_failures += 1
+            logging.error(f"Failed to refresh reference data: {e}")
+            return False
+
+        self.clientes = clientes
+        self.sucursales = sucursales
+        self.sucursales_con_stock = con_stock
+        self.promociones = promociones
+        self.loaded_at = time.monotonic()
+        self._stale = False
+        self._failed_at = None
+        self.refreshes += 1
+        logging.info(f"Reference data loaded: {len(clientes)} clientes, {len(sucursales)} sucursales "
+                     f"({len(con_stock)} con stock), {len(promociones)} promociones.")
+        return True
+
+    @staticmethod
+    def _load(conn):
+        cur = conn.cursor()
+        try:
+            cur.execute('SELECT id FROM Cliente')
+            clientes = array('q', (r[0] for r in cur.fetchall()))
+            cur.execute('SELECT id FROM Sucursal')
+            sucursales = array('q', (r[0] for r in cur.fetchall()))
+            cur.execute('SELECT DISTINCT idSucursal FROM Stock WHERE cantidad > 0')
+            con_stock = array('q', (r[0] for r in cur.fetchall()))
+            cur.execute('SELECT id FROM Promocion')
+            promociones = array('q', (r[0] for r in cur.fetchall()))
+        finally:
+            cur.close()
+        return clientes, sucursales, con_stock, promociones
+
+    def invalidate(self):
+        """Marca el cache como vencido; la próxima lectura lo recarga."""
+        self._stale = True
+        self.invalidations += 1
+
+    def start_listener(self):
+        """Escucha el canal de invalidación de Redis en un thread de fondo."""
+        rconn = connections.redis()
+        if rconn is None:
+            logging.warning("Redis unavailable, reference data will only refresh by TTL.")
+            return
+        try:
+            pubsub = rconn.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{INVALIDATE_CHANNEL: lambda message: self.invalidate()})
+            self._listener = pubsub.run_in_thread(sleep_time=1, daemon=True)
+        except Exception as e:
+            logging.error(f"Could not subscribe to {INVALIDATE_CHANNEL}: {e}")
+
+    def stop_listener(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+    # ------------------------------------------------------------------
+    # Lecturas O(1). `conn` es la conexión MySQL que ya tiene el llamador:
+    # si el cache está vacío se carga con ella en vez de pedir otra al pool.
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _pick(values):
+        return int(values[random.randrange(len(values))]) if values else None
+
+    def random_cliente(self, conn=None):
+        self._ensure_fresh(conn)
+        return self._pick(self.clientes)
+
+    def random_sucursal(self, conn=None):
+        self._ensure_fresh(conn)
+        return self._pick(self.sucursales_con_stock or self.sucursales)
+
+    def random_promocion(self, conn=None):
+        self._ensure_fresh(conn)
+        return self._pick(self.promociones)
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'refreshes': self.refreshes,
+            'refresh_failures': self.refresh_failures,
+            'invalidations': self.invalidations,
+            'ttl': self.ttl,
+            'age_seconds': round(time.monotonic() - self.loaded_at, 1) if self.loaded_at is not None else None,
+            'clientes': len(self.clientes),
+            'sucursales': len(self.sucursales),
+            'sucursales_con_stock': len(self.sucursales_con_stock),
+            'promociones': len(self.promociones),
+        }
+
+
+def publish_invalidation():
+    """Pide a todos los workers del servicio que recarguen los datos maestros."""
+    rconn = connections.redis()
+    if rconn is None:
+        return 0
+    return rconn.publish(INVALIDATE_CHANNEL, 'refresh')
+
+
+refdata = ReferenceCache()
@@ -0,0 +1,163 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from pymongo import ReplaceOne
+from pymongo.errors import OperationFailure
+
+import stock
+import metrics
+import historial
+from connections import connections, env_int
+from graph_writer import graph_writer
+
+CASSANDRA_CONCURRENCY = env_int('CASSANDRA_CONCURRENCY', 64)
+SINK_WORKERS = env_int('SINK_WORKERS', 32)  # threads compartidos para escribir en paralelo
+
+# counter:tickets = tickets distintos vistos (HyperLogLog: memoria fija, error ~0.8%)
+TICKETS_SEEN_KEY = 'tickets:seen'
+TICKETS_COUNTER_KEY = 'counter:tickets'
+REDIS_PFADD_CHUNK = 1000  # ticket ids por EVAL (unpack de Lua tiene tope de argumentos)
+
+COUNT_TICKETS_LUA = """
+redis.call('PFADD', KEYS[1], unpack(ARGV))
+local count = redis.call('PFCOUNT', KEYS[1])
+redis.call('SET', KEYS[2], count)
+return count
+"""
+
+SET_IF_GREATER_LUA = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '-1')
+if tonumber(ARGV[1]) > current then
+    redis.call('SET', KEYS[1], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+_executor = ThreadPoolExecutor(max_workers=SINK_WORKERS, thread_name_prefix='sink')
+_mongo_index_ready = set()
+
+
+def fecha_dt(order):
+    """Mongo y Cassandra quieren datetime, la orden guarda el ISO string."""
+    return datetime.fromisoformat(order['fecha'].replace('Z', '+00:00'))
+
+
+def run_sink(name, fn, *args):
+    """Ejecuta la escritura de un sink, midiendo el tiempo y capturando el error."""
+    start = time.perf_counter()
+    try:
+        fn(*args)
+        elapsed = time.perf_counter() - start
+        metrics.observe_sink(name, elapsed, ok=True)
+        return {'ok': True, 'ms': round(elapsed * 1000, 2)}
+    except Exception as e:
+        elapsed = time.perf_counter() - start
+        metrics.observe_sink(name, elapsed, ok=False)
+        logging.error(f"Failed to write to {name}: {e}")
+        return {'ok': False, 'ms': round(elapsed * 1000, 2), 'error': str(e)}
+
+
+def write_all(conn, orders, skip=()):
+    """
+    Despacha las cinco escrituras en paralelo sobre un pool acotado de
+    threads; la latencia total es la del sink más lento y no la suma.
+    `conn` es la conexión MySQL del request, que no se usa mientras tanto.
+    """
+    start = time.perf_counter()
+    writers = {
+        'MongoDB': (write_mongo, orders),
+        'Cassandra': (write_cassandra, orders),
+        'MySQL': (write_mysql_stock, conn, orders),
+        'Neo4j': (write_neo4j, orders),
+        'Redis': (write_redis, orders),
+    }
+    futures = {name: _executor.submit(run_sink, name, *args) for name, args in writers.items() if name not in skip}
+    results = {name: future.result() for name, future in futures.items()}
+    return results, round((time.perf_counter() - start) * 1000, 2)
+
+
+def shutdown():
+    _executor.shutdown(wait=True)
+
+
+# ----------------------------------------------------------------------
+# Escrituras por sink. Todas reciben una lista de órdenes (1..N).
+# ----------------------------------------------------------------------
+
+def ensure_mongo_index(mongo_db):
+    """
+    Índice único en ticket.ticket_id (mismo nombre que 02_mongodb_init.js),
+    una vez por (cliente, base): connections.mongo_db() arma un Database
+    nuevo en cada llamada, pero el cliente es siempre el mismo.
+    """
+    key = (mongo_db.client, mongo_db.name)
+    if key in _mongo_index_ready:
+        return
+    try:
+        mongo_db.ticket.create_index([('ticket_id', 1)], name='idx_ticket_id', unique=True)
+    except OperationFailure as e:
+        # Ej.: una base vieja con idx_ticket_id no único. El upsert sigue siendo idempotente.
+        logging.error(f"Could not create unique index on ticket.ticket_id: {e}")
+    # Otros errores (Mongo caído) se propagan y se reintenta en la próxima escritura
+    _mongo_index_ready.add(key)
+
+
+def write_mongo(orders):
+    mongo_db = connections.mongo_db()
+    if mongo_db is None:
+        raise RuntimeError("MongoDB is not available")
+    ensure_mongo_index(mongo_db)
+    # MongoDB wants datetime objects for ISODate. Upsert por ticket_id: un reintento
+    # del outbox reemplaza el ticket en lugar de duplicarlo.
+    ops = [ReplaceOne({'ticket_id': order['ticket_id']}, dict(order, fecha=fecha_dt(order)), upsert=True)
+           for order in orders]
+    result = mongo_db.ticket.bulk_write(ops, ordered=False)
+    logging.info(f"Upserted {len(ops)} orders into MongoDB ({result.upserted_count} new).")
+
+
+def write_cassandra(orders):
+    dao = connections.cassandra_statements()
+    if dao is None:
+        raise RuntimeError("Cassandra is not available")
+    params = [historial.row_params(order['sucursal_id'], fecha_dt(order), order['ticket_id']) for order in orders]
+    dao.execute_many(historial.INSERT_CQL, params, concurrency=CASSANDRA_CONCURRENCY)
+    logging.info(f"Inserted {len(params)} orders into Cassandra.")
+
+
+def write_mysql_stock(conn, orders):
+    # Mismo criterio que /generate-order: solo descuenta si alcanza, sin recortar en 0
+    accepted, rejected = stock.reserve_batch(conn, orders)
+    if rejected:
+        raise stock.OutOfStock(f"{len(rejected)} of {len(orders)} orders without enough stock")
+    logging.info(f"Updated stock in MySQL for {len(accepted)} orders.")
+
+
+def write_neo4j(orders):
+    driver = connections.neo4j()
+    if driver is None:
+        raise RuntimeError("Neo4j is not available")
+    written = graph_writer.write(driver, orders)
+    logging.info(f"Created purchase relationships in Neo4j for {written} orders.")
+
+
+def write_redis(orders):
+    rconn = connections.redis()
+    if rconn is None:
+        raise RuntimeError("Redis is not available")
+    last_by_sucursal = {}
+    for order in orders:
+        sucursal_id = order['sucursal_id']
+        last_by_sucursal[sucursal_id] = max(order['ticket_id'], last_by_sucursal.get(sucursal_id, 0))
+    ticket_ids = [order['ticket_id'] for order in orders]
+    # Idempotente ante reentregas del outbox: el último ticket solo avanza y el contador
+    # sale de la cardinalidad de los ticket ids vistos, no de sumar el tamaño del lote
+    pipe = rconn.pipeline(transaction=False)
+    for sucursal_id, ticket_id in last_by_sucursal.items():
+        pipe.eval(SET_IF_GREATER_LUA, 1, f'last_ticket:sucursal:{sucursal_id}', ticket_id)
+    for i in range(0, len(ticket_ids), REDIS_PFADD_CHUNK):
+        pipe.eval(COUNT_TICKETS_LUA, 2, TICKETS_SEEN_KEY, TICKETS_COUNTER_KEY, *ticket_ids[i:i + REDIS_PFADD_CHUNK])
+    pipe.execute()
+    logging.info(f"Updated Redis for {len(orders)} orders.")
@@ -0,0 +1,121 @@
+import logging
+from collections import defaultdict
+
+import mysql.connector
+
+DEADLOCK_RETRIES = 3
+ER_LOCK_DEADLOCK = 1213
+
+
+class OutOfStock(Exception):
+    """Algún producto del ticket no tiene stock suficiente en la sucursal."""
+
+
+def _aggregate(items):
+    """Suma cantidades por producto y ordena por id (mismo orden de locks en todos los tickets)."""
+    qty = defaultdict(int)
+    for it in items:
+        if it.get('product_id') is not None:
+            qty[int(it['product_id'])] += int(it.get('cantidad', 1))
+    return sorted(qty.items())
+
+
+def _decrement_sql(n):
+    """
+    UPDATE ... JOIN contra una tabla derivada con los n (producto, cantidad).
+    Solo descuenta si alcanza; las filas que no cumplen no se tocan.
+    """
+    rows = ' UNION ALL '.join(['SELECT %s AS idProducto, %s AS qty'] * n)
+    return f'''
+        UPDATE Stock s JOIN ({rows}) r ON s.idProducto = r.idProducto
+        SET s.cantidad = s.cantidad - r.qty
+        WHERE s.idSucursal = %s AND s.cantidad >= r.qty
+    '''
+
+
+def _try_decrement(conn, sucursal_id, decrements):
+    """
+    Descuenta todos los (producto, cantidad) con una única sentencia y en una
+    transacción. Si algún producto no alcanza hace rollback y devuelve False:
+    bajo carga concurrente el UPDATE lee el valor vigente con lock de fila,
+    así que nunca se vende de más.
+    """
+    params = [v for pair in decrements for v in pair] + [sucursal_id]
+    sql = _decrement_sql(len(decrements))
+    for attempt in range(1, DEADLOCK_RETRIES + 1):
+        cur = conn.cursor()
+        try:
+            cur.execute(sql, params)
+            if cur.rowcount != len(decrements):
+                conn.rollback()
+                return False
+            conn.commit()
+            return True
+        except mysql.connector.Error as e:
+            conn.rollback()
+            if e.errno != ER_LOCK_DEADLOCK or attempt == DEADLOCK_RETRIES:
+                raise
+            logging.warning(f"Deadlock reserving stock in sucursal {sucursal_id}, retrying ({attempt}).")
+        finally:
+            cur.close()
+
+
+def reserve(conn, sucursal_id, items):
+    """Reserva el stock de un ticket; si algún producto no alcanza lanza OutOfStock."""
+    decrements = _aggregate(items)
+    if not decrements:
+        raise OutOfStock(f"Ticket without products in sucursal {sucursal_id}")
+    if not _try_decrement(conn, sucursal_id, decrements):
+        raise OutOfStock(f"Insufficient stock in sucursal {sucursal_id} for {dict(decrements)}")
+
+
+def reserve_batch(conn, orders):
+    """
+    Reserva el stock de un lote con el mismo criterio que `reserve` y
+    devuelve (aceptadas, rechazadas). Por sucursal se intenta primero todo
+    el lote en una sentencia; si no alcanza, se reserva ticket por ticket y
+    se descartan los que no entran (nunca se recorta en 0).
+    """
+    by_sucursal = defaultdict(list)
+    for order in orders:
+        by_sucursal[order['sucursal_id']].append(order)
+    accepted, rejected = [], []
+    for sucursal_id, sucursal_orders in by_sucursal.items():
+        decrements = _aggregate(it for order in sucursal_orders for it in order['detalles'])
+        if decrements and all(order['detalles'] for order in sucursal_orders) \
+                and _try_decrement(conn, sucursal_id, decrements):
+            accepted.extend(sucursal_orders)
+            continue
+        for order in sucursal_orders:
+            try:
+                reserve(conn, sucursal_id, order['detalles'])
+                accepted.append(order)
+            except OutOfStock:
+                rejected.append(order)
+    return accepted, rejected
+
+
+def restock(conn, level, sucursal_ids=None):
+    """
+    Repone el stock hasta `level` unidades en cada (sucursal, producto) que
+    esté por debajo y crea las filas que falten. Sin `sucursal_ids` repone
+    todas las sucursales. Devuelve las filas afectadas.
+    """
+    where, params = '', [level]
+    if sucursal_ids:
+        where = f"WHERE s.id IN ({', '.join(['%s'] * len(sucursal_ids))})"
+        params += [int(s) for s in sucursal_ids]
+    cur = conn.cursor()
+    try:
+        cur.execute(f'''
+            INSERT INTO Stock (idSucursal, idProducto, cantidad)
+            SELECT s.id, p.id, %s FROM Sucursal s CROSS JOIN Producto p {where}
+            ON DUPLICATE KEY UPDATE cantidad = GREATEST(cantidad, VALUES(cantidad))
+        ''', params)
+        conn.commit()
+        return cur.rowcount
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
@@ -0,0 +1,224 @@
+import os
+import time
+import socket
+import logging
+import threading
+
+from connections import connections, env_int
+
+TICKET_BLOCK = env_int('TICKET_BLOCK', 1000)  # ids reservados por cada INCRBY
+TICKET_SEQ_KEY = 'ticket_seq'
+# Los ids por debajo quedan para los tickets de los scripts de setup (1..4, 57):
+# los sinks hacen upsert por ticket_id y pisarían esos tickets
+TICKET_SEQ_FLOOR = env_int('TICKET_SEQ_FLOOR', 1000)
+
+# INCRBY que arranca desde TICKET_SEQ_FLOOR si la secuencia no existe o quedó por debajo
+LEASE_LUA = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+if current < tonumber(ARGV[2]) then
+    redis.call('SET', KEYS[1], ARGV[2])
+end
+return redis.call('INCRBY', KEYS[1], ARGV[1])
+"""
+
+# Fallback estilo "snowflake": 41 bits de milisegundos | 10 bits de worker | 12 bits de secuencia
+EPOCH_MS = 1735689600000  # 2025-01-01T00:00:00Z
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+
+# Sin WORKER_ID, cada proceso alquila un worker id en Redis (SET NX con TTL, renovado en
+# segundo plano): dos réplicas nunca comparten id, cosa que un hash de host+pid no garantiza
+WORKER_LEASE_KEY = 'ticket_worker:{worker_id}'
+WORKER_LEASE_SEQ_KEY = 'ticket_worker_seq'
+WORKER_LEASE_TTL = env_int('WORKER_LEASE_TTL', 60)  # segundos; se renueva cada TTL/3
+
+# Renueva el lease solo si sigue siendo nuestro
+RENEW_LEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def env_worker_id():
+    """WORKER_ID explícito (p. ej. el índice de la réplica) o None."""
+    if 'WORKER_ID' in os.environ:
+        return int(os.environ['WORKER_ID']) % (1 << WORKER_BITS)
+    return None
+
+
+class WorkerIdLease:
+    """
+    Worker id exclusivo alquilado en Redis. `acquire` prueba ids desde un
+    contador (INCR) con SET NX EX hasta encontrar uno libre; un hilo lo
+    renueva y, si se perdió (p. ej. Redis estuvo caído más que el TTL y otro
+    proceso lo tomó), alquila otro.
+    """
+
+    def __init__(self, ttl=WORKER_LEASE_TTL):
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}-{os.getpid()}"
+        self.worker_id = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def acquire(self):
+        rconn = connections.redis()
+        if rconn is None:
+            return None
+        start = int(rconn.incr(WORKER_LEASE_SEQ_KEY))
+        for i in range(1 << WORKER_BITS):
+            worker_id = (start + i) % (1 << WORKER_BITS)
+            if rconn.set(WORKER_LEASE_KEY.format(worker_id=worker_id), self.owner, nx=True, ex=self.ttl):
+                self.worker_id = worker_id
+                logging.info(f"Leased ticket worker id {worker_id}.")
+                return worker_id
+        logging.error("All ticket worker ids are leased; set WORKER_ID explicitly.")
+        return None
+
+    def renew(self):
+        if self.worker_id is None:
+            return self.acquire()
+        rconn = connections.redis()
+        if rconn is None:
+            return self.worker_id  # se sigue usando; se renueva cuando Redis vuelva
+        key = WORKER_LEASE_KEY.format(worker_id=self.worker_id)
+        if rconn.eval(RENEW_LEASE_LUA, 1, key, self.owner, self.ttl):
+            return self.worker_id
+        # Vencido: si nadie lo tomó se recupera, si no se alquila otro
+        if rconn.set(key, self.owner, nx=True, ex=self.ttl):
+            return self.worker_id
+        logging.warning(f"Lost ticket worker id {self.worker_id}, leasing a new one.")
+        self.worker_id = None
+        return self.acquire()
+
+    def _run(self, on_change):
+        while not self._stop.wait(self.ttl / 3):
+            try:
+                on_change(self.renew())
+            except Exception as e:
+                logging.error(f"Could not renew ticket worker id lease: {e}")
+
+    def start(self, on_change):
+        """Alquila un id (si Redis está) y lo renueva en segundo plano; `on_change(worker_id)` en cada ronda."""
+        try:
+            on_change(self.acquire())
+        except Exception as e:
+            logging.error(f"Could not lease a ticket worker id: {e}")
+        self._thread = threading.Thread(target=self._run, args=(on_change,), name='ticket-worker-lease', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        rconn = connections.redis()
+        if self.worker_id is not None and rconn is not None:
+            try:
+                # Se libera solo si sigue siendo nuestro
+                rconn.eval("if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end "
+                           "return 0", 1, WORKER_LEASE_KEY.format(worker_id=self.worker_id), self.owner)
+            except Exception as e:
+                logging.error(f"Could not release ticket worker id {self.worker_id}: {e}")
+
+
+class SnowflakeIds:
+    """
+    Ids únicos sin coordinación: timestamp + worker + secuencia dentro del
+    milisegundo. Sin worker id (ni WORKER_ID ni lease) no genera nada: un
+    id adivinado podría repetirse en otra réplica.
+    """
+
+    def __init__(self, worker_id=None):
+        self.worker_id = worker_id
+        self._last_ms = -1
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def next_id(self):
+        with self._lock:
+            if self.worker_id is None:
+                raise RuntimeError("No ticket worker id (set WORKER_ID or make Redis reachable at startup)")
+            now = max(int(time.time() * 1000) - EPOCH_MS, self._last_ms)  # nunca retrocedemos
+            if now == self._last_ms:
+                self._seq = (self._seq + 1) & ((1 << SEQUENCE_BITS) - 1)
+                if self._seq == 0:
+                    # Se agotó la secuencia del milisegundo: esperamos al siguiente
+                    while now <= self._last_ms:
+                        now = int(time.time() * 1000) - EPOCH_MS
+            else:
+                self._seq = 0
+            self._last_ms = now
+            return (now << (WORKER_BITS + SEQUENCE_BITS)) | (self.worker_id << SEQUENCE_BITS) | self._seq
+
+
+class TicketIdAllocator:
+    """
+    Reparte ticket ids reservando bloques de `ticket_seq` en Redis
+    (INCRBY de a TICKET_BLOCK, a partir de TICKET_SEQ_FLOOR) y entregándolos localmente, así la mayoría
+    de las órdenes no hace ningún round-trip. Cada worker tiene su propio
+    bloque, por lo que no hay colisiones entre procesos. Si Redis no está
+    disponible usa SnowflakeIds, que tampoco colisiona: su worker id es
+    WORKER_ID o uno alquilado en Redis al arrancar (WorkerIdLease).
+    """
+
+    def __init__(self, block=TICKET_BLOCK, worker_id=None):
+        self.block = block
+        worker_id = env_worker_id() if worker_id is None else worker_id
+        self.fallback = SnowflakeIds(worker_id)
+        self.worker_lease = WorkerIdLease() if worker_id is None else None
+        self.leases = 0
+        self.fallbacks = 0
+        self._next = 0
+        self._end = 0  # bloque vigente: [_next, _end)
+        self._lock = threading.Lock()
+
+    def _lease(self, count):
+        rconn = connections.redis()
+        if rconn is None:
+            return None
+        try:
+            last = int(rconn.eval(LEASE_LUA, 1, TICKET_SEQ_KEY, count, TICKET_SEQ_FLOOR))
+        except Exception as e:
+            logging.error(f"Could not lease ticket ids from Redis: {e}")
+            return None
+        self.leases += 1
+        return last - count + 1, last + 1
+
+    def allocate(self, count=1):
+        """Devuelve `count` ids consecutivos (como range) o, en fallback, una lista."""
+        with self._lock:
+            if self._end - self._next >= count:
+                ids = range(self._next, self._next + count)
+                self._next += count
+                return ids
+            # El resto del bloque no alcanza: se descarta (los huecos no importan)
+            lease = self._lease(max(count, self.block))
+            if lease is not None:
+                start, end = lease
+                self._next, self._end = start + count, end
+                return range(start, start + count)
+        self.fallbacks += count
+        return [self.fallback.next_id() for _ in range(count)]
+
+    def start(self):
+        """Sin worker id fijo, lo alquila en Redis y lo mantiene renovado."""
+        if self.worker_lease is not None:
+            self.worker_lease.start(self._set_worker_id)
+
+    def stop(self):
+        if self.worker_lease is not None:
+            self.worker_lease.stop()
+
+    def _set_worker_id(self, worker_id):
+        with self.fallback._lock:
+            self.fallback.worker_id = worker_id
+
+    def stats(self):
+        return {'block': self.block, 'leases': self.leases, 'fallbacks': self.fallbacks,
+                'remaining': self._end - self._next, 'worker_id': self.fallback.worker_id}
+
+
+ticket_ids = TicketIdAllocator()
@@ -114,11 +114,24 @@ INSERT IGNORE INTO Promocion (id, nombre, tipo, descuento, pais, fechaInicio, fe
 (201, 'Desc. Manana', 'Porcentaje', 0.15, 'Argentina', CURDATE(), DATE_ADD(CURDATE(), INTERVAL 60 DAY));
 
 -- Inserta stock. Si la combinación de idSucursal e idProducto ya existe, la ignora.
+-- Todas las sucursales tienen stock: el seed_service solo arma órdenes con lo que hay
+-- (y con RESTOCK_LEVEL repone lo que se agota).
 INSERT IGNORE INTO Stock (idSucursal, idProducto, cantidad) VALUES
 (1, 1, 100),
 (1, 2, 50),
+(1, 3, 60),
 (2, 1, 80),
-(2, 3, 60);
+(2, 2, 50),
+(2, 3, 60),
+(3, 1, 80),
+(3, 2, 50),
+(3, 3, 60),
+(101, 1, 80),
+(101, 2, 50),
+(101, 3, 60),
+(102, 1, 80),
+(102, 2, 50),
+(102, 3, 60);
 
 INSERT INTO Tipo_Producto (idTipoProducto, descripcion) VALUES
 ('Bebida Caliente', 'Bebidas servidas calientes, como Lattes, Capuccinos, Te.'),
@@ -30,12 +30,18 @@ print("--- 2. Creando Índices ---");
 // Índice 1: Para búsquedas rápidas por sucursal y fecha (común para reportes)
 db.ticket.createIndex({ sucursal_id: 1, fecha: -1 }, { name: "idx_sucursal_fecha" });
 
-// Índice 2: Para búsquedas por campos denormalizados críticos (ejemplo: buscar todos los tickets de un cliente para lineage)
-db.ticket.createIndex({ cliente_id: 1 }, { name: "idx_cliente_id" });
+// Índice 2: Tickets de un cliente en un rango de fechas (ej: pedidos de un cliente en un mes).
+// El prefijo cliente_id sigue sirviendo para buscar todos los tickets de un cliente (lineage).
+db.ticket.createIndex({ cliente_id: 1, fecha: -1 }, { name: "idx_cliente_fecha" });
 
 // Índice 3: Para acelerar consultas que filtran por la ciudad (campo denormalizado)
 db.ticket.createIndex({ sucursal_ciudad: 1 }, { name: "idx_sucursal_ciudad" });
 
+// Índice 3b: Para resolver lotes de tickets por número ({ ticket_id: { $in: [...] } }),
+// ej: el cruce con HistorialCompra de Cassandra en ordenes_fecha_sucursal.py
+// Único: los sinks del seed_service hacen upsert por ticket_id
+db.ticket.createIndex({ ticket_id: 1 }, { name: "idx_ticket_id", unique: true });
+
 // Índice 4: Índice Multi-clave para soportar búsquedas en el array 'detalles'
 // Esto optimiza búsquedas como la de "Latte Vainilla" que hicimos en el ejemplo.
 db.ticket.createIndex({ "detalles.nombre_producto": 1 }, { name: "idx_detalles_producto" });
@@ -3,6 +3,10 @@
 // 1. Limpiar la base de datos
 MATCH (n) DETACH DELETE n;
 
+// 1.1 Constraints de unicidad (también indexan los MERGE del seed_service)
+CREATE CONSTRAINT cliente_id IF NOT EXISTS FOR (c:Cliente) REQUIRE c.id IS UNIQUE;
+CREATE CONSTRAINT producto_id IF NOT EXISTS FOR (p:Producto) REQUIRE p.id IS UNIQUE;
+
 // 2. Crear Nodos de Clientes
 CREATE (c1:Cliente {id: 1, nombre: 'Alice Johnson', email: 'alice@example.com'});
 CREATE (c2:Cliente {id: 2, nombre: 'Jhon Doe', email: 'john.doe@example.com'});
@@ -0,0 +1,69 @@
+"""
+Capa mínima de acceso a Cassandra.
+
+- Cada CQL se prepara una sola vez por sesión (el coordinador no lo vuelve
+  a parsear en cada llamada).
+- El cluster usa TokenAwarePolicy: con statements preparados el driver
+  conoce la partition key y manda el request directo a una réplica.
+- execute_many escribe en bloque con execute_concurrent_with_args.
+
+Módulo compartido por TP/seed_service y CatTrack: la imagen del
+seed_service lo copia junto a sus fuentes y CatTrack lo importa desde
+esta carpeta.
+"""
+import threading
+
+from cassandra.cluster import Cluster, ExecutionProfile, EXEC_PROFILE_DEFAULT
+from cassandra.policies import TokenAwarePolicy, DCAwareRoundRobinPolicy
+from cassandra.query import named_tuple_factory
+from cassandra.concurrent import execute_concurrent_with_args
+
+DEFAULT_CONCURRENCY = 64
+
+
+def build_cluster(hosts, port=9042, row_factory=named_tuple_factory, request_timeout=10.0, **kwargs):
+    """
+    Cluster con balanceo token-aware. La row_factory va en el perfil de
+    ejecución: con perfiles el driver no permite asignar session.row_factory.
+    """
+    profile = ExecutionProfile(load_balancing_policy=TokenAwarePolicy(DCAwareRoundRobinPolicy()),
+                               row_factory=row_factory,
+                               request_timeout=request_timeout)
+    return Cluster(hosts, port=port, execution_profiles={EXEC_PROFILE_DEFAULT: profile}, **kwargs)
+
+
+class CassandraDAO:
+    """Envuelve una sesión y cachea sus statements preparados por texto CQL."""
+
+    def __init__(self, session):
+        self.session = session
+        self._prepared = {}
+        self._lock = threading.Lock()
+
+    def prepare(self, cql):
+        stmt = self._prepared.get(cql)
+        if stmt is None:
+            with self._lock:
+                stmt = self._prepared.get(cql)
+                if stmt is None:
+                    stmt = self._prepared[cql] = self.session.prepare(cql)
+        return stmt
+
+    def execute(self, cql, params=()):
+        return self.session.execute(self.prepare(cql), params)
+
+    def execute_many(self, cql, params, concurrency=DEFAULT_CONCURRENCY):
+        """
+        Ejecuta `cql` una vez por cada tupla de `params`, con hasta
+        `concurrency` requests en vuelo. Devuelve cuántas se ejecutaron;
+        si alguna falla levanta RuntimeError con la primera causa.
+        """
+        params = list(params)
+        if not params:
+            return 0
+        results = execute_concurrent_with_args(self.session, self.prepare(cql), params,
+                                               concurrency=concurrency, raise_on_first_error=False)
+        failed = [r.result_or_exc for r in results if not r.success]
+        if failed:
+            raise RuntimeError(f"{len(failed)} of {len(params)} statements failed, first error: {failed[0]}")
+        return len(params)